@@ -118,6 +118,10 @@ config.BossAir.acctGroupUser = glideInAcctGroupUser
 config.section_("CoreDatabase")
 config.CoreDatabase.connectUrl = databaseUrl
 #config.CoreDatabase.socket = databaseSocket
+#config.CoreDatabase.poolSize = 10
+#config.CoreDatabase.maxOverflow = 10
+#config.CoreDatabase.prePing = True
+#config.CoreDatabase.threadAffinity = True
 
 config.section_("DashboardReporter")
 config.DashboardReporter.dashboardHost = "cms-wmagent-job.cern.ch"
@@ -177,6 +181,7 @@ config.JobAccountant.logLevel = globalLogLevel
 config.JobAccountant.workerThreads = 1
 config.JobAccountant.pollInterval = 60
 config.JobAccountant.specDir = config.General.workDir + "/JobAccountant/SpecCache"
+#config.JobAccountant.loaderProcesses = 4
 
 config.component_("JobCreator")
 config.JobCreator.namespace = "WMComponent.JobCreator.JobCreator"
@@ -191,6 +196,10 @@ config.JobCreator.pollInterval = 120
 config.JobCreator.jobCacheDir = config.General.workDir + "/JobCache"
 config.JobCreator.defaultJobType = "Processing"
 config.JobCreator.workerThreads = 1
+# Split subscriptions in worker processes, talking to them through these ports
+#config.JobCreator.creatorSlaves = 4
+#config.JobCreator.processPoolInPort = 5571
+#config.JobCreator.processPoolOutPort = 5572
 
 config.component_("JobSubmitter")
 config.JobSubmitter.namespace = "WMComponent.JobSubmitter.JobSubmitter"
@@ -310,6 +319,7 @@ wmbs.model.object = 'WMCore.HTTPFrontEnd.WMBS.WMBSRESTModel'
 wmbs.section_('formatter')
 wmbs.formatter.object = 'WMCore.WebTools.RESTFormatter'
 
+wmbs.workDir = config.General.workDir
 wmbs.section_('couchConfig')
 wmbs.couchConfig.couchURL = couchURL
 wmbs.couchConfig.acdcDBName = acdcDBName
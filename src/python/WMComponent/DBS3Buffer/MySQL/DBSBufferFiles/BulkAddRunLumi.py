@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+"""
+_BulkAddRunLumi_
+
+MySQL implementation of DBSBufferFiles.BulkAddRunLumi
+"""
+
+from WMCore.WMBS.MySQL.Files.BulkAddRunLumi import BulkAddRunLumi as WMBSBulkAddRunLumi
+
+class BulkAddRunLumi(WMBSBulkAddRunLumi):
+    """
+    _BulkAddRunLumi_
+
+    Insert the run/lumi information of new DBSBuffer files, looking up the
+    file IDs once per file and dropping duplicated lumis.
+    """
+    idSQL = """SELECT lfn, id FROM dbsbuffer_file WHERE lfn = :lfn"""
+
+    sql = """INSERT INTO dbsbuffer_file_runlumi_map (filename, run, lumi)
+               VALUES (:fileid, :run, :lumi)"""
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+"""
+_BulkAddRunLumi_
+
+Oracle implementation of DBSBufferFiles.BulkAddRunLumi
+"""
+
+from WMComponent.DBS3Buffer.MySQL.DBSBufferFiles.BulkAddRunLumi import BulkAddRunLumi as MySQLBulkAddRunLumi
+
+class BulkAddRunLumi(MySQLBulkAddRunLumi):
+    pass
@@ -221,7 +221,8 @@ class ErrorHandlerPoller(BaseWorkerThread):
                 cooloffJobs.append(job)
                 continue
             try:
-                report.load(reportPath)
+                # Only the step times and the errors are needed
+                report.load(reportPath, sections = ["errors"])
                 # First let's check the time conditions
                 times = report.getFirstStartLastStop()
                 startTime = None
@@ -12,14 +12,12 @@ _AccountantWorker_
 Used by the JobAccountant to do the actual processing of completed jobs.
 """
 
-import os
 import shutil
 import threading
 import logging
 import gc
 import collections
 
-from WMCore.FwkJobReport.Report  import Report
 from WMCore.DAOFactory           import DAOFactory
 from WMCore.WMConnectionBase     import WMConnectionBase
 from WMCore.WMException          import WMException
@@ -37,6 +35,8 @@ from WMCore.Lexicon import sanitizeURL
 from WMCore.WMSpec.WMWorkload import newWorkload
 from WMCore.ACDC.DataCollectionService  import DataCollectionService
 
+from WMComponent.JobAccountant import ReportLoader
+
 class AccountantWorkerException(WMException):
     """
     _AccountantWorkerException_
@@ -69,7 +69,7 @@ class AccountantWorker(WMConnectionBase):
         self.getParentInfoAction     = self.daofactory(classname = "Files.GetParentInfo")
         self.setParentageByJob       = self.daofactory(classname = "Files.SetParentageByJob")
         self.setParentageByMergeJob  = self.daofactory(classname = "Files.SetParentageByMergeJob")
-        self.setFileRunLumi          = self.daofactory(classname = "Files.AddRunLumi")
+        self.setFileRunLumi          = self.daofactory(classname = "Files.BulkAddRunLumi")
         self.setFileLocation         = self.daofactory(classname = "Files.SetLocationByLFN")
         self.setFileAddChecksum      = self.daofactory(classname = "Files.AddChecksumByLFN")
         self.addFileAction           = self.daofactory(classname = "Files.Add")
@@ -87,7 +87,7 @@ class AccountantWorker(WMConnectionBase):
         self.dbsSetLocation        = self.dbsDaoFactory(classname = "DBSBufferFiles.SetLocationByLFN")
         self.dbsInsertLocation     = self.dbsDaoFactory(classname = "DBSBufferFiles.AddLocation")
         self.dbsSetChecksum        = self.dbsDaoFactory(classname = "DBSBufferFiles.AddChecksumByLFN")
-        self.dbsSetRunLumi         = self.dbsDaoFactory(classname = "DBSBufferFiles.AddRunLumi")
+        self.dbsSetRunLumi         = self.dbsDaoFactory(classname = "DBSBufferFiles.BulkAddRunLumi")
         self.dbsGetWorkflow        = self.dbsDaoFactory(classname = "ListWorkflow")
 
         self.dbsLFNHeritage      = self.dbsDaoFactory(classname = "DBSBufferFiles.BulkHeritageParent")
@@ -163,38 +163,7 @@ class AccountantWorker(WMConnectionBase):
         FwkJobReport instance.  If there is any problem loading or parsing the
         framework job report return None.
         """
-        # The jobReportPath may be prefixed with "file://" which needs to be
-        # removed so it doesn't confuse the FwkJobReport() parser.
-        jobReportPath = parameters.get("fwjr_path", None)
-        if not jobReportPath:
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, "FWJR path is empty")
-
-        jobReportPath = jobReportPath.replace("file://","")
-        if not os.path.exists(jobReportPath):
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
-
-        if os.path.getsize(jobReportPath) == 0:
-            logging.error("Empty FwkJobReport: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99998, 'jobReport of size 0: %s ' % jobReportPath)
-
-        jobReport = Report()
-
-        try:
-            jobReport.load(jobReportPath)
-        except Exception as ex:
-            msg =  "Error loading jobReport %s\n" % jobReportPath
-            msg += str(ex)
-            logging.error(msg)
-            logging.debug("Failing job: %s\n" % parameters)
-            return self.createMissingFWKJR(parameters, 99997, 'Cannot load jobReport')
-
-        if len(jobReport.listSteps()) == 0:
-            logging.error("FwkJobReport with no steps: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99997, 'jobReport with no steps: %s ' % jobReportPath)
-
-        return jobReport
+        return ReportLoader.loadJobReport(parameters)
 
     def didJobSucceed(self, jobReport):
         """
@@ -251,8 +220,11 @@ class AccountantWorker(WMConnectionBase):
         for job in parameters:
             logging.info("Handling %s" % job["fwjr_path"])
 
-            # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job)
+            # Load the job and set the ID, unless the report loader
+            # processes of the poller did it already
+            fwkJobReport = job.get("fwjr", None)
+            if fwkJobReport == None:
+                fwkJobReport = self.loadJobReport(job)
             fwkJobReport.setJobID(job['id'])
             jobSuccess = None
             
@@ -404,18 +376,33 @@ class AccountantWorker(WMConnectionBase):
         _findDBSParents_
 
         Find the parent of the file in DBS
-        This is meant to be called recursively
         """
-        parentsInfo = self.getParentInfoAction.execute([lfn],
+        return self.findDBSParentsBulk([lfn])[lfn]
+
+    def findDBSParentsBulk(self, lfns):
+        """
+        _findDBSParentsBulk_
+
+        Find the parents in DBS of a list of files, returns them keyed by
+        LFN.  Every level of the heritage is resolved with a single query for
+        all the files.  This is meant to be called recursively
+        """
+        newParents = dict([(lfn, set()) for lfn in lfns])
+        if len(newParents) == 0:
+            return newParents
+
+        parentsInfo = self.getParentInfoAction.execute(newParents.keys(),
                                                        conn = self.getDBConn(),
                                                        transaction = self.existingTransaction())
-        newParents = set()
+        grandParents = {}
         for parentInfo in parentsInfo:
+            childLFN = parentInfo["child_lfn"]
+
             # This will catch straight to merge files that do not have redneck
             # parents.  We will mark the straight to merge file from the job
             # as a child of the merged parent.
             if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
+                newParents[childLFN].add(parentInfo["lfn"])
 
             elif parentInfo['gpmerged'] == None:
                 continue
@@ -425,14 +412,18 @@ class AccountantWorker(WMConnectionBase):
             # not this file has any redneck children and update their parentage
             # information.
             elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
+                newParents[childLFN].add(parentInfo["gplfn"])
 
             # If that didn't work, we've reached the great-grandparents
             # And we have to work via recursion
             else:
-                parentSet = self.findDBSParents(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
+                grandParents.setdefault(parentInfo["gplfn"], set()).add(childLFN)
+
+        if len(grandParents) > 0:
+            parentSets = self.findDBSParentsBulk(grandParents.keys())
+            for grandParentLFN, childLFNs in grandParents.items():
+                for childLFN in childLFNs:
+                    newParents[childLFN].update(parentSets[grandParentLFN])
 
         return newParents
 
@@ -625,10 +616,7 @@ class AccountantWorker(WMConnectionBase):
         Create a missing FWJR if the report can't be found by the code in the
         path location.
         """
-        report = Report()
-        report.addError("cmsRun1", 84, errorCode, errorDescription)
-        report.data.cmsRun1.status = "Failed"
-        return report
+        return ReportLoader.createMissingFWKJR(errorCode, errorDescription)
 
     def createFilesInDBSBuffer(self):
         """
@@ -746,7 +734,7 @@ class AccountantWorker(WMConnectionBase):
                                         transaction = self.existingTransaction())
 
             if len(runLumiBinds) > 0:
-                self.dbsSetRunLumi.execute(file = runLumiBinds,
+                self.dbsSetRunLumi.execute(files = runLumiBinds,
                                            conn = self.getDBConn(),
                                            transaction = self.existingTransaction())
         except WMException:
@@ -825,7 +813,7 @@ class AccountantWorker(WMConnectionBase):
                                        transaction = self.existingTransaction())
 
             if runLumiBinds:
-                self.setFileRunLumi.execute(file = runLumiBinds,
+                self.setFileRunLumi.execute(files = runLumiBinds,
                                             conn = self.getDBConn(),
                                             transaction = self.existingTransaction())
 
@@ -891,9 +879,9 @@ class AccountantWorker(WMConnectionBase):
         """
         outputLFNs = [f['lfn'] for f in self.mergedOutputFiles]
         bindList         = []
+        newParents = self.findDBSParentsBulk(outputLFNs)
         for lfn in outputLFNs:
-            newParents = self.findDBSParents(lfn = lfn)
-            for parentLFN in newParents:
+            for parentLFN in newParents[lfn]:
                 bindList.append({'child': lfn, 'parent': parentLFN})
 
         # Now all the parents should exist
@@ -18,6 +18,7 @@ from WMCore.Agent.Harness import Harness
 from WMCore.DAOFactory import DAOFactory
 
 from WMComponent.JobAccountant.AccountantWorker import AccountantWorker
+from WMComponent.JobAccountant.ReportLoader import ReportLoaderPool
 
 from WMCore.WMException import WMException
 
@@ -36,6 +37,12 @@ class JobAccountantPoller(BaseWorkerThread):
         self.config = config
         self.accountantWorkSize = getattr(self.config.JobAccountant,
                                           'accountantWorkSize', 100)
+        # Number of processes loading the job reports while the previous
+        # batch of jobs is written to the database, 0 means the reports
+        # are loaded by the accountant worker itself
+        self.loaderProcesses = getattr(self.config.JobAccountant,
+                                       'loaderProcesses', 0)
+        self.reportLoader = None
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
         self.initAlerts(compName = "JobAccountant")
@@ -64,7 +71,10 @@ class JobAccountantPoller(BaseWorkerThread):
         _algorithm_
 
         Poll WMBS for jobs in the 'Complete' state and then pass them to the
-        accountant worker.
+        accountant worker in batches of accountantWorkSize jobs.  Every batch
+        is written to the database in a single transaction.  With
+        loaderProcesses set the reports of the next batch are loaded by the
+        report loader processes while the current batch is handled.
         """
         completeJobs = self.getJobsAction.execute(state = "complete")
         logging.info("Found %d completed jobs" % len(completeJobs))
@@ -74,14 +84,30 @@ class JobAccountantPoller(BaseWorkerThread):
             logging.debug("No work to do; exiting")
             return
 
-        while len(completeJobs) > self.accountantWorkSize:
+        jobsSlices = []
+        for i in range(0, len(completeJobs), self.accountantWorkSize):
+            jobsSlices.append(completeJobs[i:i + self.accountantWorkSize])
+
+        if self.loaderProcesses > 0 and self.reportLoader == None:
+            self.reportLoader = ReportLoaderPool(self.loaderProcesses)
+        if self.reportLoader != None:
+            self.reportLoader.submit(jobsSlices[0])
+
+        for i, jobsSlice in enumerate(jobsSlices):
             try:
-                jobsSlice = completeJobs[:self.accountantWorkSize]
-                completeJobs = completeJobs[self.accountantWorkSize:]
+                if self.reportLoader != None:
+                    if i + 1 < len(jobsSlices):
+                        self.reportLoader.submit(jobsSlices[i + 1])
+                    reports = self.reportLoader.collect(jobsSlice)
+                    for job in jobsSlice:
+                        job["fwjr"] = reports[job["id"]]
+
                 self.accountantWorker(jobsSlice)
             except WMException:
+                self.abortCycle()
                 raise
             except Exception as ex:
+                self.abortCycle()
                 msg =  "Hit general exception in JobAccountantPoller while using worker.\n"
                 msg += str(ex)
                 logging.error(msg)
@@ -90,23 +116,31 @@ class JobAccountantPoller(BaseWorkerThread):
                 logging.debug(jobsSlice)
                 raise JobAccountantPollerException(msg)
 
-        try:
-            self.accountantWorker(completeJobs)
-        except WMException:
-            myThread = threading.currentThread()
-            if getattr(myThread, 'transaction', None) != None:
-                myThread.transaction.rollback()
-            raise
-        except Exception as ex:
-            myThread = threading.currentThread()
-            if getattr(myThread, 'transaction', None) != None:
-                myThread.transaction.rollback()
-            msg =  "Hit general exception in JobAccountantPoller in last worker use.\n"
-            msg += str(ex)
-            logging.error(msg)
-            self.sendAlert(6, msg = msg)
-            logging.debug("jobs left:")
-            logging.debug(completeJobs)
-            raise JobAccountantPollerException(msg)
+        return
+
+    def abortCycle(self):
+        """
+        _abortCycle_
+
+        Roll back the open transaction and stop the report loaders, the
+        reports they are still loading are not needed anymore.
+        """
+        myThread = threading.currentThread()
+        if getattr(myThread, 'transaction', None) != None:
+            myThread.transaction.rollback()
+
+        if self.reportLoader != None:
+            self.reportLoader.close()
+            self.reportLoader = None
+        return
 
+    def terminate(self, params):
+        """
+        _terminate_
+
+        Stop the report loader processes.
+        """
+        if self.reportLoader != None:
+            self.reportLoader.close()
+            self.reportLoader = None
         return
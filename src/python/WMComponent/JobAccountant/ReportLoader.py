@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+_ReportLoader_
+
+Load and validate framework job reports for the JobAccountant, either in
+the calling process or in a pool of worker processes.
+
+The workers do not touch the database.  They load the reports from disk,
+check them, replace missing or broken reports by failure reports and send
+them back in the compact report format, which is much cheaper to decode
+than a pickled report.  The database work stays with the AccountantWorker
+in the poller thread.
+"""
+
+import os
+import logging
+import cStringIO
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport import CompactReport
+from WMCore.ProcessPool.WorkerPool import WorkerPool
+
+def createMissingFWKJR(errorCode = 999, errorDescription = 'Failure of unknown type'):
+    """
+    _createMissingFWJR_
+
+    Create a failure report for a job whose report can't be used.
+    """
+    report = Report()
+    report.addError("cmsRun1", 84, errorCode, errorDescription)
+    report.data.cmsRun1.status = "Failed"
+    return report
+
+def loadJobReport(parameters):
+    """
+    _loadJobReport_
+
+    Given a framework job report on disk, load it and return a
+    FwkJobReport instance.  If there is any problem loading or parsing the
+    framework job report return a failure report instead.
+    """
+    # The jobReportPath may be prefixed with "file://" which needs to be
+    # removed so it doesn't confuse the FwkJobReport() parser.
+    jobReportPath = parameters.get("fwjr_path", None)
+    if not jobReportPath:
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(99999, "FWJR path is empty")
+
+    jobReportPath = jobReportPath.replace("file://","")
+    if not os.path.exists(jobReportPath):
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
+
+    if os.path.getsize(jobReportPath) == 0:
+        logging.error("Empty FwkJobReport: %s" % jobReportPath)
+        return createMissingFWKJR(99998, 'jobReport of size 0: %s ' % jobReportPath)
+
+    jobReport = Report()
+
+    try:
+        jobReport.load(jobReportPath)
+    except Exception as ex:
+        msg =  "Error loading jobReport %s\n" % jobReportPath
+        msg += str(ex)
+        logging.error(msg)
+        logging.debug("Failing job: %s\n" % parameters)
+        return createMissingFWKJR(99997, 'Cannot load jobReport')
+
+    if len(jobReport.listSteps()) == 0:
+        logging.error("FwkJobReport with no steps: %s" % jobReportPath)
+        return createMissingFWKJR(99997, 'jobReport with no steps: %s ' % jobReportPath)
+
+    return jobReport
+
+def encodeReport(report):
+    """
+    _encodeReport_
+
+    Serialize a report in the compact format.
+    """
+    handle = cStringIO.StringIO()
+    CompactReport.dumpReport(report.data, handle)
+    return handle.getvalue()
+
+def decodeReport(encodedReport):
+    """
+    _decodeReport_
+
+    Rebuild a report serialized by encodeReport.
+    """
+    report = Report()
+    report.data = CompactReport.loadReport(cStringIO.StringIO(encodedReport))
+    return report
+
+def loadReports(jobs):
+    """
+    _loadReports_
+
+    Load the reports of a chunk of jobs in a worker process.  Returns the
+    (compact report, error) tuple of every job by job ID.
+    """
+    reports = {}
+    for job in jobs:
+        try:
+            reports[job['id']] = (encodeReport(loadJobReport(job)), None)
+        except Exception as ex:
+            reports[job['id']] = (None, str(ex))
+    return reports
+
+class ReportLoaderPool:
+    """
+    _ReportLoaderPool_
+
+    Pool of processes loading framework job reports.  Jobs are submitted in
+    chunks and their reports are collected by job ID, so the reports of the
+    next batch of jobs can be loaded while the current batch is written to
+    the database.
+    """
+    def __init__(self, nProc, chunkSize = 10, timeout = 300):
+        self.chunkSize = chunkSize
+        self.pool      = WorkerPool(loadReports, nProc, timeout)
+        self.chunks    = {}
+        self.nChunks   = 0
+        return
+
+    def submit(self, jobs):
+        """
+        _submit_
+
+        Queue the reports of the given jobs for loading.
+        """
+        for i in range(0, len(jobs), self.chunkSize):
+            chunk = [{'id': job['id'], 'fwjr_path': job['fwjr_path']}
+                     for job in jobs[i:i + self.chunkSize]]
+            self.nChunks += 1
+            for job in chunk:
+                self.chunks[job['id']] = self.nChunks
+            self.pool.submit(self.nChunks, chunk)
+        return
+
+    def collect(self, jobs):
+        """
+        _collect_
+
+        Wait for the reports of the given (submitted) jobs and return them
+        keyed by job ID.  Reports that could not be loaded by the workers, or
+        that did not come back in time, are loaded in this process.
+        """
+        chunkKeys = set()
+        for job in jobs:
+            if job['id'] in self.chunks:
+                chunkKeys.add(self.chunks.pop(job['id']))
+
+        loaded = {}
+        for chunkKey, (chunkReports, error) in self.pool.collect(chunkKeys).items():
+            if error != None:
+                logging.error("Report loader failed on chunk %s: %s" % (chunkKey, error))
+                continue
+            loaded.update(chunkReports)
+
+        reports = {}
+        for job in jobs:
+            encodedReport, error = loaded.get(job['id'], (None, None))
+            if error != None:
+                logging.error("Report loader failed on job %s: %s" % (job['id'], error))
+            if encodedReport == None:
+                reports[job['id']] = loadJobReport(job)
+            else:
+                reports[job['id']] = decodeReport(encodedReport)
+        return reports
+
+    def close(self):
+        """
+        _close_
+
+        Stop the worker processes.
+        """
+        self.pool.close()
+        self.chunks = {}
+        return
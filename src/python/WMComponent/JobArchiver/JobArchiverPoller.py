@@ -9,10 +9,12 @@ __all__ = []
 
 
 import threading
+import cStringIO
 import json
 import logging
 import os
 import os.path
+import Queue
 import shutil
 import tarfile
 import traceback
@@ -25,6 +27,7 @@ from WMCore.JobStateMachine.ChangeState    import ChangeState
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueNoMatchingElements
 
 from WMCore.WMBS.Job          import Job
+from WMCore.DataStructs.JobCacheStore import loadJobData, removeStore
 from WMCore.DAOFactory        import DAOFactory
 from WMCore.WMBS.Fileset      import Fileset
 from WMCore.WMException       import WMException
@@ -38,6 +41,11 @@ class JobArchiverPollerException(WMException):
     The Exception handler for the job archiver.
     """
 
+# tarfile write mode and file extension of the archives for each codec
+ARCHIVE_CODECS = {'bz2': ('w:bz2', '.tar.bz2'),
+                  'gz': ('w:gz', '.tar.gz'),
+                  'none': ('w', '.tar')}
+
 class JobArchiverPoller(BaseWorkerThread):
     """
     Polls for Error Conditions, handles them
@@ -61,6 +69,17 @@ class JobArchiverPoller(BaseWorkerThread):
         self.numberOfJobsToCluster = getattr(self.config.JobArchiver,
                                              "numberOfJobsToCluster", 1000)
 
+        # Archive every job on its own ('job') or all the jobs of a JobCluster
+        # folder archived in a cycle together ('cluster'), with archiveThreads
+        # archives written at the same time
+        self.archiveMode    = getattr(self.config.JobArchiver, "archiveMode", "job")
+        self.archiveThreads = getattr(self.config.JobArchiver, "archiveThreads", 1)
+        self.archiveCodec   = getattr(self.config.JobArchiver, "archiveCodec", "bz2")
+        if self.archiveMode not in ("job", "cluster"):
+            raise JobArchiverPollerException("Unknown archiveMode %s" % self.archiveMode)
+        if self.archiveCodec not in ARCHIVE_CODECS:
+            raise JobArchiverPollerException("Unknown archiveCodec %s" % self.archiveCodec)
+
         # initialize the alert framework (if available)
         self.initAlerts(compName = "JobArchiver")
 
@@ -181,9 +200,10 @@ class JobArchiverPoller(BaseWorkerThread):
         if self.uploadPublishInfo:
             self.createAndUploadPublish(successList)
 
-        self.changeState.propagate(successList, "cleanout", "success")
-        self.changeState.propagate(failList, "cleanout", "exhausted")
-        self.changeState.propagate(killList, "cleanout", "killed")
+        transitions = [(job, "cleanout", "success") for job in successList]
+        transitions.extend([(job, "cleanout", "exhausted") for job in failList])
+        transitions.extend([(job, "cleanout", "killed") for job in killList])
+        self.changeState.propagateMany(transitions)
         myThread.transaction.commit()
 
 
@@ -237,35 +257,124 @@ class JobArchiverPoller(BaseWorkerThread):
 
         Upon workQueue realizing that a subscriptions is done, everything
         regarding those jobs is cleaned up.
+
+        In cluster mode the jobs of a JobCluster folder are packed in a single
+        archive, named after the first and last job ID, and the archive of
+        every job is recorded in the JobIndex.txt file of the folder.
         """
+        if self.archiveMode == "job" and self.archiveThreads <= 1:
+            for job in doneList:
+                #print "About to clean cache for job %i" % (job['id'])
+                self.cleanJobCache(job)
+            return
 
+        archives = {}
         for job in doneList:
-            #print "About to clean cache for job %i" % (job['id'])
-            self.cleanJobCache(job)
+            jobCache = self.prepareJobCache(job)
+            if jobCache == None:
+                continue
+            logDir = jobCache[0]
+            if self.archiveMode == "job":
+                archives[(logDir, job['id'])] = [jobCache[1:]]
+            else:
+                archives.setdefault((logDir, None), []).append(jobCache[1:])
+
+        tasks = []
+        for (logDir, jobID), jobs in archives.items():
+            if jobID != None:
+                archiveName = 'Job_%i' % jobID
+            else:
+                jobIDs = [x[0] for x in jobs]
+                archiveName = 'Jobs_%i-%i' % (min(jobIDs), max(jobIDs))
+            archivePath = os.path.join(logDir, archiveName + ARCHIVE_CODECS[self.archiveCodec][1])
+            if jobID == None and os.path.exists(archivePath):
+                # Don't overwrite the archive of an earlier cycle
+                archiveName += '_%i' % int(time.time())
+                archivePath = os.path.join(logDir, archiveName + ARCHIVE_CODECS[self.archiveCodec][1])
+            tasks.append((archivePath, jobs))
+
+        errors = self.runArchiveTasks(tasks)
+
+        if self.archiveMode == "cluster":
+            for archivePath, jobs in tasks:
+                if archivePath in errors:
+                    continue
+                indexFile = open(os.path.join(os.path.dirname(archivePath), "JobIndex.txt"), "a")
+                for jobID, _, _ in jobs:
+                    indexFile.write("%i %s\n" % (jobID, os.path.basename(archivePath)))
+                indexFile.close()
+
+        if errors:
+            msg = "\n".join(errors.values())
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            raise JobArchiverPollerException(msg)
 
         return
 
-    def cleanJobCache(self, job):
+    def runArchiveTasks(self, tasks):
         """
-        _cleanJobCache_
+        _runArchiveTasks_
 
-        Clears out any files still sticking around in the jobCache,
-        tars up the contents and sends them off
+        Write the archives of the given (archive path, jobs) tasks with
+        archiveThreads threads, this thread being one of them.  The
+        compressors release the GIL, so the archives are really compressed
+        in parallel.  Returns the error messages by archive path.
+        """
+        errors = {}
+        taskQueue = Queue.Queue()
+        for task in tasks:
+            taskQueue.put(task)
+
+        def archiveWorker():
+            while True:
+                try:
+                    archivePath, jobs = taskQueue.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    self.writeArchive(archivePath, jobs)
+                except Exception as ex:
+                    errors[archivePath] = str(ex)
+
+        threads = []
+        for _ in range(min(self.archiveThreads, len(tasks)) - 1):
+            thread = threading.Thread(target = archiveWorker)
+            thread.start()
+            threads.append(thread)
+        archiveWorker()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def prepareJobCache(self, job):
         """
+        _prepareJobCache_
 
+        Check the job cache directory and create the log directory of the job.
+        Returns the log directory, job ID, cache directory and its content, or
+        None if there is nothing to archive.
+        """
         cacheDir = job['cache_dir']
 
         if not cacheDir or not os.path.isdir(cacheDir):
             msg = "Could not find jobCacheDir %s" % (cacheDir)
             logging.error(msg)
             self.sendAlert(1, msg = msg)
-            return
+            return None
 
         cacheDirList = os.listdir(cacheDir)
 
         if cacheDirList == []:
-            os.rmdir(cacheDir)
-            return
+            # Jobs in a JobCacheStore still have their job.pkl to archive
+            stores = {}
+            jobData = loadJobData(cacheDir, stores)
+            for store in stores.values():
+                store.close()
+            if jobData == None:
+                os.rmdir(cacheDir)
+                removeStore(os.path.dirname(os.path.normpath(cacheDir)))
+                return None
 
         # Now we need to set up a final destination
         try:
@@ -287,37 +396,73 @@ class JobArchiverPoller(BaseWorkerThread):
             self.sendAlert(6, msg = msg)
             raise JobArchiverPollerException(msg)
 
-        # Otherwise we have something in there
+        return logDir, job['id'], cacheDir, cacheDirList
+
+    def writeArchive(self, archivePath, jobs):
+        """
+        _writeArchive_
+
+        Tar up the cache directories of the given (job ID, cache directory,
+        content) jobs, under Job_<ID> in the archive, and remove them.  Jobs
+        kept in the JobCacheStore of their JobCollection are archived as
+        job.pkl, the store is removed with the last job cache directory of
+        the collection.
+        """
+        stores = {}
         try:
-            tarName = 'Job_%i.tar.bz2' % (job['id'])
-            tarball = tarfile.open(name = os.path.join(logDir, tarName),
-                                   mode = 'w:bz2')
-            for fileName in cacheDirList:
-                fullFile = os.path.join(cacheDir, fileName)
-                try:
-                    tarball.add(name = fullFile,
-                                arcname = 'Job_%i/%s' %(job['id'], fileName))
-                except IOError:
-                    logging.error('Cannot read %s, skipping' % fullFile)
+            tarball = tarfile.open(name = archivePath,
+                                   mode = ARCHIVE_CODECS[self.archiveCodec][0])
+            for jobID, cacheDir, cacheDirList in jobs:
+                for fileName in cacheDirList:
+                    fullFile = os.path.join(cacheDir, fileName)
+                    try:
+                        tarball.add(name = fullFile,
+                                    arcname = 'Job_%i/%s' %(jobID, fileName))
+                    except IOError:
+                        logging.error('Cannot read %s, skipping' % fullFile)
+                jobData = loadJobData(cacheDir, stores)
+                if jobData != None and not 'job.pkl' in cacheDirList:
+                    tarInfo = tarfile.TarInfo(name = 'Job_%i/job.pkl' % jobID)
+                    tarInfo.size = len(jobData)
+                    tarInfo.mtime = time.time()
+                    tarball.addfile(tarInfo, cStringIO.StringIO(jobData))
             tarball.close()
         except Exception as ex:
             msg =  "Exception while opening and adding to a tarfile\n"
-            msg += "Tarfile: %s\n" % os.path.join(logDir, tarName)
+            msg += "Tarfile: %s\n" % archivePath
             msg += str(ex)
-            logging.error(msg)
-            self.sendAlert(6, msg = msg)
-            logging.debug("cacheDirList: %s" % (cacheDirList))
+            logging.debug("Jobs: %s" % (jobs))
             raise JobArchiverPollerException(msg)
+        finally:
+            for store in stores.values():
+                store.close()
 
-        try:
+        for jobID, cacheDir, cacheDirList in jobs:
             shutil.rmtree('%s' % (cacheDir), ignore_errors=True)
-        except Exception as ex:
-            msg =  "Error while removing the old cache dir.\n"
-            msg += "CacheDir: %s\n" % cacheDir
-            msg += str(ex)
-            logging.error(msg)
-            self.sendAlert(6, msg = msg)
-            raise JobArchiverPollerException(msg)
+        for collectionDir in set([os.path.dirname(os.path.normpath(x[1])) for x in jobs]):
+            removeStore(collectionDir)
+
+        return
+
+    def cleanJobCache(self, job):
+        """
+        _cleanJobCache_
+
+        Clears out any files still sticking around in the jobCache,
+        tars up the contents and sends them off
+        """
+        jobCache = self.prepareJobCache(job)
+        if jobCache == None:
+            return
+
+        logDir = jobCache[0]
+        archivePath = os.path.join(logDir, 'Job_%i%s' % (job['id'], ARCHIVE_CODECS[self.archiveCodec][1]))
+        try:
+            self.writeArchive(archivePath, [jobCache[1:]])
+        except JobArchiverPollerException as ex:
+            logging.error(ex._message)
+            self.sendAlert(6, msg = ex._message)
+            raise
 
         return
 
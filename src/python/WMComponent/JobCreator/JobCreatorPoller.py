@@ -34,6 +34,7 @@ from WMCore.WMBS.Subscription               import Subscription
 from WMCore.WMBS.Workflow                   import Workflow
 from WMCore.WMSpec.WMWorkload               import WMWorkload, WMWorkloadHelper
 from WMCore.Database.CMSCouch               import CouchServer
+from WMCore.DataStructs.JobCacheStore       import JobCacheStore, submitSummary
 from WMCore.FwkJobReport.Report             import Report
 
 
@@ -84,32 +85,17 @@ def retrieveJobSplitParams(wmWorkload, task):
         return task.jobSplittingParameters()
 
 
-def runSplitter(jobFactory, splitParams):
-    """
-    _runSplitter_
-
-    Run the jobSplitting as a coroutine method, yielding values as required
-    """
-
-    groups = ['test']
-    while groups != []:
-        groups = jobFactory(**splitParams)
-        yield groups
-        # Dump it after one go if we're not grabbing by proxy
-        if jobFactory.grabByProxy == False:
-            break
-
-
-
 def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
             owner = None, ownerDN = None,
             ownerGroup = '', ownerRole = '',
             scramArch = None, swVersion = None, agentNumber = 0,
-            numberOfCores = 1):
+            numberOfCores = 1, store = None):
     """
     _saveJob_
 
-    Actually do the mechanics of saving the job to a pickle file
+    Actually do the mechanics of saving the job.  If a JobCacheStore is
+    passed in the job is appended to it, otherwise it's pickled to the
+    job.pkl file in its cache directory.
     """
     if wmTask:
             # If we managed to load the task,
@@ -130,6 +116,14 @@ def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
     job['scramArch'] = scramArch
     job['swVersion'] = swVersion
     job['numberOfCores'] = numberOfCores
+
+    if store != None:
+        summary = submitSummary(job)
+        summary['counter'] = jobNumber
+        summary['owner'] = owner
+        store.append(job['id'], job, summary)
+        return
+
     output = open(os.path.join(cacheDir, 'job.pkl'), 'w')
     cPickle.dump(job, output, cPickle.HIGHEST_PROTOCOL)
     output.close()
@@ -145,6 +139,7 @@ def creatorProcess(work, jobCacheDir):
     Creator work areas and pickle job objects
     """
     createWorkArea  = CreateWorkArea()
+    stores          = {}
 
     try:
         wmbsJobGroup = work.get('jobGroup')
@@ -160,6 +155,7 @@ def creatorProcess(work, jobCacheDir):
         swVersion    = work.get('swVersion', None)
         agentNumber  = work.get('agentNumber', 0)
         numberOfCores = work.get('numberOfCores', 1)
+        useJobCacheStore = work.get('useJobCacheStore', True)
 
         if ownerDN == None:
             ownerDN = owner
@@ -187,6 +183,13 @@ def creatorProcess(work, jobCacheDir):
 
         for job in wmbsJobGroup.jobs:
             jobNumber += 1
+            store = None
+            if useJobCacheStore:
+                # One store per JobCollection directory
+                collectionDir = os.path.dirname(job['cache_dir'])
+                if collectionDir not in stores:
+                    stores[collectionDir] = JobCacheStore(collectionDir)
+                store = stores[collectionDir]
             saveJob(job = job, workflow = workflow,
                     wmTask = wmTaskName,
                     jobNumber = jobNumber,
@@ -198,7 +201,8 @@ def creatorProcess(work, jobCacheDir):
                     scramArch = scramArch,
                     swVersion = swVersion,
                     agentNumber = agentNumber,
-                    numberOfCores = numberOfCores)
+                    numberOfCores = numberOfCores,
+                    store = store)
 
     except Exception as ex:
         # Register as failure; move on
@@ -207,6 +211,9 @@ def creatorProcess(work, jobCacheDir):
         msg += str(traceback.format_exc())
         logging.error(msg)
         raise JobCreatorException(msg)
+    finally:
+        for store in stores.values():
+            store.close()
 
     return wmbsJobGroup
 
@@ -343,6 +350,7 @@ class JobCreatorPoller(BaseWorkerThread):
         self.setBulkCache     = self.daoFactory(classname = "Jobs.SetCache")
         self.countJobs        = self.daoFactory(classname = "Jobs.GetNumberOfJobsPerWorkflow")
         self.subscriptionList = self.daoFactory(classname = "Subscriptions.ListIncomplete")
+        self.subscriptionsByWorkflow = self.daoFactory(classname = "Subscriptions.ListIncompleteByWorkflow")
         self.setFWJRPath      = self.daoFactory(classname = "Jobs.SetFWJRPath")
 
         #information
@@ -351,7 +359,22 @@ class JobCreatorPoller(BaseWorkerThread):
         #Variables
         self.defaultJobType     = config.JobCreator.defaultJobType
         self.limit              = getattr(config.JobCreator, 'fileLoadLimit', 500)
+        # Maximum number of fileLoadLimit sized chunks split per subscription
+        # and cycle, 0 means split everything that is available
+        self.maxChunks          = getattr(config.JobCreator, 'maxChunksPerCycle', 0)
+        # Number of worker processes splitting subscriptions in parallel,
+        # 0 means all the subscriptions are split in this thread
+        self.creatorSlaves      = getattr(config.JobCreator, 'creatorSlaves', 0)
+        # Own ports, not the ProcessPool defaults other pools may be bound to
+        self.poolInPort         = str(getattr(config.JobCreator, 'processPoolInPort', 5571))
+        self.poolOutPort        = str(getattr(config.JobCreator, 'processPoolOutPort', 5572))
+        # The pool is only started on the first cycle, the workers
+        # instantiate this class as well and must not start their own
+        self.processPool        = None
         self.agentNumber        = int(getattr(config.Agent, 'agentNumber', 0))
+        # Append the jobs of a JobCollection to a single JobCacheStore
+        # instead of writing one job.pkl per job
+        self.useJobCacheStore   = getattr(config.JobCreator, 'useJobCacheStore', True)
 
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
@@ -427,201 +450,287 @@ class JobCreatorPoller(BaseWorkerThread):
         logging.debug("terminating. doing one more pass before we die")
         self.algorithm(params)
 
+        if self.processPool != None:
+            self.processPool.close()
+            self.processPool = None
+
 
     def pollSubscriptions(self):
         """
         Poller for looking in all active subscriptions for jobs that need to be made.
 
+        If creatorSlaves is set the subscriptions are fanned out to a pool of
+        worker processes, each with its own database connection.  All the
+        subscriptions of a workflow go to the same worker so that the job
+        counters of a workflow are never computed concurrently.
         """
         logging.info("Beginning JobCreator.pollSubscriptions() cycle.")
-        myThread = threading.currentThread()
+
+        if self.creatorSlaves > 0:
+            self.pollSubscriptionsInPool()
+            return
 
         #First, get list of Subscriptions
         subscriptions    = self.subscriptionList.execute()
 
         # Okay, now we have a list of subscriptions
         for subscriptionID in subscriptions:
-            wmbsSubscription = Subscription(id = subscriptionID)
-            try:
-                wmbsSubscription.load()
-            except IndexError:
-                # This happens when the subscription no longer exists
-                # i.e., someone executed a kill() function on the database
-                # while the JobCreator was in cycle
-                # Ignore this subscription
-                msg = "JobCreator cannot load subscription %i" % subscriptionID
-                logging.error(msg)
-                self.sendAlert(6, msg = msg)
-                continue
-
-            workflow         = Workflow(id = wmbsSubscription["workflow"].id)
-            workflow.load()
-            wmbsSubscription['workflow'] = workflow
-            wmWorkload       = retrieveWMSpec(workflow = workflow)
-
-            if not workflow.task or not wmWorkload:
-                # Then we have a problem
-                # We NEED a sandbox
-                # Abort this subscription!
-                # But do NOT fail
-                # We have no way of marking a subscription as bad per se
-                # We'll have to just keep skipping it
-                msg = "Have no task for workflow %i\n" % (workflow.id)
-                msg += "Aborting Subscription %i" % (subscriptionID)
-                logging.error(msg)
-                self.sendAlert(1, msg = msg)
-                continue
+            self.processSubscription(subscriptionID)
+
+        return
+
+    def pollSubscriptionsInPool(self):
+        """
+        _pollSubscriptionsInPool_
+
+        Hand the incomplete subscriptions, grouped by workflow, to the process
+        pool and wait for all of them to be processed.  Every worker commits
+        the jobs of a splitting pass in its own transaction, exactly like
+        processSubscription() does in the serial mode.
+        """
+        if self.processPool == None:
+            self.processPool = ProcessPool("JobCreator.JobCreatorWorker",
+                                           totalSlaves = self.creatorSlaves,
+                                           componentDir = self.config.JobCreator.componentDir,
+                                           config = self.config,
+                                           inPort = self.poolInPort,
+                                           outPort = self.poolOutPort)
+
+        subscriptions = self.subscriptionsByWorkflow.execute()
+        work = []
+        for workflowID in sorted(subscriptions.keys()):
+            work.append({'workflow': workflowID,
+                         'subscriptions': subscriptions[workflowID]})
+
+        if len(work) == 0:
+            return
+
+        try:
+            self.processPool.enqueue(work)
+            results = self.processPool.dequeue(totalItems = len(work))
+        except Exception as ex:
+            # The pool shuts itself down when a worker fails,
+            # start a new one in the next cycle
+            self.processPool = None
+            msg =  "Failure while creating jobs in the process pool\n"
+            msg += str(ex)
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            raise JobCreatorException(msg)
 
-            logging.debug("Have loaded subscription %i with workflow %i\n" % (subscriptionID, workflow.id))
+        if len(results) < len(work):
+            self.processPool = None
+            msg = "Only %i out of %i workflows were processed by the process pool" \
+                  % (len(results), len(work))
+            logging.error(msg)
+            raise JobCreatorException(msg)
+
+        totalJobs = 0
+        for result in results:
+            totalJobs += result.get('jobs', 0)
+        logging.info("Process pool created %i jobs for %i workflows" % (totalJobs, len(work)))
+        return
+
+    def processSubscription(self, subscriptionID):
+        """
+        _processSubscription_
+
+        Split the available files of a single subscription into jobs, create
+        their work areas and job packages and advance them to created.
+
+        Returns the number of jobs that were created.
+        """
+        myThread = threading.currentThread()
+        totalJobs = 0
+
+        wmbsSubscription = Subscription(id = subscriptionID)
+        try:
+            wmbsSubscription.load()
+        except IndexError:
+            # This happens when the subscription no longer exists
+            # i.e., someone executed a kill() function on the database
+            # while the JobCreator was in cycle
+            # Ignore this subscription
+            msg = "JobCreator cannot load subscription %i" % subscriptionID
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            return 0
+
+        workflow         = Workflow(id = wmbsSubscription["workflow"].id)
+        workflow.load()
+        wmbsSubscription['workflow'] = workflow
+        wmWorkload       = retrieveWMSpec(workflow = workflow)
+
+        if not workflow.task or not wmWorkload:
+            # Then we have a problem
+            # We NEED a sandbox
+            # Abort this subscription!
+            # But do NOT fail
+            # We have no way of marking a subscription as bad per se
+            # We'll have to just keep skipping it
+            msg = "Have no task for workflow %i\n" % (workflow.id)
+            msg += "Aborting Subscription %i" % (subscriptionID)
+            logging.error(msg)
+            self.sendAlert(1, msg = msg)
+            return 0
+
+        logging.debug("Have loaded subscription %i with workflow %i\n" % (subscriptionID, workflow.id))
 
-            # Set task object
-            wmTask = wmWorkload.getTaskByPath(workflow.task)
+        # Set task object
+        wmTask = wmWorkload.getTaskByPath(workflow.task)
 
-            # Get generators
-            # If you fail to load the generators, pass on the job
+        # Get generators
+        # If you fail to load the generators, pass on the job
+        try:
+            if hasattr(wmTask.data, 'generators'):
+                manager    = GeneratorManager(wmTask)
+                seederList = manager.getGeneratorList()
+            else:
+                seederList = []
+        except Exception as ex:
+            msg =  "Had failure loading generators for subscription %i\n" % (subscriptionID)
+            msg += "Exception: %s\n" % str(ex)
+            msg += "Passing over this error.  It will reoccur next interation!\n"
+            msg += "Please check or remove this subscription!\n"
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            return 0
+
+        logging.debug("Going to call wmbsJobFactory for sub %i with limit %i" % (subscriptionID, self.limit))
+
+        splitParams = retrieveJobSplitParams(wmWorkload, workflow.task)
+        logging.debug("Split Params: %s" % splitParams)
+
+        # My hope is that the job factory is smart enough only to split un-split jobs
+        splitterFactory = SplitterFactory(splitParams.get('algo_package', "WMCore.JobSplitting"))
+        wmbsJobFactory = splitterFactory(package = "WMCore.WMBS",
+                                         subscription = wmbsSubscription,
+                                         generators=seederList,
+                                         limit = self.limit)
+
+        # Turn on the jobFactory
+        wmbsJobFactory.open()
+
+        # Create a generator to hold it, it stops after maxChunks passes
+        # and the rest of the subscription is split in the next cycles
+        jobSplittingFunction = wmbsJobFactory.iterate(maxChunks = self.maxChunks,
+                                                      **splitParams)
+
+        # Now we get to find out how many jobs there are.
+        jobNumber = self.countJobs.execute(workflow = workflow.id,
+                                           conn = myThread.transaction.conn,
+                                           transaction = True)
+        jobNumber += splitParams.get('initial_lfn_counter', 0)
+        logging.debug("Have %i jobs for workflow %s already in database." % (jobNumber, workflow.name))
+
+        continueSubscription = True
+        while continueSubscription:
+            # This loop runs over the jobFactory,
+            # using yield statements and a pre-existing proxy to
+            # generate and process new jobs
+
+            # First we need the jobs.
+            myThread.transaction.begin()
+            try:
+                wmbsJobGroups = jobSplittingFunction.next()
+                logging.info("Retrieved %i jobGroups from jobSplitter" % (len(wmbsJobGroups)))
+            except StopIteration:
+                # If you receive a stopIteration, we're done
+                logging.info("Completed iteration over subscription %i" % (subscriptionID))
+                continueSubscription = False
+                myThread.transaction.commit()
+                break
+
+            # If we have no jobGroups, we're done
+            if len(wmbsJobGroups) == 0:
+                logging.info("Found end in iteration over subscription %i" % (subscriptionID))
+                continueSubscription = False
+                myThread.transaction.commit()
+                break
+
+
+            # Assemble a dict of all the info
+            processDict = {'workflow': workflow,
+                           'wmWorkload': wmWorkload, 'wmTaskName': wmTask.getPathName(),
+                           'jobNumber': jobNumber, 'sandbox': wmTask.data.input.sandbox,
+                           'owner': wmWorkload.getOwner().get('name', None),
+                           'ownerDN': wmWorkload.getOwner().get('dn', None),
+                           'ownerGroup': wmWorkload.getOwner().get('vogroup', ''),
+                           'ownerRole': wmWorkload.getOwner().get('vorole', ''),
+                           'numberOfCores': 1,}
+            try:
+                maxCores = 1
+                stepNames = wmTask.listAllStepNames()
+                for stepName in stepNames:
+                    sh = wmTask.getStep(stepName)
+                    maxCores = max(maxCores, sh.getNumberOfCores())
+                processDict.update({'numberOfCores' : maxCores})
+            except AttributeError:
+                logging.info("Failed to read multicore settings from task %s" % wmTask.getPathName())
+
+            tempSubscription = Subscription(id = wmbsSubscription['id'])
+
+            nameDictList = []
+            for wmbsJobGroup in wmbsJobGroups:
+                # For each jobGroup, put a dictionary
+                # together and run it with creatorProcess
+                jobsInGroup               = len(wmbsJobGroup.jobs)
+                wmbsJobGroup.subscription = tempSubscription
+                tempDict = {}
+                tempDict.update(processDict)
+                tempDict['jobGroup']  = wmbsJobGroup
+                tempDict['swVersion'] = wmTask.getSwVersion()
+                tempDict['scramArch'] = wmTask.getScramArch()
+                tempDict['jobNumber'] = jobNumber
+                tempDict['agentNumber'] = self.agentNumber
+                tempDict['useJobCacheStore'] = self.useJobCacheStore
+
+                jobGroup = creatorProcess(work = tempDict,
+                                          jobCacheDir = self.jobCacheDir)
+                jobNumber += jobsInGroup
+                totalJobs += jobsInGroup
+
+                # Set jobCache for group
+                for job in jobGroup.jobs:
+                    nameDictList.append({'jobid':job['id'],
+                                         'cacheDir':job['cache_dir']})
+                    job["user"] = wmWorkload.getOwner()["name"]
+                    job["group"] = wmWorkload.getOwner()["group"]
+            # Set the caches in the database
             try:
-                if hasattr(wmTask.data, 'generators'):
-                    manager    = GeneratorManager(wmTask)
-                    seederList = manager.getGeneratorList()
-                else:
-                    seederList = []
+                if len(nameDictList) > 0:
+                    self.setBulkCache.execute(jobDictList = nameDictList,
+                                              conn = myThread.transaction.conn,
+                                              transaction = True)
+            except WMException:
+                raise
             except Exception as ex:
-                msg =  "Had failure loading generators for subscription %i\n" % (subscriptionID)
-                msg += "Exception: %s\n" % str(ex)
-                msg += "Passing over this error.  It will reoccur next interation!\n"
-                msg += "Please check or remove this subscription!\n"
+                msg =  "Unknown exception while setting the bulk cache:\n"
+                msg += str(ex)
                 logging.error(msg)
                 self.sendAlert(6, msg = msg)
-                continue
-
-            logging.debug("Going to call wmbsJobFactory for sub %i with limit %i" % (subscriptionID, self.limit))
-
-            splitParams = retrieveJobSplitParams(wmWorkload, workflow.task)
-            logging.debug("Split Params: %s" % splitParams)
-
-            # My hope is that the job factory is smart enough only to split un-split jobs
-            splitterFactory = SplitterFactory(splitParams.get('algo_package', "WMCore.JobSplitting"))
-            wmbsJobFactory = splitterFactory(package = "WMCore.WMBS",
-                                             subscription = wmbsSubscription,
-                                             generators=seederList,
-                                             limit = self.limit)
-
-            # Turn on the jobFactory
-            wmbsJobFactory.open()
-
-            # Create a function to hold it
-            jobSplittingFunction = runSplitter(jobFactory = wmbsJobFactory,
-                                               splitParams = splitParams)
-
-            # Now we get to find out how many jobs there are.
-            jobNumber = self.countJobs.execute(workflow = workflow.id,
-                                               conn = myThread.transaction.conn,
-                                               transaction = True)
-            jobNumber += splitParams.get('initial_lfn_counter', 0)
-            logging.debug("Have %i jobs for workflow %s already in database." % (jobNumber, workflow.name))
-
-            continueSubscription = True
-            while continueSubscription:
-                # This loop runs over the jobFactory,
-                # using yield statements and a pre-existing proxy to
-                # generate and process new jobs
-
-                # First we need the jobs.
-                myThread.transaction.begin()
-                try:
-                    wmbsJobGroups = jobSplittingFunction.next()
-                    logging.info("Retrieved %i jobGroups from jobSplitter" % (len(wmbsJobGroups)))
-                except StopIteration:
-                    # If you receive a stopIteration, we're done
-                    logging.info("Completed iteration over subscription %i" % (subscriptionID))
-                    continueSubscription = False
-                    myThread.transaction.commit()
-                    break
-
-                # If we have no jobGroups, we're done
-                if len(wmbsJobGroups) == 0:
-                    logging.info("Found end in iteration over subscription %i" % (subscriptionID))
-                    continueSubscription = False
-                    myThread.transaction.commit()
-                    break
-
-
-                # Assemble a dict of all the info
-                processDict = {'workflow': workflow,
-                               'wmWorkload': wmWorkload, 'wmTaskName': wmTask.getPathName(),
-                               'jobNumber': jobNumber, 'sandbox': wmTask.data.input.sandbox,
-                               'owner': wmWorkload.getOwner().get('name', None),
-                               'ownerDN': wmWorkload.getOwner().get('dn', None),
-                               'ownerGroup': wmWorkload.getOwner().get('vogroup', ''),
-                               'ownerRole': wmWorkload.getOwner().get('vorole', ''),
-                               'numberOfCores': 1,}
-                try:
-                    maxCores = 1
-                    stepNames = wmTask.listAllStepNames()
-                    for stepName in stepNames:
-                        sh = wmTask.getStep(stepName)
-                        maxCores = max(maxCores, sh.getNumberOfCores())
-                    processDict.update({'numberOfCores' : maxCores})
-                except AttributeError:
-                    logging.info("Failed to read multicore settings from task %s" % wmTask.getPathName())
-
-                tempSubscription = Subscription(id = wmbsSubscription['id'])
-
-                nameDictList = []
-                for wmbsJobGroup in wmbsJobGroups:
-                    # For each jobGroup, put a dictionary
-                    # together and run it with creatorProcess
-                    jobsInGroup               = len(wmbsJobGroup.jobs)
-                    wmbsJobGroup.subscription = tempSubscription
-                    tempDict = {}
-                    tempDict.update(processDict)
-                    tempDict['jobGroup']  = wmbsJobGroup
-                    tempDict['swVersion'] = wmTask.getSwVersion()
-                    tempDict['scramArch'] = wmTask.getScramArch()
-                    tempDict['jobNumber'] = jobNumber
-                    tempDict['agentNumber'] = self.agentNumber
-
-                    jobGroup = creatorProcess(work = tempDict,
-                                              jobCacheDir = self.jobCacheDir)
-                    jobNumber += jobsInGroup
-
-                    # Set jobCache for group
-                    for job in jobGroup.jobs:
-                        nameDictList.append({'jobid':job['id'],
-                                             'cacheDir':job['cache_dir']})
-                        job["user"] = wmWorkload.getOwner()["name"]
-                        job["group"] = wmWorkload.getOwner()["group"]
-                # Set the caches in the database
-                try:
-                    if len(nameDictList) > 0:
-                        self.setBulkCache.execute(jobDictList = nameDictList,
-                                                  conn = myThread.transaction.conn,
-                                                  transaction = True)
-                except WMException:
-                    raise
-                except Exception as ex:
-                    msg =  "Unknown exception while setting the bulk cache:\n"
-                    msg += str(ex)
-                    logging.error(msg)
-                    self.sendAlert(6, msg = msg)
-                    logging.debug("Error while setting bulkCache with following values: %s\n" % nameDictList)
-                    raise JobCreatorException(msg)
-
-                # Advance the jobGroup in changeState
-                for wmbsJobGroup in wmbsJobGroups:
-                    self.advanceJobGroup(wmbsJobGroup = wmbsJobGroup)
-
-                # Now end the transaction so that everything is wrapped
-                # in a single rollback
-                myThread.transaction.commit()
+                logging.debug("Error while setting bulkCache with following values: %s\n" % nameDictList)
+                raise JobCreatorException(msg)
 
+            # Advance the jobGroup in changeState
+            for wmbsJobGroup in wmbsJobGroups:
+                self.advanceJobGroup(wmbsJobGroup = wmbsJobGroup)
 
-            # END: While loop over jobFactory
+            # Now end the transaction so that everything is wrapped
+            # in a single rollback
+            myThread.transaction.commit()
 
-            # Close the jobFactory
-            wmbsJobFactory.close()
 
-        return
+        # END: While loop over jobFactory
+
+        if not wmbsJobFactory.exhausted:
+            logging.info("Reached %i chunks for subscription %i, will resume next cycle" \
+                         % (self.maxChunks, subscriptionID))
+
+        # Close the jobFactory
+        wmbsJobFactory.close()
+
+        return totalJobs
 
 
 # This is the code for the multiprocessing based queue retrieval system
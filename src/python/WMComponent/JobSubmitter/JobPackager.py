@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+_JobPackager_
+
+Write the job packages of the JobSubmitter, either in the calling process or
+in a pool of worker processes.
+
+Building a package is the only part of the job cache refresh that needs the
+full job objects: they are unpickled from the job cache, converted and
+pickled again into the package.  The workers do that from the job cache
+directories they are given, the JobSubmitter itself only reads the submit
+summaries of the jobs.
+"""
+
+import os
+import logging
+
+from WMCore.DataStructs.JobPackage    import JobPackage
+from WMCore.DataStructs.JobCacheStore import loadJob
+from WMCore.ProcessPool.WorkerPool    import WorkerPool
+from WMCore.WMException               import WMException
+
+class JobPackagerException(WMException):
+    """
+    _JobPackagerException_
+
+    A job of a package could not be loaded.
+    """
+    pass
+
+def writeJobPackage(batchDir, jobs, stores = None):
+    """
+    _writeJobPackage_
+
+    Load the given jobs, a list of (cache directory, retry count) tuples,
+    from the job cache and save them as the JobPackage of batchDir.  The
+    package is written to a temporary file and renamed, so it is never seen
+    half written.
+    """
+    jobPackage = JobPackage(directory = batchDir)
+    for cacheDir, retryCount in jobs:
+        loadedJob = loadJob(cacheDir, stores)
+        if loadedJob == None:
+            raise JobPackagerException("Could not find cached jobObject in %s" % cacheDir)
+        loadedJob['retry_count'] = retryCount
+        jobPackage[loadedJob["id"]] = loadedJob.getDataStructsJob()
+
+    if not os.path.exists(batchDir):
+        os.makedirs(batchDir)
+
+    packagePath = os.path.join(batchDir, "JobPackage.pkl")
+    tempPath = "%s.%i.tmp" % (packagePath, os.getpid())
+    jobPackage.save(tempPath)
+    os.rename(tempPath, packagePath)
+    return
+
+def packageJobs(work):
+    """
+    _packageJobs_
+
+    Write a job package in a worker process.
+    """
+    batchDir, jobs = work
+    stores = {}
+    try:
+        writeJobPackage(batchDir, jobs, stores)
+    finally:
+        for store in stores.values():
+            store.close()
+    return batchDir
+
+class JobPackagerPool:
+    """
+    _JobPackagerPool_
+
+    Pool of processes writing job packages.  Packages are written while the
+    JobSubmitter goes on reading the submit summaries of the next jobs,
+    wait() has to be called before the jobs are submitted.
+    """
+    def __init__(self, nProc, timeout = 600):
+        self.pool    = WorkerPool(packageJobs, nProc, timeout)
+        self.pending = {}
+        return
+
+    def submit(self, batchDir, jobs):
+        """
+        _submit_
+
+        Queue a package for writing.
+        """
+        self.pending[batchDir] = jobs
+        self.pool.submit(batchDir, (batchDir, jobs))
+        return
+
+    def wait(self, stores = None):
+        """
+        _wait_
+
+        Wait for all the queued packages to be written.  Packages the workers
+        failed to write, or that were abandoned because they were not written
+        in time, are written in this process.
+        """
+        results = self.pool.collect(self.pending.keys())
+        for batchDir, jobs in self.pending.items():
+            result, error = results.get(batchDir, (None, None))
+            if result != None:
+                continue
+            if error != None:
+                logging.error("Job packager failed on %s: %s" % (batchDir, error))
+            else:
+                logging.error("Job packager abandoned %s, writing it here" % batchDir)
+            writeJobPackage(batchDir, jobs, stores)
+
+        self.pending = {}
+        return
+
+    def close(self):
+        """
+        _close_
+
+        Stop the worker processes.
+        """
+        self.pool.close()
+        self.pending = {}
+        return
@@ -10,11 +10,12 @@ _JobSubmitterPoller_t_
 Submit jobs for execution.
 """
 
+import time
+import heapq
 import random
 import logging
 import threading
 import os.path
-import cPickle
 
 # WMBS objects
 from WMCore.DAOFactory        import DAOFactory
@@ -23,10 +24,11 @@ from WMCore.WMExceptions      import WMJobErrorCodes
 from WMCore.JobStateMachine.ChangeState       import ChangeState
 from WMCore.WorkerThreads.BaseWorkerThread    import BaseWorkerThread
 from WMCore.ResourceControl.ResourceControl   import ResourceControl
-from WMCore.DataStructs.JobPackage            import JobPackage
+from WMCore.DataStructs.JobCacheStore         import loadSubmitSummary
 from WMCore.FwkJobReport.Report               import Report
 from WMCore.WMException                       import WMException
 from WMCore.BossAir.BossAirAPI                import BossAirAPI
+from WMComponent.JobSubmitter.JobPackager     import JobPackagerPool, writeJobPackage
 
 def siteListCompare(a, b):
     """
@@ -99,6 +101,11 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.collSize           = getattr(self.config.JobSubmitter, 'collectionSize',
                                           self.packageSize * 1000)
 
+        # Job packages are written by a pool of processes if packagerProcesses > 0
+        self.packagerProcesses  = getattr(self.config.JobSubmitter, 'packagerProcesses', 0)
+        self.jobPackager        = None
+        self.jobCacheStores     = {}
+
         # initialize the alert framework (if available)
         self.initAlerts(compName = "JobSubmitter")
 
@@ -129,8 +136,13 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.setFWJRPathAction = self.daoFactory(classname = "Jobs.SetFWJRPath")
         self.listWorkflows = self.daoFactory(classname = "Workflow.ListForSubmitter")
 
-        # Keep a record of the thresholds in memory
+        # Keep a record of the thresholds in memory, they can be taken from
+        # a snapshot up to thresholdSnapshotAge seconds old
         self.currentRcThresholds = {}
+        self.thresholdSnapshotAge = getattr(self.config.JobSubmitter, 'thresholdSnapshotAge', 0)
+
+        # Time spent in each step of the last polling cycle
+        self.cycleTimes = {}
 
         return
 
@@ -173,10 +185,13 @@ class JobSubmitterPoller(BaseWorkerThread):
         _addJobsToPackage_
 
         Add a job to a job package and then return the batch ID for the job.
-        Packages are only written out to disk when they contain 100 jobs.  The
-        flushJobsPackages() method must be called after all jobs have been added
-        to the cache and before they are actually submitted to make sure all the
-        job packages have been written to disk.
+        loadedJob only needs the id, retry_count, workflow, sandbox and
+        cache_dir of the job, the full job is loaded from the job cache when
+        the package is written.  Packages are only written out to disk when
+        they contain 100 jobs.  The flushJobPackages() method must be called
+        after all jobs have been added to the cache and before they are
+        actually submitted to make sure all the job packages have been written
+        to disk.
         """
         if loadedJob["workflow"] not in self.jobsToPackage:
             # First, let's pull all the information from the loadedJob
@@ -189,45 +204,57 @@ class JobSubmitterPoller(BaseWorkerThread):
                                            'PackageCollection_%i' % collectionIndex,
                                            'batch_%s' % batchid)
 
-            # Now create the package object
+            # Now create the package
             self.jobsToPackage[loadedJob["workflow"]] = {"batchid": batchid,
                                                          'id': loadedJob['id'],
-                                                         "package": JobPackage(directory = collectionDir)}
-
-        jobPackage = self.jobsToPackage[loadedJob["workflow"]]["package"]
-        jobPackage[loadedJob["id"]] = loadedJob.getDataStructsJob()
-        batchDir = jobPackage['directory']
+                                                         "directory": collectionDir,
+                                                         "jobs": []}
 
-        if len(jobPackage.keys()) == self.packageSize:
-            if not os.path.exists(batchDir):
-                os.makedirs(batchDir)
+        jobPackage = self.jobsToPackage[loadedJob["workflow"]]
+        jobPackage["jobs"].append((loadedJob["cache_dir"], loadedJob["retry_count"]))
+        batchDir = jobPackage["directory"]
 
-            batchPath = os.path.join(batchDir, "JobPackage.pkl")
-            jobPackage.save(batchPath)
+        # The directory is part of the package, as in JobPackage
+        if len(jobPackage["jobs"]) + 1 == self.packageSize:
+            self.writeJobPackage(batchDir, jobPackage["jobs"])
             del self.jobsToPackage[loadedJob["workflow"]]
 
         return batchDir
 
+    def writeJobPackage(self, batchDir, jobs):
+        """
+        _writeJobPackage_
+
+        Write a job package to disk, or queue it for the packager processes.
+        """
+        if self.packagerProcesses > 0 and self.jobPackager == None:
+            self.jobPackager = JobPackagerPool(self.packagerProcesses)
+
+        if self.jobPackager != None:
+            self.jobPackager.submit(batchDir, jobs)
+        else:
+            writeJobPackage(batchDir, jobs, self.jobCacheStores)
+        return
+
     def flushJobPackages(self):
         """
         _flushJobPackages_
 
-        Write any jobs packages to disk that haven't been written out already.
+        Write any jobs packages to disk that haven't been written out already
+        and wait for the packager processes to write theirs.
         """
         workflowNames = self.jobsToPackage.keys()
         for workflowName in workflowNames:
-            batchID    = self.jobsToPackage[workflowName]["batchid"]
-            id         = self.jobsToPackage[workflowName]["id"]
-            jobPackage = self.jobsToPackage[workflowName]["package"]
-            batchDir   = jobPackage['directory']
-
-            if not os.path.exists(batchDir):
-                os.makedirs(batchDir)
-
-            batchPath = os.path.join(batchDir, "JobPackage.pkl")
-            jobPackage.save(batchPath)
+            jobPackage = self.jobsToPackage[workflowName]
+            self.writeJobPackage(jobPackage["directory"], jobPackage["jobs"])
             del self.jobsToPackage[workflowName]
 
+        if self.jobPackager != None:
+            self.jobPackager.wait(self.jobCacheStores)
+
+        for store in self.jobCacheStores.values():
+            store.close()
+        self.jobCacheStores = {}
         return
 
     def refreshCache(self):
@@ -238,6 +265,10 @@ class JobSubmitterPoller(BaseWorkerThread):
         from the query, check if they already exist in the cache.  If they
         don't, unpickle them and combine their site white and black list with
         the list of locations they can run at.  Add them to the cache.
+        Only the submit summaries of the jobs are read, from the JobCacheStore
+        of their JobCollection, or from their job.pkl if they were cached by
+        an older JobCreator.  The full jobs are loaded when their packages
+        are written, in the packager processes if there are any.
 
         Each entry in the cache is a tuple with five items:
           - WMBS Job ID
@@ -271,24 +302,21 @@ class JobSubmitterPoller(BaseWorkerThread):
             if jobCount % 5000 == 0:
                 logging.info("Processed %d/%d new jobs." % (jobCount, len(newJobs)))
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.error("Could not find pickled jobObject %s" % pickledJobPath)
-                badJobs[61103].append(newJob)
-                continue
             try:
-                jobHandle = open(pickledJobPath, "r")
-                loadedJob = cPickle.load(jobHandle)
-                jobHandle.close()
+                loadedJob = loadSubmitSummary(newJob["cache_dir"], self.jobCacheStores)
             except Exception as ex:
-                msg =  "Error while loading pickled job object %s\n" % pickledJobPath
+                msg =  "Error while loading cached job object %s\n" % newJob["cache_dir"]
                 msg += str(ex)
                 logging.error(msg)
                 self.sendAlert(6, msg = msg)
                 raise JobSubmitterPollerException(msg)
 
+            if loadedJob == None:
+                # Then we have a problem - there's no file
+                logging.error("Could not find cached jobObject in %s" % newJob["cache_dir"])
+                badJobs[61103].append(newJob)
+                continue
+
             loadedJob['retry_count'] = newJob['retry_count']
 
             siteWhitelist = loadedJob.get("siteWhitelist", [])
@@ -314,7 +342,7 @@ class JobSubmitterPoller(BaseWorkerThread):
                 possibleLocations = set()
 
                 # all files in job have same location (in se names)
-                rawLocations = loadedJob["input_files"][0]["locations"]
+                rawLocations = loadedJob["inputLocations"]
 
                 # transform se names into site names
                 for loc in rawLocations:
@@ -390,14 +418,6 @@ class JobSubmitterPoller(BaseWorkerThread):
 
                 locTypeCache[workflowName].add(jobID)
 
-            # allow job baggage to override numberOfCores
-            #       => used for repacking to get more slots/disk
-            numberOfCores = loadedJob.get('numberOfCores', 1)
-            if numberOfCores == 1:
-                baggage = loadedJob.getBaggage()
-                numberOfCores = getattr(baggage, "numberOfCores", 1)
-            loadedJob['numberOfCores'] = numberOfCores
-
             # Now that we're out of that loop, put the job data in the cache
             jobInfo = (jobID,
                        newJob["retry_count"],
@@ -419,7 +439,8 @@ class JobSubmitterPoller(BaseWorkerThread):
                        newJob['task_name'],
                        frozenset(potentialLocations),
                        loadedJob.get("numberOfCores", 1),
-                       newJob['task_id']
+                       newJob['task_id'],
+                       newJob['type']
                        )
 
             self.jobDataCache[workflowName][jobID] = jobInfo
@@ -442,17 +463,12 @@ class JobSubmitterPoller(BaseWorkerThread):
         if len(jobIDsToPurge) == 0:
             return
 
-        for siteName in self.cachedJobs.keys():
-            for taskType in self.cachedJobs[siteName].keys():
-                for workflow in self.cachedJobs[siteName][taskType].keys():
-                    for cachedJobID in list(self.cachedJobs[siteName][taskType][workflow]):
-                        if cachedJobID in jobIDsToPurge:
-                            self.cachedJobs[siteName][taskType][workflow].remove(cachedJobID)
-                            try:
-                                del self.jobDataCache[workflow][cachedJobID]
-                            except KeyError:
-                                # Already gone
-                                pass
+        for workflow in self.jobDataCache.keys():
+            for cachedJobID in jobIDsToPurge.intersection(self.jobDataCache[workflow].keys()):
+                cachedJob = self.jobDataCache[workflow].pop(cachedJobID)
+                self.removeCachedJob(cachedJobID, cachedJob[8], cachedJob[21], workflow)
+            if len(self.jobDataCache[workflow]) == 0:
+                del self.jobDataCache[workflow]
 
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
@@ -493,7 +509,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         task type.  Each task type will contain a list of tuples where each
         tuple contains teh site name and the number of running jobs.
         """
-        rcThresholds = self.resourceControl.listThresholdsForSubmit()
+        rcThresholds = self.resourceControl.listThresholdsForSubmit(maxAge = self.thresholdSnapshotAge)
 
         newDrainSites = set()
         newAbortSites = set()
@@ -544,6 +560,28 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         return
 
+    def removeCachedJob(self, jobID, siteNames, taskType, workflow):
+        """
+        _removeCachedJob_
+
+        Remove a job from the cache of the given sites, the possible locations
+        stored with the job, dropping the cache entries that become empty.
+        """
+        for siteName in siteNames:
+            siteCache = self.cachedJobs.get(siteName, {})
+            taskCache = siteCache.get(taskType, {})
+            if workflow not in taskCache:
+                continue
+            taskCache[workflow].discard(jobID)
+            if len(taskCache[workflow]) == 0:
+                del taskCache[workflow]
+                if len(taskCache) == 0:
+                    del siteCache[taskType]
+                    if len(siteCache) == 0:
+                        del self.cachedJobs[siteName]
+        self.cachedJobIDs.discard(jobID)
+        return
+
     def assignJobLocations(self):
         """
         _assignJobLocations_
@@ -557,11 +595,14 @@ class JobSubmitterPoller(BaseWorkerThread):
           - Path to sanbox
           - Path to cache directory
           - SE name of the site to run at
+
+        The workflows of a site and task type are taken from a heap ordered by
+        priority and timestamp.  A job is removed from the cache of all its
+        sites as soon as it's assigned to one of them.
         """
         jobsToSubmit = {}
-        jobsToPrune = {}
         jobsCount = 0
-        exitLoop = False 
+        exitLoop = False
 
         for siteName in self.sortedSites:
             if exitLoop:
@@ -624,79 +665,37 @@ class JobSubmitterPoller(BaseWorkerThread):
 
                 taskCache = self.cachedJobs[siteName][taskType]
 
+                # Workflows by priority, then by timestamp
+                workflowQueue = [(-self.workflowPrios.get(x, 0), self.workflowTimestamps.get(x, 0), x)
+                                 for x in taskCache.keys()]
+                heapq.heapify(workflowQueue)
+
                 # Calculate number of jobs we need
                 nJobsRequired = min(totalPendingSlots - totalPending, taskPendingSlots - taskPending)
-                breakLoop = False
                 logging.debug("nJobsRequired for task %s: %i" % (taskType, nJobsRequired))
 
                 while nJobsRequired > 0:
                     # Do this until we have all the jobs for this threshold
 
-                    # Pull a job out of the cache for the task/site.  Verify that we
-                    # haven't already used this job in this polling cycle.
-                    cachedJob = None
-                    cachedJobWorkflow = None
-
-                    workflows = taskCache.keys()
-                    # Sorting by prio and timestamp on the subscription
-                    def sortingCmp(x, y):
-                        if (x not in self.workflowTimestamps) or (y not in self.workflowTimestamps):
-                            return -1
-                        if (x not in self.workflowPrios) or (y not in self.workflowPrios):
-                            return -1
-                        if self.workflowPrios[x] > self.workflowPrios[y]:
-                            return -1
-                        elif self.workflowPrios[x] == self.workflowPrios[y]:
-                            return cmp(self.workflowTimestamps[x], self.workflowTimestamps[y])
-                        else:
-                            return 1
-                    workflows.sort(cmp = sortingCmp)
-
-                    for workflow in workflows:
-                        # Run a while loop until you get a job
-                        while len(taskCache[workflow]) > 0:
-                            cachedJobID = taskCache[workflow].pop()
-                            try:
-                                cachedJob   = self.jobDataCache[workflow].get(cachedJobID, None)
-                                del self.jobDataCache[workflow][cachedJobID]
-                            except:
-                                pass
-
-                            if cachedJobID not in jobsToPrune.get(workflow, set()):
-                                cachedJobWorkflow = workflow
-                                break
-                            else:
-                                cachedJob = None
-
-                        # Remove the entry in the cache for the workflow if it is empty.
-                        if len(self.cachedJobs[siteName][taskType][workflow]) == 0:
-                            del self.cachedJobs[siteName][taskType][workflow]
-                        if workflow in self.jobDataCache and len(self.jobDataCache[workflow].keys()) == 0:
-                            del self.jobDataCache[workflow]
-
-                        if cachedJob:
-                            # We found a job, bail out and handle it.
-                            break
-
-                    # Check to see if we need to delete this site from the cache
-                    if len(self.cachedJobs[siteName][taskType].keys()) == 0:
-                        del self.cachedJobs[siteName][taskType]
-                        breakLoop = True
-                    if len(self.cachedJobs[siteName].keys()) == 0:
-                        del self.cachedJobs[siteName]
-                        breakLoop = True
-
-                    if not cachedJob:
-                        # We didn't find a job, bail out.
+                    # Skip the workflows that ran out of jobs for the task/site
+                    while workflowQueue and workflowQueue[0][2] not in taskCache:
+                        heapq.heappop(workflowQueue)
+                    if not workflowQueue:
                         # This site and task type is done
                         break
 
-                    self.cachedJobIDs.remove(cachedJob[0])
-
-                    if cachedJobWorkflow not in jobsToPrune:
-                        jobsToPrune[cachedJobWorkflow] = set()
-
-                    jobsToPrune[cachedJobWorkflow].add(cachedJob[0])
+                    # Pull a job out of the cache for the task/site
+                    workflow = workflowQueue[0][2]
+                    cachedJobID = taskCache[workflow].pop()
+                    cachedJob = self.jobDataCache.get(workflow, {}).pop(cachedJobID, None)
+                    if workflow in self.jobDataCache and len(self.jobDataCache[workflow]) == 0:
+                        del self.jobDataCache[workflow]
+                    if cachedJob == None:
+                        # Not in the data cache, drop it from this site only
+                        logging.error("No cached data for job %i, skipping it" % cachedJobID)
+                        self.removeCachedJob(cachedJobID, [siteName], taskType, workflow)
+                        continue
+                    self.removeCachedJob(cachedJobID, cachedJob[8], taskType, workflow)
 
                     # Sort jobs by jobPackage
                     package = cachedJob[2]
@@ -741,7 +740,8 @@ class JobSubmitterPoller(BaseWorkerThread):
                     jobsToSubmit[package].append(jobDict)
                     jobsCount += 1
                     if jobsCount >= self.maxJobsPerPoll:
-                        breakLoop, exitLoop = True, True
+                        exitLoop = True
+                        break
 
                     # Deal with accounting
                     if len(possibleSites) == 1:
@@ -749,26 +749,18 @@ class JobSubmitterPoller(BaseWorkerThread):
                     totalPending  += 1
                     taskPending   += 1
 
-                    if breakLoop:
-                        break
-
-        # Remove the jobs that we're going to submit from the cache.
+        # Remove workflows from the timestamp and priority dictionaries which
+        # are not anymore in the cache
         allWorkflows = set()
         for siteName in self.cachedJobs.keys():
             for taskType in self.cachedJobs[siteName].keys():
-                for workflow in self.cachedJobs[siteName][taskType].keys():
-                    allWorkflows.add(workflow)
-                    if workflow in jobsToPrune.keys():
-                        self.cachedJobs[siteName][taskType][workflow] -= jobsToPrune[workflow]
-
-        # Remove workflows from the timestamp dictionary which are not anymore in the cache
-        workflowsWithTimestamp = self.workflowTimestamps.keys()
-        for workflow in workflowsWithTimestamp:
+                allWorkflows.update(self.cachedJobs[siteName][taskType].keys())
+
+        for workflow in self.workflowTimestamps.keys():
             if workflow not in allWorkflows:
                 del self.workflowTimestamps[workflow]
 
-        workflowsWithPrios = self.workflowPrios.keys()
-        for workflow in workflowsWithPrios:
+        for workflow in self.workflowPrios.keys():
             if workflow not in allWorkflows:
                 del self.workflowPrios[workflow]
 
@@ -828,6 +820,17 @@ class JobSubmitterPoller(BaseWorkerThread):
         myThread.transaction.commit()
         logging.info("Transaction cycle successfully completed.")
 
+        # The submitted jobs are now pending, count them in the threshold snapshot
+        if self.thresholdSnapshotAge > 0:
+            submittedIDs = set([x['id'] for x in successList])
+            jobCounts = {}
+            for job in jobList:
+                if job['id'] in submittedIDs:
+                    key = (job['custom']['location'], job['taskType'])
+                    jobCounts[key] = jobCounts.get(key, 0) + 1
+            for (siteName, taskType), nJobs in jobCounts.items():
+                self.resourceControl.changeJobCounts(siteName, taskType, pendingJobs = nJobs)
+
         return
 
 
@@ -857,10 +860,24 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         try:
             myThread = threading.currentThread()
+            startTime = time.time()
             self.getThresholds()
+            self.cycleTimes['getThresholds'] = time.time() - startTime
+
+            startTime = time.time()
             self.refreshCache()
+            self.cycleTimes['refreshCache'] = time.time() - startTime
+
+            startTime = time.time()
             jobsToSubmit = self.assignJobLocations()
+            self.cycleTimes['assignJobLocations'] = time.time() - startTime
+
+            startTime = time.time()
             self.submitJobs(jobsToSubmit = jobsToSubmit)
+            self.cycleTimes['submitJobs'] = time.time() - startTime
+
+            logging.info("JobSubmitter cycle took %.1fs: %s" % (sum(self.cycleTimes.values()),
+                                                               ", ".join(["%s %.1fs" % x for x in sorted(self.cycleTimes.items())])))
 
 
         except WMException:
@@ -889,4 +906,9 @@ class JobSubmitterPoller(BaseWorkerThread):
         Kill the code after one final pass when called by the master thread.
         """
         logging.debug("terminating. doing one more pass before we die")
-        self.algorithm(params)
+        try:
+            self.algorithm(params)
+        finally:
+            if self.jobPackager != None:
+                self.jobPackager.close()
+                self.jobPackager = None
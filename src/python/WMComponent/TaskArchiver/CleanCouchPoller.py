@@ -39,6 +39,8 @@ class CleanCouchPoller(BaseWorkerThread):
         # set the connection for local couchDB call
         self.useReqMgrForCompletionCheck   = getattr(self.config.TaskArchiver, 'useReqMgrForCompletionCheck', True)
         self.archiveDelayHours   = getattr(self.config.TaskArchiver, 'archiveDelayHours', 0)
+        # Must stay below the size of the couch queues (1000)
+        self.deleteBatchSize = getattr(self.config.TaskArchiver, 'couchDeleteBatchSize', 500)
         self.wmstatsCouchDB = WMStatsWriter(self.config.TaskArchiver.localWMStatsURL, 
                                             "WMStatsAgent")
         
@@ -148,19 +150,24 @@ class CleanCouchPoller(BaseWorkerThread):
                 return {'status': 'warning', 'message': "%s: %s" % (workflowName, str(ex))}
         else:
             options = {"startkey": [workflowName], "endkey": [workflowName, {}], "reduce": False}
+            # Page through the jobs and delete them a page at a time, big
+            # workflows have too many jobs to load them all at once
+            committed = []
+            queued = 0
             try:
-                jobs = couchDB.loadView(db, view, options = options)['rows']
+                for j in couchDB.iterView(db, view, options = options):
+                    doc = {}
+                    doc["_id"]  = j['value']['id']
+                    doc["_rev"] = j['value']['rev']
+                    couchDB.queueDelete(doc)
+                    queued += 1
+                    if queued % self.deleteBatchSize == 0:
+                        committed.extend(couchDB.commit())
             except Exception as ex:
                 errorMsg = "Error on loading jobs for %s" % workflowName
                 logging.warning("%s/n%s" % (str(ex), errorMsg))
                 return {'status': 'error', 'message': errorMsg}
-            
-            for j in jobs:
-                doc = {}
-                doc["_id"]  = j['value']['id']
-                doc["_rev"] = j['value']['rev']
-                couchDB.queueDelete(doc)
-            committed = couchDB.commit()
+            committed.extend(couchDB.commit() or [])
         
         if committed:
             #create the error report
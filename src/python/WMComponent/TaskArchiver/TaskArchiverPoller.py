@@ -217,6 +217,10 @@ class TaskArchiverPoller(BaseWorkerThread):
         self.histogramKeys  = getattr(self.config.TaskArchiver, "histogramKeys", [])
         self.histogramBins  = getattr(self.config.TaskArchiver, "histogramBins", 10)
         self.histogramLimit = getattr(self.config.TaskArchiver, "histogramLimit", 5.0)
+        # Performance rows read from couch per request and values kept per
+        # histogram to build it from
+        self.perfPageSize      = getattr(self.config.TaskArchiver, "perfPageSize", 1000)
+        self.perfReservoirSize = getattr(self.config.TaskArchiver, "perfReservoirSize", 10000)
         
         # Set defaults for reco performance reporting
         self.interestingPDs = getattr(config.TaskArchiver, "perfPrimaryDatasets", ['SingleMu', 'MuHad'])
@@ -836,119 +840,90 @@ class TaskArchiverPoller(BaseWorkerThread):
         _handleCouchPerformance_
 
         The couch performance stuff is convoluted enough I think I want to handle it separately.
+
+        The performance rows are read from couch a page at a time and summarized
+        as they come, with a RunningSummary per task, step and key, so only the
+        worst offenders and the histogram samples are kept in memory.
         """
-        perf = self.fwjrdatabase.loadView("FWJRDump", "performanceByWorkflowName",
-                                          options = {"startkey": [workflowName],
-                                                     "endkey": [workflowName],
-                                                     "stale" : "update_after"})['rows']
-                                                     
         failedJobs = self.getFailedJobs(workflowName)
 
-        taskList   = {}
-        finalTask  = {}
-
-        for row in perf:
-            taskName = row['value']['taskName']
-            stepName = row['value']['stepName']
-            if not taskName in taskList.keys():
+        taskList = {}
+        for row in self.fwjrdatabase.iterView("FWJRDump", "performanceByWorkflowName",
+                                              options = {"startkey": [workflowName],
+                                                         "endkey": [workflowName],
+                                                         "stale" : "update_after"},
+                                              pageSize = self.perfPageSize):
+            row = row['value']
+            taskName = row['taskName']
+            stepName = row['stepName']
+            if not taskName in taskList:
                 taskList[taskName] = {}
-            if not stepName in taskList[taskName].keys():
-                taskList[taskName][stepName] = []
-            value = row['value']
-            taskList[taskName][stepName].append(value)
+            if not stepName in taskList[taskName]:
+                # The summaries of all the jobs and of the failed jobs only
+                taskList[taskName][stepName] = {'jobTime': (self.newPerformanceSummary('jobTime'),
+                                                            self.newPerformanceSummary('jobTime', failed = True))}
+            output = taskList[taskName][stepName]
+            failed = row['jobID'] in failedJobs
 
-        for taskName in taskList.keys():
+            try:
+                row['jobTime'] = row.get('stopTime', None) - row.get('startTime', None)
+            except TypeError:
+                # One of those didn't have a real value
+                pass
+
+            for key in row:
+                if key in ['startTime', 'stopTime', 'taskName', 'stepName', 'jobID']:
+                    continue
+                if not key in output:
+                    output[key] = (self.newPerformanceSummary(key),
+                                   self.newPerformanceSummary(key, failed = True))
+                offender = {'jobID': row['jobID'], key: row[key]}
+                if 'retry_count' in row:
+                    offender['retry_count'] = row['retry_count']
+                try:
+                    value = float(row[key])
+                except TypeError:
+                    # Why do we get None values here?
+                    # We may want to look into it
+                    logging.debug("Got a None performance value for key %s" % key)
+                    if row[key] == None:
+                        output[key][0].add(0.0, offender)
+                        continue
+                    else:
+                        raise
+                output[key][0].add(value, offender)
+                if failed and output[key][1] != None:
+                    output[key][1].add(value)
+
+        finalTask = {}
+        for taskName in taskList:
             final = {}
-            for stepName in taskList[taskName].keys():
-                output = {'jobTime': []}
-                outputFailed = {'jobTime': []} # This will be same, but only for failed jobs
+            for stepName in taskList[taskName]:
                 final[stepName] = {}
-                masterList = []
-
-                # For each step put the data into a dictionary called output
-                # keyed by the name of the value
-                for row in taskList[taskName][stepName]:
-                    masterList.append(row)
-                    for key in row.keys():
-                        if key in ['startTime', 'stopTime', 'taskName', 'stepName', 'jobID']:
-                            continue
-                        if not key in output.keys():
-                            output[key] = []
-                            if len(failedJobs) > 0 :
-                                outputFailed[key] = []
-                        try:
-                            output[key].append(float(row[key]))
-                            if (row['jobID'] in failedJobs):
-                                outputFailed[key].append(float(row[key]))
-                                
-                        except TypeError:
-                            # Why do we get None values here?
-                            # We may want to look into it
-                            logging.debug("Got a None performance value for key %s" % key)
-                            if row[key] == None:
-                                output[key].append(0.0)
-                            else:
-                                raise
-                    try:
-                        jobTime = row.get('stopTime', None) - row.get('startTime', None)
-                        output['jobTime'].append(jobTime)
-                        row['jobTime'] = jobTime
-                        # Account job running time here only if the job has failed
-                        if (row['jobID'] in failedJobs):
-                            outputFailed['jobTime'].append(jobTime)
-                    except TypeError:
-                        # One of those didn't have a real value
-                        pass
-
-                # Now that we've sorted the data, we process it one key at a time
-                for key in output.keys():
+                # Now that we've summarized the data, we process it one key at a time
+                for key, (summary, failedSummary) in taskList[taskName][stepName].items():
                     final[stepName][key] = {}
                     # Assemble the 'worstOffenders'
                     # These are the top [self.nOffenders] in that particular category
                     # i.e., those with the highest values
-                    offenders = MathAlgos.getLargestValues(dictList = masterList, key = key,
-                                                           n = self.nOffenders)
+                    offenders = summary.getLargestEntries()
                     for x in offenders:
-                        try:
-                            logArchive = self.fwjrdatabase.loadView("FWJRDump", "logArchivesByJobID",
-                                                                    options = {"startkey": [x['jobID']],
-                                                                               "endkey": [x['jobID'],
-                                                                                          x['retry_count']],
-                                                                               "stale" : "update_after"})['rows'][0]['value']['lfn']
-                            logCollectID = self.jobsdatabase.loadView("JobDump", "jobsByInputLFN",
-                                                                      options = {"startkey": [workflowName, logArchive],
-                                                                                 "endkey": [workflowName, logArchive],
-                                                                                 "stale" : "update_after"})['rows'][0]['value']
-                            logCollect = self.fwjrdatabase.loadView("FWJRDump", "outputByJobID",
-                                                                    options = {"startkey": logCollectID,
-                                                                               "endkey": logCollectID,
-                                                                               "stale" : "update_after"})['rows'][0]['value']['lfn']
-                            x['logArchive'] = logArchive.split('/')[-1]
-                            x['logCollect'] = logCollect
-                        except IndexError as ex:
-                            logging.debug("Unable to find final logArchive tarball for %i" % x['jobID'])
-                            logging.debug(str(ex))
-                        except KeyError as ex:
-                            logging.debug("Unable to find final logArchive tarball for %i" % x['jobID'])
-                            logging.debug(str(ex))
-
+                        self.findOffenderLogs(workflowName, x)
 
                     if key in self.histogramKeys:
                         # Usual histogram that was always done
-                        histogram = MathAlgos.createHistogram(numList = output[key],
-                                                              nBins = self.histogramBins,
-                                                              limit = self.histogramLimit)
+                        histogram = summary.createHistogram(nBins = self.histogramBins,
+                                                            limit = self.histogramLimit)
                         final[stepName][key]['histogram'] = histogram
                         # Histogram only picking values from failed jobs
                         # Operators  can use it to find out quicker why a workflow/task/step is failing :
                         if len(failedJobs) > 0 :
-                            failedJobsHistogram = MathAlgos.createHistogram(numList = outputFailed[key],
-                                                                  nBins = self.histogramBins,
-                                                                  limit = self.histogramLimit)
-                                                        
+                            failedJobsHistogram = failedSummary.createHistogram(nBins = self.histogramBins,
+                                                                                limit = self.histogramLimit)
+
                             final[stepName][key]['errorsHistogram'] = failedJobsHistogram
                     else:
-                        average, stdDev = MathAlgos.getAverageStdDev(numList = output[key])
+                        average, stdDev = summary.getAverageStdDev()
                         final[stepName][key]['average'] = average
                         final[stepName][key]['stdDev']  = stdDev
 
@@ -960,18 +935,62 @@ class TaskArchiverPoller(BaseWorkerThread):
             finalTask[taskName] = final
         return finalTask
 
+    def newPerformanceSummary(self, key, failed = False):
+        """
+        _newPerformanceSummary_
+
+        Create the summary of a performance key.  Values are only sampled for
+        the histogram keys, the failed jobs are only summarized for those.
+        """
+        if not key in self.histogramKeys:
+            if failed:
+                return None
+            return MathAlgos.RunningSummary(nLargest = self.nOffenders)
+        if failed:
+            return MathAlgos.RunningSummary(reservoirSize = self.perfReservoirSize)
+        return MathAlgos.RunningSummary(nLargest = self.nOffenders,
+                                        reservoirSize = self.perfReservoirSize)
+
+    def findOffenderLogs(self, workflowName, offender):
+        """
+        _findOffenderLogs_
+
+        Add the logArchive and logCollect tarballs of a worst offender job.
+        """
+        try:
+            logArchive = self.fwjrdatabase.loadView("FWJRDump", "logArchivesByJobID",
+                                                    options = {"startkey": [offender['jobID']],
+                                                               "endkey": [offender['jobID'],
+                                                                          offender['retry_count']],
+                                                               "stale" : "update_after"})['rows'][0]['value']['lfn']
+            logCollectID = self.jobsdatabase.loadView("JobDump", "jobsByInputLFN",
+                                                      options = {"startkey": [workflowName, logArchive],
+                                                                 "endkey": [workflowName, logArchive],
+                                                                 "stale" : "update_after"})['rows'][0]['value']
+            logCollect = self.fwjrdatabase.loadView("FWJRDump", "outputByJobID",
+                                                    options = {"startkey": logCollectID,
+                                                               "endkey": logCollectID,
+                                                               "stale" : "update_after"})['rows'][0]['value']['lfn']
+            offender['logArchive'] = logArchive.split('/')[-1]
+            offender['logCollect'] = logCollect
+        except IndexError as ex:
+            logging.debug("Unable to find final logArchive tarball for %i" % offender['jobID'])
+            logging.debug(str(ex))
+        except KeyError as ex:
+            logging.debug("Unable to find final logArchive tarball for %i" % offender['jobID'])
+            logging.debug(str(ex))
+        return
+
     def getFailedJobs(self, workflowName):
         # We want ALL the jobs, and I'm sorry, CouchDB doesn't support wildcards, above-than-absurd values will do:
-        errorView = self.fwjrdatabase.loadView("FWJRDump", "errorsByWorkflowName",
-                                          options = {"startkey": [workflowName, 0, 0],
-                                                     "endkey": [workflowName, 999999999, 999999],
-                                                     "stale" : "update_after"})['rows']
-        failedJobs = []
-        for row in errorView:
-            jobId = row['value']['jobid']
-            if jobId not in failedJobs:
-                failedJobs.append(jobId)
-                
+        failedJobs = set()
+        for row in self.fwjrdatabase.iterView("FWJRDump", "errorsByWorkflowName",
+                                              options = {"startkey": [workflowName, 0, 0],
+                                                         "endkey": [workflowName, 999999999, 999999],
+                                                         "stale" : "update_after"},
+                                              pageSize = self.perfPageSize):
+            failedJobs.add(row['value']['jobid'])
+
         return failedJobs
 
     def publishRecoPerfToDashBoard(self, workload):
@@ -58,7 +58,8 @@ class WorkQueueManagerWMBSFileFeeder(BaseWorkerThread):
 
         # need to make sure jobs are created
         resources, jobCounts = freeSlots(minusRunning = True, allowedStates = ['Normal', 'Draining'],
-                              knownCmsSites = cmsSiteNames())
+                              knownCmsSites = cmsSiteNames(),
+                              snapshotAge = self.queue.params.get('ThresholdSnapshotAge', 0))
 
         for site in resources:
             self.queue.logger.info("I need %d jobs on site %s" % (resources[site], site))
@@ -14,7 +14,18 @@ class ConfigDBMap(ConfigDBMapInterface):
         if hasattr(config.CoreDatabase, "socket"):
             self.option["unix_socket"] = config.CoreDatabase.socket
         if hasattr(config.CoreDatabase, "engineParameters"):
-            self.option['engine_parameters'] = config.CoreDatabase.engineParameters
+            self.option['engine_parameters'] = dict(config.CoreDatabase.engineParameters)
+
+        # Connection pool tuning, explicit engineParameters take precedence
+        engineParameters = self.option.setdefault('engine_parameters', {})
+        for attrName, paramName in [("poolSize", "pool_size"),
+                                    ("maxOverflow", "max_overflow"),
+                                    ("poolTimeout", "pool_timeout"),
+                                    ("threadAffinity", "pool_threadlocal")]:
+            if hasattr(config.CoreDatabase, attrName):
+                engineParameters.setdefault(paramName, getattr(config.CoreDatabase, attrName))
+        if getattr(config.CoreDatabase, "prePing", False):
+            self.option["pre_ping"] = True
 
     def getDBUrl(self):
         return self.dbUrl
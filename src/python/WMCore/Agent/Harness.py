@@ -35,6 +35,7 @@ import traceback
 
 from WMCore.Agent.Daemon.Create import createDaemon
 from WMCore.Database.DBFactory import DBFactory
+from WMCore.Database import DAOProfiler
 from WMCore.Database.Transaction import Transaction
 from WMCore.WMException import WMException
 from WMCore.WMExceptions import WMEXCEPTION
@@ -158,6 +159,12 @@ class Harness:
             if not os.environ.get('WMCORE_CACHE_DIR'):
                 os.environ['WMCORE_CACHE_DIR'] = os.path.join(compSect.componentDir, '.wmcore_cache')
 
+            # Instrument the DAOs if requested, the statistics are dumped to
+            # the componentDir by the worker threads at the end of every cycle
+            if getattr(compSect, "profileDAOs", False):
+                logging.info(">>>Enabling DAO profiling")
+                DAOProfiler.enableProfiling()
+
             logging.info(">>>Starting: "+compName+'<<<')
             # check which backend to use: MySQL, Oracle, etc... for core
             # services.
@@ -8,6 +8,8 @@ be useful.
 """
 
 import math
+import heapq
+import random
 import decimal
 import logging
 
@@ -280,3 +282,94 @@ def calculateStdDevFromQ(Q, n):
     if not validateNumericInput(sigma): return 0.0
 
     return sigma
+
+class RunningSummary(object):
+    """
+    _RunningSummary_
+
+    Single pass summary of a stream of values: the running average and
+    standard deviation, a reservoir sample of the values to build histograms
+    from and the entries with the n largest values.  The memory used does not
+    depend on the number of values.
+    """
+    def __init__(self, nLargest = 0, reservoirSize = 0):
+        self.nValues = 0
+        self.average = 0.0
+        self.q       = 0.0
+
+        self.reservoirSize = reservoirSize
+        self.reservoir     = []
+        self.nSampled      = 0
+
+        # Min heap of (value, -position, entry), equal values keep their order
+        self.nLargest = nLargest
+        self.largest  = []
+        self.position = 0
+        return
+
+    def add(self, value, entry = None):
+        """
+        _add_
+
+        Add a value, with the entry to return if it is one of the largest.
+        NaN and inf values are not summarized.
+        """
+        if self.nLargest > 0:
+            self.position += 1
+            item = (value, -self.position, entry)
+            if len(self.largest) < self.nLargest:
+                heapq.heappush(self.largest, item)
+            elif item > self.largest[0]:
+                heapq.heapreplace(self.largest, item)
+
+        if math.isnan(value) or math.isinf(value):
+            return
+
+        # Knuth's running average and Q value, see calculateRunningAverageAndQValue
+        self.nValues += 1
+        delta = value - self.average
+        self.average += delta / self.nValues
+        self.q       += delta * (value - self.average)
+
+        if self.reservoirSize > 0:
+            self.nSampled += 1
+            if len(self.reservoir) < self.reservoirSize:
+                self.reservoir.append(value)
+            else:
+                index = random.randint(0, self.nSampled - 1)
+                if index < self.reservoirSize:
+                    self.reservoir[index] = value
+        return
+
+    def getAverageStdDev(self):
+        """
+        _getAverageStdDev_
+
+        Return the average and standard deviation of the values.
+        """
+        if self.nValues < 1:
+            return 0.0, 0.0
+        return self.average, calculateStdDevFromQ(self.q, self.nValues)
+
+    def getLargestEntries(self):
+        """
+        _getLargestEntries_
+
+        Return the entries of the largest values, largest first.
+        """
+        return [x[2] for x in sorted(self.largest, reverse = True)]
+
+    def createHistogram(self, nBins, limit):
+        """
+        _createHistogram_
+
+        Create the histogram of the reservoir sample, the number of events of
+        the bins are scaled to the number of values.
+        """
+        histogram = createHistogram(numList = self.reservoir, nBins = nBins,
+                                    limit = limit)
+        if self.nSampled > len(self.reservoir):
+            scale = float(self.nSampled) / len(self.reservoir)
+            for bin in histogram:
+                bin['nEvents'] = int(round(bin['nEvents'] * scale))
+        return histogram
@@ -18,6 +18,7 @@ import subprocess
 import multiprocessing
 import glob
 import shlex
+import tempfile
 
 import WMCore.Algorithms.BasicAlgos as BasicAlgos
 
@@ -29,6 +30,17 @@ from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
 from WMCore.FwkJobReport.Report        import Report
 from WMCore.Algorithms                 import SubprocessAlgos
 
+# Attributes read from condor_q, as (key in the classAd dictionary, attribute)
+CLASSAD_ATTRIBUTES = [('JobStatus', 'JobStatus'),
+                      ('stateTime', 'EnteredCurrentStatus'),
+                      ('runningTime', 'JobStartDate'),
+                      ('submitTime', 'QDate'),
+                      ('DESIRED_Sites', 'DESIRED_Sites'),
+                      ('ExtDESIRED_Sites', 'ExtDESIRED_Sites'),
+                      ('runningCMSSite', 'MATCH_EXP_JOBGLIDEIN_CMSSite')]
+
+CLASSAD_VALUE = re.compile(r'\((\w+):([^)]*)\)')
+
 def submitWorker(input, results, timeout = None):
     """
     _outputWorker_
@@ -190,6 +202,18 @@ class CondorPlugin(BasePlugin):
         self.defaultTaskPriority = getattr(config.BossAir, 'defaultTaskPriority', 0)
         self.maxTaskPriority     = getattr(config.BossAir, 'maxTaskPriority', 1e7)
 
+        # In incremental mode only the classAds of the jobs that changed
+        # status are read from condor_q, with a full query every few cycles
+        self.incrementalClassAds = getattr(config.BossAir, 'incrementalClassAds', False)
+        self.fullClassAdsCycles  = getattr(config.BossAir, 'fullClassAdsCycles', 10)
+        self.classAdsTimeSlack   = getattr(config.BossAir, 'classAdsTimeSlack', 60)
+        self.classAdCache        = None
+        self.classAdQueryTime    = None
+        self.classAdCycles       = 0
+
+        # Number of jobs edited or removed by a single condor command
+        self.bulkCommandSize     = getattr(config.BossAir, 'condorBulkCommandSize', 1000)
+
         # Required for global pool accounting
         self.acctGroup = getattr(config.BossAir, 'acctGroup', "production")
         self.acctGroupUser = getattr(config.BossAir, 'acctGroupUser', "cmsdataops")
@@ -563,7 +587,7 @@ class CondorPlugin(BasePlugin):
 
         for job in jobs:
             # Now go over the jobs from WMBS and see what we have
-            if not job['jobid'] in jobInfo.keys():
+            if not job['jobid'] in jobInfo:
                 # Two options here, either put in removed, or not
                 # Only cycle through Removed if condor_q is sending
                 # us no information
@@ -731,6 +755,11 @@ class CondorPlugin(BasePlugin):
         """
         jobInfo = self.getClassAds()
         jobtokill=[]
+        if jobInfo == None:
+            return jobtokill
+
+        # Jobs to edit by their new DESIRED_Sites
+        editGroups = {}
         for job in jobs:
             jobID = job['id']
             jobAd = jobInfo.get(jobID)
@@ -747,10 +776,7 @@ class CondorPlugin(BasePlugin):
                         if len(usi) > 1:
                             usi.remove(siteName)
                             usi = ','.join(map(str, usi))
-                            command = 'condor_qedit  -constraint \'WMAgent_JobID==%i\' DESIRED_Sites \'"%s"\'' %(jobID, usi)
-                            proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                                    stdout = subprocess.PIPE, shell = True)
-                            out, err = proc.communicate()
+                            editGroups.setdefault(usi, []).append(jobID)
                         else:
                             jobtokill.append(job)
                     else:
@@ -762,14 +788,19 @@ class CondorPlugin(BasePlugin):
                         usi = desiredSites
                         usi.append(siteName)
                         usi = ','.join(map(str, usi))
-                        command = 'condor_qedit  -constraint \'WMAgent_JobID==%i\' DESIRED_Sites \'"%s"\'' %(jobID, usi)
-                        proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                                stdout = subprocess.PIPE, shell = True)
-                        out, err = proc.communicate()
+                        editGroups.setdefault(usi, []).append(jobID)
                     else :
                         #If job doesn't have the siteName in the siteList, just ignore it
                         logging.debug("Cannot find siteName %s in the sitelist" % siteName)
 
+        for usi, jobIDs in editGroups.items():
+            results = self.bulkCondorCommand('condor_qedit', jobIDs,
+                                             ['DESIRED_Sites', '"%s"' % usi])
+            for jobID, error in results.items():
+                if error == None:
+                    # Keep the cached classAd in sync with condor
+                    jobInfo[jobID]['DESIRED_Sites'] = usi
+
         return jobtokill
 
 
@@ -780,16 +811,76 @@ class CondorPlugin(BasePlugin):
 
         """
 
-        for job in jobs:
-            jobID = job['jobid']
-            # This is a very long and painful command to run
-            command = 'condor_rm -constraint \"WMAgent_JobID =?= %i\"' % (jobID)
-            proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                    stdout = subprocess.PIPE, shell = True)
-            out, err = proc.communicate()
+        results = self.bulkCondorCommand('condor_rm', [job['jobid'] for job in jobs])
+        failed = sorted([jobID for jobID, error in results.items() if error != None])
+        if failed:
+            logging.warning("condor_rm failed for %i jobs: %s" % (len(failed), failed))
+            logging.debug("condor_rm errors: %s" % set([results[x] for x in failed]))
 
         return
 
+    def bulkCondorCommand(self, command, jobIDs, arguments = None):
+        """
+        _bulkCondorCommand_
+
+        Run a condor command (condor_qedit, condor_rm) on many jobs at once,
+        with one constraint on WMAgent_JobID for every bulkCommandSize jobs.
+        Returns the error by job ID, None for the jobs whose command succeeded.
+
+        If the command fails for a group of jobs the jobs still in the queue
+        are looked up: the command failed for those, the others have left the
+        queue, which is what condor_rm was for.
+        """
+        results = {}
+        jobIDs = sorted(set(jobIDs))
+        for index in range(0, len(jobIDs), self.bulkCommandSize):
+            jobGroup = jobIDs[index:index + self.bulkCommandSize]
+            proc = subprocess.Popen([command, '-constraint', self.jobIDConstraint(jobGroup)] + (arguments or []),
+                                    stderr = subprocess.PIPE, stdout = subprocess.PIPE)
+            _, stderr = proc.communicate()
+
+            if proc.returncode == 0:
+                for jobID in jobGroup:
+                    results[jobID] = None
+                continue
+
+            error = 'Exit code %i: %s' % (proc.returncode, stderr)
+            logging.debug("%s failed for %i jobs: %s" % (command, len(jobGroup), error))
+            queued = self.listQueuedJobs(jobGroup)
+            for jobID in jobGroup:
+                if queued == None or jobID in queued:
+                    results[jobID] = error
+                elif command == 'condor_rm':
+                    results[jobID] = None
+                else:
+                    results[jobID] = 'Job %i is not in the queue' % jobID
+
+        return results
+
+    def jobIDConstraint(self, jobIDs):
+        """
+        _jobIDConstraint_
+
+        Condor constraint matching the jobs with the given WMAgent_JobIDs.
+        """
+        return 'member(WMAgent_JobID, {%s})' % ', '.join([str(x) for x in jobIDs])
+
+    def listQueuedJobs(self, jobIDs):
+        """
+        _listQueuedJobs_
+
+        Return the set of the given jobs still in the queue, None if condor_q
+        failed.
+        """
+        proc = subprocess.Popen(['condor_q', '-constraint', self.jobIDConstraint(jobIDs),
+                                 '-format', '%d\n', 'WMAgent_JobID'],
+                                stderr = subprocess.PIPE, stdout = subprocess.PIPE)
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            logging.error("condor_q failed listing queued jobs: %s" % stderr)
+            return None
+        return set([int(x) for x in stdout.split()])
+
     def updateJobInformation(self, workflow, task, **kwargs):
         """
         _updateJobInformation_
@@ -1056,60 +1147,124 @@ class CondorPlugin(BasePlugin):
         """
         _getClassAds_
 
-        Grab classAds from condor_q using xml parsing
+        Grab classAds from condor_q using formatted output
+
+        In incremental mode the ads of the jobs whose status didn't change
+        since the last query are taken from the cache, condor_q only lists
+        the jobs still in the queue and returns the full ads of the changed
+        ones.  Every fullClassAdsCycles queries all the ads are read again.
         """
+        queryTime = int(time.time())
+        jobInfo = None
+
+        if self.incrementalClassAds and self.classAdCache != None and \
+               self.classAdCycles < self.fullClassAdsCycles:
+            since = self.classAdQueryTime - self.classAdsTimeSlack
+            queuedAds = self.queryClassAds(attributes = [('stateTime', 'EnteredCurrentStatus')])
+            if queuedAds == None:
+                return None
+            changedAds = self.queryClassAds(constraint = 'EnteredCurrentStatus >= %i' % since)
+            if changedAds == None:
+                return None
+            jobInfo = self.mergeClassAds(queuedAds, changedAds)
+            self.classAdCycles += 1
 
-        jobInfo = {}
+        if jobInfo == None:
+            jobInfo = self.queryClassAds()
+            if jobInfo == None:
+                return None
+            self.classAdCycles = 0
 
-        command = ['condor_q', '-constraint', 'WMAgent_JobID =!= UNDEFINED',
-                   '-constraint', 'WMAgent_AgentName == \"%s\"' % (self.agent),
-                   '-format', '(JobStatus:\%s)  ', 'JobStatus',
-                   '-format', '(stateTime:\%s)  ', 'EnteredCurrentStatus',
-                   '-format', '(runningTime:\%s)  ', 'JobStartDate',
-                   '-format', '(submitTime:\%s)  ', 'QDate',
-                   '-format', '(DESIRED_Sites:\%s)  ', 'DESIRED_Sites',
-                   '-format', '(ExtDESIRED_Sites:\%s)  ', 'ExtDESIRED_Sites',
-                   '-format', '(runningCMSSite:\%s)  ', 'MATCH_EXP_JOBGLIDEIN_CMSSite',
-                   '-format', '(WMAgentID:\%d):::',  'WMAgent_JobID']
-
-        pipe = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = subprocess.PIPE, shell = False)
-        stdout, _ = pipe.communicate()
-        classAdsRaw = stdout.split(':::')
-
-        if not pipe.returncode == 0:
-            # Then things have gotten bad - condor_q is not responding
-            logging.error("condor_q returned non-zero value %s" % str(pipe.returncode))
-            logging.error("Skipping classAd processing this round")
-            return None
+        if self.incrementalClassAds:
+            self.classAdCache = jobInfo
+            self.classAdQueryTime = queryTime
 
-        if classAdsRaw == '':
-            # We have no jobs
-            return jobInfo
+        logging.info("Retrieved %i classAds" % len(jobInfo))
 
-        for ad in classAdsRaw:
-            # There should be one for every job
-            if not re.search("\(", ad):
-                # There is no ad.
-                # Don't know what happened here
-                continue
-            statements = ad.split('(')
-            tmpDict = {}
-            for statement in statements:
-                # One for each value
-                if not re.search(':', statement):
-                    # Then we have an empty statement
-                    continue
-                key = str(statement.split(':')[0])
-                value = statement.split(':')[1].split(')')[0]
-                tmpDict[key] = value
-            if not 'WMAgentID' in tmpDict.keys():
-                # Then we have an invalid job somehow
-                logging.error("Invalid job discovered in condor_q")
-                logging.error(tmpDict)
+        return jobInfo
+
+    def mergeClassAds(self, queuedAds, changedAds):
+        """
+        _mergeClassAds_
+
+        Build the classAds of the jobs in the queue from the ads of the jobs
+        that changed status and the cached ads of the others.  Return None if
+        the status of a job changed without being in changedAds, the cache
+        can't be trusted in that case.
+        """
+        jobInfo = {}
+        for jobID, queuedAd in queuedAds.iteritems():
+            if jobID in changedAds:
                 continue
-            else:
-                jobInfo[int(tmpDict['WMAgentID'])] = tmpDict
+            cachedAd = self.classAdCache.get(jobID, None)
+            if cachedAd == None or cachedAd.get('stateTime') != queuedAd.get('stateTime'):
+                logging.info("ClassAd cache is out of date for job %i, querying all the classAds" % jobID)
+                return None
+            jobInfo[jobID] = cachedAd
+
+        # Jobs submitted after the first query are only in changedAds
+        jobInfo.update(changedAds)
+        logging.debug("Read %i changed classAds out of %i" % (len(changedAds), len(jobInfo)))
+        return jobInfo
 
-        logging.info("Retrieved %i classAds" % len(jobInfo))
+    def queryClassAds(self, constraint = None, attributes = CLASSAD_ATTRIBUTES):
+        """
+        _queryClassAds_
+
+        Run condor_q for the jobs of this agent, parsing its output as it is
+        read.  Return the classAds by WMAgent_JobID, or None if condor_q failed.
+        """
+        command = ['condor_q', '-constraint', 'WMAgent_JobID =!= UNDEFINED',
+                   '-constraint', 'WMAgent_AgentName == \"%s\"' % (self.agent)]
+        if constraint:
+            command.extend(['-constraint', constraint])
+        for key, attribute in attributes:
+            command.extend(['-format', '(%s:\\%%s)  ' % key, attribute])
+        command.extend(['-format', '(WMAgentID:\%d):::',  'WMAgent_JobID'])
+
+        jobInfo = {}
+        stderr = tempfile.TemporaryFile()
+        try:
+            pipe = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = stderr, shell = False)
+            remainder = ''
+            while True:
+                data = pipe.stdout.read(65536)
+                if not data:
+                    break
+                classAdsRaw = (remainder + data).split(':::')
+                remainder = classAdsRaw.pop()
+                for ad in classAdsRaw:
+                    self.parseClassAd(ad, jobInfo)
+            self.parseClassAd(remainder, jobInfo)
+            pipe.wait()
+
+            if not pipe.returncode == 0:
+                # Then things have gotten bad - condor_q is not responding
+                stderr.seek(0)
+                logging.error("condor_q returned non-zero value %s" % str(pipe.returncode))
+                logging.error(stderr.read())
+                logging.error("Skipping classAd processing this round")
+                return None
+        finally:
+            stderr.close()
 
         return jobInfo
+
+    def parseClassAd(self, ad, jobInfo):
+        """
+        _parseClassAd_
+
+        Parse the (key:value) statements of one job and add them to jobInfo.
+        """
+        tmpDict = dict(CLASSAD_VALUE.findall(ad))
+        if not tmpDict:
+            # There is no ad.
+            # Don't know what happened here
+            return
+        if not 'WMAgentID' in tmpDict:
+            # Then we have an invalid job somehow
+            logging.error("Invalid job discovered in condor_q")
+            logging.error(tmpDict)
+            return
+        jobInfo[int(tmpDict['WMAgentID'])] = tmpDict
+        return
@@ -3,7 +3,12 @@ A basic action is a thing that will run a SQL statement
 
 A more complex one would be something that ran multiple SQL
 objects to produce a single output.
+
+If DAO profiling has been enabled (see WMCore.Database.DAOProfiler) the
+execute method of every DAO handed out is wrapped to record its timing.
 """
+from WMCore.Database import DAOProfiler
+
 class DAOFactory(object):
     def __init__(self, package='WMCore', logger=None, dbinterface=None, owner=""):
         self.package = package
@@ -41,6 +46,10 @@ class DAOFactory(object):
         module = __import__(module, globals(), locals(), [classname])#, -1)
         instance = getattr(module, classname.split('.')[-1])
         if self.owner:
-            return instance(self.logger, self.dbinterface, self.owner)
+            dao = instance(self.logger, self.dbinterface, self.owner)
         else:
-            return instance(self.logger, self.dbinterface)
+            dao = instance(self.logger, self.dbinterface)
+
+        if DAOProfiler.profilingEnabled() and hasattr(dao, "execute"):
+            DAOProfiler.profileDAO(dao)
+        return dao
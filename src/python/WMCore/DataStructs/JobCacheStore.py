@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""
+_JobCacheStore_
+
+Append-only store for the job objects of a job collection.
+
+Instead of pickling every job into its own job.pkl file the JobCreator
+appends all the jobs of a JobCollection directory to a single data file.
+Every record is made of two pickles: a small summary dictionary with the
+fields most components need and the full job object.  The offsets of both
+pickles are written to a separate fixed width index file after the record
+has been flushed, so a reader never sees an index entry for a record that
+is not on disk yet.
+
+Readers load the index once, optionally memory map the data file and only
+unpickle the records (or the summaries) they actually need.  Jobs that were
+cached by older agents as job.pkl can still be loaded through loadJob().
+
+The summary written by the JobCreator holds the submit summary of the job,
+everything the JobSubmitter needs to schedule it, see submitSummary().
+
+The JobArchiver puts the pickled job back as job.pkl in the archive of the
+job cache directory and removes the store once all the job cache
+directories of the collection are archived, see removeStore().
+"""
+
+import os
+import mmap
+import struct
+import cPickle
+
+STORE_VERSION = 1
+STORE_MAGIC = "WMJC"
+HEADER_FORMAT = "!4sB"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+INDEX_FORMAT = "!qQIQI"
+INDEX_SIZE = struct.calcsize(INDEX_FORMAT)
+
+# Fields of the submit summary
+SUBMIT_FIELDS = ["id", "name", "workflow", "cache_dir", "sandbox",
+                 "siteWhitelist", "siteBlacklist", "trustSitelists",
+                 "inputLocations", "ownerDN", "ownerGroup", "ownerRole",
+                 "scramArch", "swVersion", "proxyPath", "estimatedJobTime",
+                 "estimatedDiskUsage", "estimatedMemoryUsage", "numberOfCores"]
+
+class JobCacheStoreException(Exception):
+    """
+    _JobCacheStoreException_
+
+    Raised for corrupt or incompatible store files.
+    """
+    pass
+
+class JobCacheStore(object):
+    """
+    _JobCacheStore_
+
+    One data file and one index file living in a JobCollection directory.
+    """
+    dataFileName = "JobCache.pkg"
+    indexFileName = "JobCache.idx"
+
+    def __init__(self, directory, useMmap = True):
+        self.directory = directory
+        self.dataPath = os.path.join(directory, self.dataFileName)
+        self.indexPath = os.path.join(directory, self.indexFileName)
+        self.useMmap = useMmap
+
+        self.dataHandle = None
+        self.indexHandle = None
+        self.readHandle = None
+        self.mappedData = None
+        self.mappedSize = 0
+
+        self.index = {}
+        self.indexOffset = 0
+        return
+
+    @classmethod
+    def exists(cls, directory):
+        """
+        _exists_
+
+        Check whether a store has been written to the given directory.
+        """
+        return os.path.isfile(os.path.join(directory, cls.indexFileName))
+
+    def append(self, jobID, job, summary = None):
+        """
+        _append_
+
+        Append a job and its summary to the store.  If a job is appended more
+        than once the last record wins.
+        """
+        if self.dataHandle == None:
+            self.dataHandle = open(self.dataPath, "ab")
+            self.dataHandle.seek(0, os.SEEK_END)
+            if self.dataHandle.tell() == 0:
+                self.dataHandle.write(struct.pack(HEADER_FORMAT, STORE_MAGIC,
+                                                  STORE_VERSION))
+            self.indexHandle = open(self.indexPath, "ab")
+
+        summaryData = cPickle.dumps(summary or {}, cPickle.HIGHEST_PROTOCOL)
+        jobData = cPickle.dumps(job, cPickle.HIGHEST_PROTOCOL)
+
+        summaryOffset = self.dataHandle.tell()
+        self.dataHandle.write(summaryData)
+        jobOffset = self.dataHandle.tell()
+        self.dataHandle.write(jobData)
+        self.dataHandle.flush()
+
+        entry = (summaryOffset, len(summaryData), jobOffset, len(jobData))
+        self.indexHandle.write(struct.pack(INDEX_FORMAT, jobID, *entry))
+        self.indexHandle.flush()
+
+        self.index[jobID] = entry
+        return
+
+    def refresh(self):
+        """
+        _refresh_
+
+        Read the index entries that were appended since the last refresh.
+        A partially written entry at the end of the index is ignored until
+        it is complete.
+        """
+        if not os.path.isfile(self.indexPath):
+            return
+
+        indexHandle = open(self.indexPath, "rb")
+        try:
+            indexHandle.seek(self.indexOffset)
+            rawIndex = indexHandle.read()
+        finally:
+            indexHandle.close()
+
+        completeSize = len(rawIndex) - (len(rawIndex) % INDEX_SIZE)
+        for offset in xrange(0, completeSize, INDEX_SIZE):
+            entry = struct.unpack(INDEX_FORMAT, rawIndex[offset:offset + INDEX_SIZE])
+            self.index[entry[0]] = entry[1:]
+        self.indexOffset += completeSize
+        return
+
+    def listJobs(self):
+        """
+        _listJobs_
+
+        Return the IDs of all the jobs in the store.
+        """
+        self.refresh()
+        return self.index.keys()
+
+    def __contains__(self, jobID):
+        if jobID not in self.index:
+            self.refresh()
+        return jobID in self.index
+
+    def _read(self, offset, length):
+        """
+        _read_
+
+        Read a slice of the data file, through the memory map if possible.
+        """
+        if self.readHandle == None:
+            self.readHandle = open(self.dataPath, "rb")
+            header = self.readHandle.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                raise JobCacheStoreException("Truncated job cache %s" % self.dataPath)
+            magic, version = struct.unpack(HEADER_FORMAT, header)
+            if magic != STORE_MAGIC or version > STORE_VERSION:
+                msg = "Unsupported job cache %s (version %s)" % (self.dataPath, version)
+                raise JobCacheStoreException(msg)
+
+        if self.useMmap and offset + length > self.mappedSize:
+            # The file grew since it was mapped, map it again
+            if self.mappedData != None:
+                self.mappedData.close()
+            self.mappedSize = os.fstat(self.readHandle.fileno()).st_size
+            self.mappedData = mmap.mmap(self.readHandle.fileno(), self.mappedSize,
+                                        access = mmap.ACCESS_READ)
+
+        if self.useMmap:
+            return self.mappedData[offset:offset + length]
+
+        self.readHandle.seek(offset)
+        return self.readHandle.read(length)
+
+    def _entry(self, jobID):
+        if jobID not in self:
+            raise KeyError(jobID)
+        return self.index[jobID]
+
+    def loadJobData(self, jobID):
+        """
+        _loadJobData_
+
+        Return the pickled job object, as stored.
+        """
+        entry = self._entry(jobID)
+        return self._read(entry[2], entry[3])
+
+    def loadJob(self, jobID):
+        """
+        _loadJob_
+
+        Unpickle the full job object.
+        """
+        return cPickle.loads(self.loadJobData(jobID))
+
+    def loadSummary(self, jobID):
+        """
+        _loadSummary_
+
+        Unpickle only the summary that was stored with the job.
+        """
+        entry = self._entry(jobID)
+        return cPickle.loads(self._read(entry[0], entry[1]))
+
+    def loadFields(self, jobID, fields):
+        """
+        _loadFields_
+
+        Return a dictionary with the requested fields.  They are taken from
+        the summary when all of them are there, otherwise the full job is
+        loaded.
+        """
+        summary = self.loadSummary(jobID)
+        if not set(fields).issubset(summary.keys()):
+            summary = self.loadJob(jobID)
+        return dict([(field, summary.get(field, None)) for field in fields])
+
+    def close(self):
+        """
+        _close_
+
+        Close all the file handles of the store.
+        """
+        for handle in [self.mappedData, self.readHandle,
+                       self.dataHandle, self.indexHandle]:
+            if handle != None:
+                handle.close()
+
+        self.dataHandle = None
+        self.indexHandle = None
+        self.readHandle = None
+        self.mappedData = None
+        self.mappedSize = 0
+        return
+
+def submitSummary(job):
+    """
+    _submitSummary_
+
+    Extract the fields the JobSubmitter needs from a job.  All the input
+    files of a job are at the same locations, the ones of the first file are
+    kept.  The number of cores can be overridden by the job baggage.
+    """
+    summary = dict([(field, job.get(field, None)) for field in SUBMIT_FIELDS])
+    summary["siteWhitelist"] = job.get("siteWhitelist", [])
+    summary["siteBlacklist"] = job.get("siteBlacklist", [])
+    summary["trustSitelists"] = job.get("trustSitelists", False)
+    summary["ownerGroup"] = job.get("ownerGroup", '')
+    summary["ownerRole"] = job.get("ownerRole", '')
+
+    summary["inputLocations"] = []
+    if job.get("input_files", None):
+        summary["inputLocations"] = list(job["input_files"][0]["locations"])
+
+    numberOfCores = job.get("numberOfCores", 1)
+    if numberOfCores == 1:
+        numberOfCores = getattr(job.getBaggage(), "numberOfCores", 1)
+    summary["numberOfCores"] = numberOfCores
+    return summary
+
+def _findStore(cacheDir, stores):
+    """
+    _findStore_
+
+    Return the store holding the job cached in the given job cache directory
+    and the job ID, or (None, None) if it's not in a store.
+    """
+    collectionDir = os.path.dirname(os.path.normpath(cacheDir))
+    jobID = os.path.basename(os.path.normpath(cacheDir))
+    if jobID.startswith("job_") and jobID[4:].isdigit():
+        if collectionDir not in stores and JobCacheStore.exists(collectionDir):
+            stores[collectionDir] = JobCacheStore(collectionDir)
+        store = stores.get(collectionDir, None)
+        if store != None and int(jobID[4:]) in store:
+            return store, int(jobID[4:])
+    return None, None
+
+def loadJob(cacheDir, stores = None):
+    """
+    _loadJob_
+
+    Load the job cached in the given job cache directory.  The store of the
+    parent JobCollection directory is tried first, then the job.pkl file
+    that older agents wrote.  Opened stores are kept in the stores dictionary
+    so they can be reused for the other jobs of the collection, the caller
+    has to close them.  Returns None if the job can't be found.
+    """
+    if stores == None:
+        stores = {}
+
+    store, jobID = _findStore(cacheDir, stores)
+    if store != None:
+        return store.loadJob(jobID)
+
+    pickledJobPath = os.path.join(cacheDir, "job.pkl")
+    if not os.path.isfile(pickledJobPath):
+        return None
+
+    jobHandle = open(pickledJobPath, "r")
+    try:
+        return cPickle.load(jobHandle)
+    finally:
+        jobHandle.close()
+
+def loadJobData(cacheDir, stores = None):
+    """
+    _loadJobData_
+
+    Return the pickled job object of the job cached in the given job cache
+    directory from the store of its JobCollection, or None if the job is not
+    in a store.
+    """
+    if stores == None:
+        stores = {}
+
+    store, jobID = _findStore(cacheDir, stores)
+    if store == None:
+        return None
+    return store.loadJobData(jobID)
+
+def removeStore(collectionDir):
+    """
+    _removeStore_
+
+    Remove the store of a JobCollection directory once none of its job cache
+    directories are left, and the directory if it is then empty.  Returns
+    whether the store was removed.
+    """
+    try:
+        if not JobCacheStore.exists(collectionDir):
+            return False
+        for name in os.listdir(collectionDir):
+            if name.startswith("job_") and os.path.isdir(os.path.join(collectionDir, name)):
+                return False
+    except OSError:
+        # Removed in the meantime
+        return False
+
+    for fileName in [JobCacheStore.indexFileName, JobCacheStore.dataFileName]:
+        try:
+            os.remove(os.path.join(collectionDir, fileName))
+        except OSError:
+            pass
+    try:
+        os.rmdir(collectionDir)
+    except OSError:
+        pass
+    return True
+
+def loadSubmitSummary(cacheDir, stores = None):
+    """
+    _loadSubmitSummary_
+
+    Load the submit summary of the job cached in the given job cache
+    directory, without unpickling the job if its store record has one.  For
+    jobs cached by older agents the summary is built from the full job.
+    Returns None if the job can't be found.
+    """
+    if stores == None:
+        stores = {}
+
+    store, jobID = _findStore(cacheDir, stores)
+    if store != None:
+        summary = store.loadSummary(jobID)
+        if set(SUBMIT_FIELDS).issubset(summary.keys()):
+            return summary
+        return submitSummary(store.loadJob(jobID))
+
+    job = loadJob(cacheDir, stores)
+    if job == None:
+        return None
+    return submitSummary(job)
@@ -13,11 +13,16 @@ This code began life in COMP/CRAB/python/LumiList.py
 """
 
 
+import bisect
 import copy
 import json
 import re
+import sys
 import urllib2
 
+# End of the merged ranges with an upper bound of 0, i.e. the end of the run
+OPEN_END = sys.maxint
+
 class LumiList(object):
     """
     Deal with lists of lumis in several different forms:
@@ -51,16 +56,17 @@ class LumiList(object):
         Constructor takes filename (JSON), a list of run/lumi pairs,
         or a dict with run #'s as the keys and a list of lumis as the values, or just a list of runs
         """
-        self.compactList = {}
+        self._compactList = {}
+        self._ranges = {}
         self.duplicates = {}
         if filename:
             self.filename = filename
             jsonFile = open(self.filename,'r')
-            self.compactList = json.load(jsonFile)
+            self._compactList = json.load(jsonFile)
         elif url:
             self.url = url
             jsonFile = urllib2.urlopen(url)
-            self.compactList = json.load(jsonFile)
+            self._compactList = json.load(jsonFile)
         elif lumis:
             runsAndLumis = {}
             for (run, lumi) in lumis:
@@ -82,52 +88,117 @@ class LumiList(object):
                 lastLumi = -1000
                 lumiList = runsAndLumis[run]
                 if lumiList:
-                    self.compactList[runString] = []
+                    self._compactList[runString] = []
                     self.duplicates[runString] = []
                     for lumi in sorted(lumiList):
                         if lumi == lastLumi:
                             self.duplicates[runString].append(lumi)
                         elif lumi != lastLumi + 1: # Break in lumi sequence
-                            self.compactList[runString].append([lumi, lumi])
+                            self._compactList[runString].append([lumi, lumi])
                         else:
-                            nRange =  len(self.compactList[runString])
-                            self.compactList[runString][nRange-1][1] = lumi
+                            nRange =  len(self._compactList[runString])
+                            self._compactList[runString][nRange-1][1] = lumi
                         lastLumi = lumi
         if runs:
             for run in runs:
                 runString = str(run)
-                self.compactList[runString] = [[1, 0xFFFFFFF]]
+                self._compactList[runString] = [[1, 0xFFFFFFF]]
 
         if compactList:
             for run in compactList.keys():
                 runString = str(run)
                 if compactList[run]:
-                    self.compactList[runString] = compactList[run]
+                    self._compactList[runString] = [list(lumiRange) for lumiRange in compactList[run]]
+
+
+    def _getCompactList(self):
+        # Whoever gets hold of the compact list may edit it
+        self._ranges = {}
+        return self._compactList
+
+    def _setCompactList(self, compactList):
+        self._ranges = {}
+        self._compactList = compactList
+
+    compactList = property(_getCompactList, _setCompactList)
+
+
+    def _getRanges(self, run):
+        """
+        _getRanges_
+
+        Return the lumi ranges of a run as two sorted lists of range starts and
+        range ends, with overlapping and adjacent ranges merged.  Ranges with
+        an upper bound of 0 extend to the end of the run, their end is
+        OPEN_END here.  The ranges are built on the first lookup of the run
+        and kept until the compact list is handed out or changed.
+        """
+        run = str(run)
+        if run in self._ranges:
+            return self._ranges[run]
+
+        starts = []
+        ends = []
+        for (first, last) in sorted(self._compactList.get(run, [])):
+            if last == 0:
+                last = OPEN_END
+            if last < first:
+                continue
+            if starts and first <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], last)
+            else:
+                starts.append(first)
+                ends.append(last)
+
+        self._ranges[run] = (starts, ends)
+        return starts, ends
+
+
+    def _inRanges(self, run, lumi):
+        """
+        _inRanges_
+
+        Binary search for a lumi in the merged ranges of a run.
+        """
+        starts, ends = self._getRanges(run)
+        index = bisect.bisect_right(starts, lumi) - 1
+        return index >= 0 and lumi <= ends[index]
+
+
+    def _makeRange(self, first, last):
+        """
+        _makeRange_
+
+        Turn a merged range back into a compactList pair, open ended
+        ranges get their upper bound of 0 back.
+        """
+        if last == OPEN_END:
+            last = 0
+        return [first, last]
 
 
     def __sub__(self, other): # Things from self not in other
         result = {}
-        for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
+        for run in sorted(self._compactList.keys()):
+            astarts, aends = self._getRanges(run)
+            bstarts, bends = other._getRanges(run)
+            alist = []
+            j = 0
+            for i in xrange(len(astarts)):
+                first, last = astarts[i], aends[i]
+                # Skip the ranges of other that end before this one starts
+                while j < len(bstarts) and bends[j] < first:
+                    j += 1
+                k = j
+                while k < len(bstarts) and bstarts[k] <= last:
+                    if bstarts[k] > first:
+                        alist.append(self._makeRange(first, bstarts[k] - 1))
+                    first = bends[k] + 1
+                    if first > last:
                         break
-                if tmplist:
-                    alist.append(tmplist)
+                    k += 1
+                if first <= last:
+                    alist.append(self._makeRange(first, last))
             result[run] = alist
 
         return LumiList(compactList = result)
@@ -135,30 +206,23 @@ class LumiList(object):
 
     def __and__(self, other): # Things in both
         result = {}
-        aruns = set(self.compactList.keys())
-        bruns = set(other.compactList.keys())
+        aruns = set(self._compactList.keys())
+        bruns = set(other._compactList.keys())
         for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
+            astarts, aends = self._getRanges(run)
+            bstarts, bends = other._getRanges(run)
+            unique = []
+            i = 0
+            j = 0
+            while i < len(astarts) and j < len(bstarts):
+                first = max(astarts[i], bstarts[j])
+                last = min(aends[i], bends[j])
+                if first <= last:
+                    unique.append(self._makeRange(first, last))
+                if aends[i] < bends[j]:
+                    i += 1
                 else:
-                    unique.append(copy.deepcopy(pair))
+                    j += 1
 
             result[run] = unique
         return LumiList(compactList = result)
@@ -166,17 +230,33 @@ class LumiList(object):
 
     def __or__(self, other):
         result = {}
-        aruns = self.compactList.keys()
-        bruns = other.compactList.keys()
-        runs = set(aruns + bruns)
-        for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
+        aruns = set(self._compactList.keys())
+        bruns = set(other._compactList.keys())
+        for run in aruns | bruns:
+            astarts, aends = self._getRanges(run)
+            bstarts, bends = other._getRanges(run)
+            unique = []
+            lastEnd = None
+            i = 0
+            j = 0
+            while i < len(astarts) or j < len(bstarts):
+                # Take the range starting first, merge it into the last one
+                if j >= len(bstarts) or (i < len(astarts) and astarts[i] <= bstarts[j]):
+                    first, last = astarts[i], aends[i]
+                    i += 1
+                else:
+                    first, last = bstarts[j], bends[j]
+                    j += 1
+                if unique and first <= lastEnd + 1:
+                    lastEnd = max(lastEnd, last)
+                else:
+                    if unique:
+                        unique[-1] = self._makeRange(unique[-1][0], lastEnd)
+                    unique.append([first, last])
+                    lastEnd = last
+            if unique:
+                unique[-1] = self._makeRange(unique[-1][0], lastEnd)
+
             result[run] = unique
         return LumiList(compactList = result)
 
@@ -187,33 +267,34 @@ class LumiList(object):
 
     def __len__(self):
         '''Returns number of runs in list'''
-        return len(self.compactList)
+        return len(self._compactList)
 
     def filterLumis(self, lumiList):
         """
         Return a list of lumis that are in compactList.
         lumilist is of the simple form
         [(run1,lumi1),(run1,lumi2),(run2,lumi1)]
+        Like contains(), ranges with an upper bound of 0 match every lumi
+        from their lower bound on.
         """
         filteredList = []
         for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
+            if self._inRanges(run, lumi):
+                filteredList.append((run, lumi))
         return filteredList
 
 
     def __str__ (self):
         doubleBracketRE = re.compile (r']],')
         return doubleBracketRE.sub (']],\n',
-                                    json.dumps (self.compactList,
+                                    json.dumps (self._compactList,
                                                 sort_keys=True))
 
     def getCompactList(self):
         """
-        Return the compact list representation
+        Return the compact list representation.  It is not a copy, edits to
+        it are seen by the next lookup (contains, filterLumis, &, |, -) but
+        not by the ones after that, get it again to edit it after a lookup.
         """
         return self.compactList
 
@@ -230,10 +311,10 @@ class LumiList(object):
         Return the list of pairs representation
         """
         theList = []
-        runs = self.compactList.keys()
+        runs = self._compactList.keys()
         runs.sort(key=int)
         for run in runs:
-            lumis = self.compactList[run]
+            lumis = self._compactList[run]
             for lumiPair in sorted(lumis):
                 for lumi in range(lumiPair[0], lumiPair[1]+1):
                     theList.append((int(run), lumi))
@@ -245,7 +326,7 @@ class LumiList(object):
         '''
         return the sorted list of runs contained
         '''
-        return sorted (self.compactList.keys())
+        return sorted (self._compactList.keys())
 
 
     def _getLumiParts(self):
@@ -255,10 +336,10 @@ class LumiList(object):
         """
 
         parts = []
-        runs = self.compactList.keys()
+        runs = self._compactList.keys()
         runs.sort(key=int)
         for run in runs:
-            lumis = self.compactList[run]
+            lumis = self._compactList[run]
             for lumiPair in sorted(lumis):
                 if lumiPair[0] == lumiPair[1]:
                     parts.append("%s:%s" % (run, lumiPair[0]))
@@ -307,8 +388,9 @@ class LumiList(object):
         '''
         for run in runList:
             run = str(run)
-            if run in self.compactList:
-                del self.compactList[run]
+            if run in self._compactList:
+                del self._compactList[run]
+                self._ranges.pop(run, None)
 
         return
 
@@ -318,12 +400,13 @@ class LumiList(object):
         Selects only runs from runList in collection
         '''
         runsToDelete = []
-        for run in self.compactList.keys():
+        for run in self._compactList.keys():
             if int(run) not in runList and run not in runList:
                 runsToDelete.append(run)
 
         for run in runsToDelete:
-            del self.compactList[run]
+            del self._compactList[run]
+            self._ranges.pop(run, None)
 
         return
 
@@ -338,28 +421,18 @@ class LumiList(object):
         if lumiSection is None:
             # if this is an integer or a string, see if the run exists
             if isinstance (run, int) or isinstance (run, str):
-                return str(run) in self.compactList
+                return str(run) in self._compactList
             # if we're here, then run better be a tuple or list
             try:
                 lumiSection = run[1]
                 run         = run[0]
             except:
                 raise RuntimeError, "Improper format for run '%s'" % run
-        lumiRangeList = self.compactList.get( str(run) )
-        if not lumiRangeList:
-            # the run isn't there, so no need to look any further
-            return False
-        for lumiRange in lumiRangeList:
-            # we want to make this as found if either the lumiSection
-            # is inside the range OR if the lumi section is greater
-            # than or equal to the lower bound of the lumi range and
-            # the upper bound is 0 (which means extends to the end of
-            # the run)
-            if lumiRange[0] <= lumiSection and \
-               (0 == lumiRange[1] or lumiSection <= lumiRange[1]):
-                # got it
-                return True
-        return False
+        # we want to make this as found if either the lumiSection
+        # is inside a range OR if the lumi section is greater than or
+        # equal to the lower bound of a lumi range whose upper bound is 0
+        # (which means extends to the end of the run)
+        return self._inRanges(run, lumiSection)
 
 
     def __contains__ (self, runTuple):
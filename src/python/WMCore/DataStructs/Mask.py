@@ -12,6 +12,7 @@ job in two ways:
 
 import logging
 
+from WMCore.DataStructs.LumiList import LumiList
 from WMCore.DataStructs.Run import Run
 
 class Mask(dict):
@@ -186,6 +187,23 @@ class Mask(dict):
 
         return False
 
+    def filterRunLumis(self, runLumis):
+        """
+        _filterRunLumis_
+
+        Bulk version of runLumiInMask: pass a list of (run, lumi) pairs and get
+        back the pairs that are in the mask, in the same order.  The mask ranges
+        are merged once and searched with a binary search, lumi ranges are
+        never expanded into single lumis.
+        """
+        if self['runAndLumis'] == {}:
+            # Empty dictionary
+            # ALWAYS TRUE
+            return list(runLumis)
+
+        lumiList = LumiList(compactList = self['runAndLumis'])
+        return lumiList.filterLumis(runLumis)
+
 
     def filterRunLumisByMask(self, runs):
         """
@@ -210,18 +228,17 @@ class Mask(dict):
         passedRuns = set([r.run for r in runs])
         filteredRuns = maskRuns.intersection(passedRuns)
 
-        newRuns = set()
+        runLumis = []
         for runNumber in filteredRuns:
-            maskLumis = set()
-            for pair in self["runAndLumis"][runNumber]:
-                if pair[0] == pair[1]:
-                    maskLumis.add(pair[0])
-                else:
-                    maskLumis = maskLumis.union(range(pair[0], pair[1] + 1, 1))
-
-            filteredLumis = set(runDict[runNumber].lumis).intersection(maskLumis)
-            if len(filteredLumis) > 0:
-                newRuns.add(Run(runNumber, *list(filteredLumis)))
+            runLumis.extend([(runNumber, lumi) for lumi in sorted(set(runDict[runNumber].lumis))])
+
+        filteredLumis = {}
+        for runNumber, lumi in self.filterRunLumis(runLumis):
+            filteredLumis.setdefault(runNumber, []).append(lumi)
+
+        newRuns = set()
+        for runNumber, lumis in filteredLumis.items():
+            newRuns.add(Run(runNumber, *lumis))
 
         return newRuns
 
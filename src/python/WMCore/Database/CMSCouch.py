@@ -17,10 +17,13 @@ import re
 import hashlib
 import base64
 import logging
+import threading
 from httplib import HTTPException
 from datetime import timedelta, datetime
 
 from WMCore.Services.Requests import JSONRequests
+from WMCore.Database.CouchClient import getConnectionPool, PooledResponse, \
+                                        JSONRowStream, STALE_CONNECTION_ERRORS
 from WMCore.Lexicon import replaceToSantizeURL
 
 def check_name(dbname):
@@ -85,6 +88,13 @@ class CouchDBRequests(JSONRequests):
         self.accept_type = "application/json"
         self["timeout"] = 600
 
+        # pycurl handles its own connections, otherwise use the keep-alive
+        # connections shared by all the CouchDB objects of the process
+        self.connectionPool = None
+        if not usePYCurl:
+            self.connectionPool = getConnectionPool()
+        self.poolCredentials = None
+
     def move(self, uri=None, data=None):
         """
         MOVE some data
@@ -108,15 +118,174 @@ class CouchDBRequests(JSONRequests):
         try:
             if not cache:
                 incoming_headers.update({'Cache-Control':'no-cache'})
-            result, status, reason, cached = JSONRequests.makeRequest(
+            if self.connectionPool == None:
+                result, status, reason, cached = JSONRequests.makeRequest(
                                         self, uri, data, type, incoming_headers,
                                         encode, decode,contentType)
+            else:
+                response = self.openRequest(uri, data, type, incoming_headers,
+                                            encode, contentType)
+                result = response.read()
+                if callable(decode):
+                    result = decode(result)
+                elif decode != False:
+                    result = self.decode(result)
         except HTTPException as e:
             self.checkForCouchError(getattr(e, "status", None),
                                     getattr(e, "reason", None), data)
 
         return result
 
+    def getPoolCredentials(self):
+        """
+        _getPoolCredentials_
+
+        Key and certificate used for the pooled https connections.  Like the
+        connections made by Requests, proceed without them if none are found.
+        """
+        if self.poolCredentials == None:
+            self.poolCredentials = (None, None)
+            if self['endpoint_components'].scheme == 'https':
+                try:
+                    self.poolCredentials = self.getKeyCert()
+                except Exception as ex:
+                    logging.info('No certificate or key found, authentication may fail')
+                    logging.debug(str(ex))
+        return self.poolCredentials
+
+    def openRequest(self, uri, data = None, type = 'GET', incoming_headers = {},
+                    encode = True, contentType = None):
+        """
+        _openRequest_
+
+        Send a request on a pooled keep-alive connection and return the
+        response before its body is read.  The body must be read completely
+        or the response closed.  Error statuses raise an HTTPException like
+        JSONRequests.makeRequest.
+        """
+        if not contentType:
+            contentType = self['content_type']
+        headers = {"Content-type": contentType,
+                   "User-agent": "WMCore.Services.Requests/v001",
+                   "Accept": self['accept_type']}
+        headers.update(self.additionalHeaders)
+        headers.update(incoming_headers)
+
+        endpoint = self['endpoint_components']
+        url = endpoint.path.rstrip('/') + uri
+        body = ''
+        if type != 'GET' and data:
+            if callable(encode):
+                body = encode(data)
+            elif encode == False:
+                body = data
+            else:
+                body = self.encode(data)
+        elif type == 'GET' and data:
+            url = "%s?%s" % (url, urllib.urlencode(data, doseq = True))
+        headers["Content-length"] = str(len(body))
+
+        key, cert = self.getPoolCredentials()
+        while True:
+            conn, reused = self.connectionPool.acquire(endpoint.scheme, endpoint.netloc,
+                                                       self['timeout'], key, cert)
+            try:
+                conn.request(type, url, body, headers)
+                response = PooledResponse(conn.getresponse(), conn, self.connectionPool)
+                break
+            except STALE_CONNECTION_ERRORS:
+                # An idle connection may have been closed by the server, try
+                # the next one.  Fresh connections failing is a real error.
+                conn.close()
+                if not reused:
+                    raise
+
+        if response.status >= 400:
+            e = HTTPException()
+            setattr(e, 'req_data', body)
+            setattr(e, 'req_headers', headers)
+            setattr(e, 'url', url)
+            setattr(e, 'result', response.read())
+            setattr(e, 'status', response.status)
+            setattr(e, 'reason', response.reason)
+            setattr(e, 'headers', response.response.msg)
+            raise e
+
+        return response
+
+    def loadRows(self, uri, data = None, type = 'GET', encode = True):
+        """
+        _loadRows_
+
+        Make a request that returns rows, like views and _all_docs.  On pooled
+        connections the rows are decoded while the response is read, so the
+        whole body is never held in memory next to the decoded rows.
+        """
+        if self.connectionPool == None:
+            return self.makeRequest(uri, data, type, encode = encode)
+
+        try:
+            response = self.openRequest(uri, data, type, {'Cache-Control':'no-cache'},
+                                        encode)
+        except HTTPException as e:
+            self.checkForCouchError(getattr(e, "status", None),
+                                    getattr(e, "reason", None), data)
+        try:
+            return JSONRowStream(response.read).decode()
+        finally:
+            response.close()
+
+    def streamRows(self, uri, data = None, type = 'GET', encode = True):
+        """
+        _streamRows_
+
+        Like loadRows, but return the rows one at a time as they are decoded.
+        The other members of the response are dropped.
+        """
+        if self.connectionPool == None:
+            for row in self.makeRequest(uri, data, type, encode = encode).get('rows', []):
+                yield row
+            return
+
+        try:
+            response = self.openRequest(uri, data, type, {'Cache-Control':'no-cache'},
+                                        encode)
+        except HTTPException as e:
+            self.checkForCouchError(getattr(e, "status", None),
+                                    getattr(e, "reason", None), data)
+        try:
+            for row in JSONRowStream(response.read):
+                yield row
+        finally:
+            response.close()
+
+    def streamBody(self, uri, data = None, type = 'GET', encode = True, chunkSize = 65536):
+        """
+        _streamBody_
+
+        Return the raw body of the response in chunks of chunkSize bytes.
+        """
+        if self.connectionPool == None:
+            body = self.makeRequest(uri, data, type, encode = encode, decode = False)
+            for i in range(0, len(body), chunkSize):
+                yield body[i:i + chunkSize]
+            return
+
+        try:
+            response = self.openRequest(uri, data, type, {'Cache-Control':'no-cache'},
+                                        encode)
+        except HTTPException as e:
+            self.checkForCouchError(getattr(e, "status", None),
+                                    getattr(e, "reason", None), data)
+        try:
+            while True:
+                chunk = response.read(chunkSize)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            response.close()
+
     def checkForCouchError(self, status, reason, data = None, result = None):
         """
         _checkForCouchError_
@@ -155,9 +324,14 @@ class Database(CouchDBRequests):
     TODO: implement COPY and MOVE calls.
     TODO: remove leading whitespace when committing a view
     """
-    def __init__(self, dbname = 'database', url = 'http://localhost:5984', size = 1000, ckey = None, cert = None):
+    def __init__(self, dbname = 'database', url = 'http://localhost:5984', size = 1000, ckey = None, cert = None,
+                 maxBulkSize = 8 * 1024 * 1024, bulkThreads = 1):
         """
         A set of queries against a CouchDB database
+
+        commit() splits the queue in _bulk_docs requests of at most
+        maxBulkSize bytes (or one document), bulkThreads of them are
+        sent at the same time.
         """
         check_name(dbname)
 
@@ -167,6 +341,8 @@ class Database(CouchDBRequests):
         self._reset_queue()
 
         self._queue_size = size
+        self.maxBulkSize = maxBulkSize
+        self.bulkThreads = bulkThreads
         self.threads = []
         self.last_seq = 0
 
@@ -266,22 +442,111 @@ class Database(CouchDBRequests):
 
         if timestamp:
             self.timestamp(self._queue, timestamp)
-        # TODO: commit in thread to avoid blocking others
         uri  = '/%s/_bulk_docs/' % self.name
 
-        data['docs'] = list(self._queue)
-        retval = self.post(uri , data)
+        chunks = self._bulkChunks(list(self._queue), data)
+        results = self._postChunks(uri, chunks)
         self._reset_queue()
         for v in viewlist:
             design, view = v.split('/')
             self.loadView(design, view, {'limit': 0})
-        if callback:
-            for idx, result in enumerate(retval):
-                if result.get('error', None) == 'conflict':
-                    retval[idx] = callback(self, data, result)
+
+        retval = []
+        for (docs, body), chunkRetval in zip(chunks, results):
+            if callback:
+                chunkData = dict(data)
+                chunkData['docs'] = docs
+                for idx, result in enumerate(chunkRetval):
+                    if result.get('error', None) == 'conflict':
+                        chunkRetval[idx] = callback(self, chunkData, result)
+            retval.extend(chunkRetval)
 
         return retval
 
+    def _bulkChunks(self, docs, data):
+        """
+        _bulkChunks_
+
+        Encode the documents and group them in _bulk_docs bodies of at most
+        self.maxBulkSize bytes.  The extra bulk docs parameters in data are
+        added to every body.  Returns a list of (documents, body).
+        """
+        extra = ''
+        if data:
+            extra = ', ' + self.encode(data).strip()[1:-1]
+
+        chunks = []
+        chunkDocs = []
+        encodedDocs = []
+        chunkSize = 0
+        for doc in docs:
+            encodedDoc = self.encode(doc)
+            if chunkDocs and chunkSize + len(encodedDoc) > self.maxBulkSize:
+                chunks.append((chunkDocs, '{"docs": [%s]%s}' % (', '.join(encodedDocs), extra)))
+                chunkDocs = []
+                encodedDocs = []
+                chunkSize = 0
+            chunkDocs.append(doc)
+            encodedDocs.append(encodedDoc)
+            chunkSize += len(encodedDoc) + 2
+        if chunkDocs:
+            chunks.append((chunkDocs, '{"docs": [%s]%s}' % (', '.join(encodedDocs), extra)))
+        return chunks
+
+    def _postChunks(self, uri, chunks):
+        """
+        _postChunks_
+
+        Post the _bulk_docs bodies, up to self.bulkThreads at a time, and
+        return their results in order.  If any of them fail the documents
+        that were not committed are left in the queue and the first error is
+        raised.
+        """
+        results = [None] * len(chunks)
+        errors = {}
+
+        def postChunk(index):
+            try:
+                results[index] = self.post(uri, chunks[index][1], encode = False)
+            except Exception as ex:
+                errors[index] = ex
+            return
+
+        if self.bulkThreads > 1 and len(chunks) > 1 and self.connectionPool != None:
+            pending = range(len(chunks))
+            lock = threading.Lock()
+            def worker():
+                while True:
+                    lock.acquire()
+                    try:
+                        if not pending or errors:
+                            return
+                        index = pending.pop(0)
+                    finally:
+                        lock.release()
+                    postChunk(index)
+
+            workers = [threading.Thread(target = worker)
+                       for i in range(min(self.bulkThreads, len(chunks)))]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+        else:
+            for index in range(len(chunks)):
+                postChunk(index)
+                if errors:
+                    break
+
+        if errors:
+            self._queue = []
+            for index, (docs, body) in enumerate(chunks):
+                if results[index] == None:
+                    self._queue.extend(docs)
+            raise errors[min(errors.keys())]
+
+        return results
+
     def document(self, id, rev = None):
         """
         Load a document identified by id. You can specify a rev to see an older revision
@@ -460,25 +725,18 @@ class Database(CouchDBRequests):
 
         more info: http://wiki.apache.org/couchdb/HTTP_view_API
         """
-        encodedOptions = {}
-        for k,v in options.iteritems():
-            # We can't encode the stale option, as it will be converted to '"ok"'
-            # which couch barfs on.
-            if k == "stale":
-                encodedOptions[k] = v
-            else:
-                encodedOptions[k] = self.encode(v)
+        encodedOptions = self.encodeOptions(options)
 
         if len(keys):
             if (encodedOptions):
                 data = urllib.urlencode(encodedOptions)
-                retval = self.post('/%s/_design/%s/_view/%s?%s' % \
-                            (self.name, design, view, data), {'keys':keys})
+                retval = self.loadRows('/%s/_design/%s/_view/%s?%s' % \
+                            (self.name, design, view, data), {'keys':keys}, 'POST')
             else:
-                retval = self.post('/%s/_design/%s/_view/%s' % \
-                            (self.name, design, view), {'keys':keys})
+                retval = self.loadRows('/%s/_design/%s/_view/%s' % \
+                            (self.name, design, view), {'keys':keys}, 'POST')
         else:
-            retval = self.get('/%s/_design/%s/_view/%s' % \
+            retval = self.loadRows('/%s/_design/%s/_view/%s' % \
                             (self.name, design, view), encodedOptions)
         if ('error' in retval):
             raise RuntimeError ,\
@@ -487,6 +745,129 @@ class Database(CouchDBRequests):
         else:
             return retval
 
+    def encodeOptions(self, options):
+        """
+        _encodeOptions_
+
+        JSON encode the view query options.
+        """
+        encodedOptions = {}
+        for k,v in options.iteritems():
+            # We can't encode the stale option, as it will be converted to '"ok"'
+            # which couch barfs on.
+            if k == "stale":
+                encodedOptions[k] = v
+            else:
+                encodedOptions[k] = self.encode(v)
+        return encodedOptions
+
+    def iterRows(self, uri, options = {}, keys = [], pageSize = 1000, docIDs = True):
+        """
+        _iterRows_
+
+        Page through the rows of a view or of _all_docs, pageSize rows at a
+        time.  Each page asks for one more row than it returns, that row is
+        the start of the next page (startkey and, for views, startkey_docid),
+        so no rows are skipped over by the server.  Rows of the page already
+        returned with the same key and document as that row are skipped.  A
+        limit in the options is the total number of rows returned.
+
+        With keys, the keys are sent pageSize at a time instead.
+        """
+        if len(keys):
+            encodedOptions = self.encodeOptions(options)
+            if encodedOptions:
+                uri = '%s?%s' % (uri, urllib.urlencode(encodedOptions))
+            for i in range(0, len(keys), pageSize):
+                for row in self.streamRows(uri, {'keys': keys[i:i + pageSize]}, 'POST'):
+                    yield row
+            return
+
+        options = dict(options)
+        remaining = options.pop('limit', None)
+        if 'key' in options:
+            # key would override the startkey of the next pages
+            options['startkey'] = options['endkey'] = options.pop('key')
+        # A document can emit several rows with the same key, the rows of the
+        # start (key, document) of a page that were already returned
+        startRow = None
+        skip = 0
+        while remaining == None or remaining > 0:
+            pageLimit = pageSize
+            if remaining != None:
+                pageLimit = min(pageSize, remaining)
+            options['limit'] = pageLimit + 1
+
+            nextRow = None
+            count = 0
+            lastRow = startRow
+            same = skip
+            for row in self.streamRows(uri, self.encodeOptions(options)):
+                if count == pageLimit:
+                    nextRow = row
+                else:
+                    yield row
+                    rowID = (row['key'], row.get('id'))
+                    if rowID == lastRow:
+                        same += 1
+                    else:
+                        lastRow = rowID
+                        same = 1
+                count += 1
+
+            if nextRow == None:
+                return
+            if remaining != None:
+                remaining -= pageLimit
+            options.pop('skip', None)
+            options['startkey'] = nextRow['key']
+            skip = 0
+            if docIDs:
+                options['startkey_docid'] = nextRow['id']
+                startRow = (nextRow['key'], nextRow['id'])
+                if lastRow == startRow:
+                    skip = same
+                    options['skip'] = skip
+        return
+
+    def iterView(self, design, view, options = {}, keys = [], pageSize = 1000):
+        """
+        _iterView_
+
+        Iterate over the rows of a view like loadView, pageSize rows at a
+        time.  The rows are decoded as they are read, so the whole view is
+        never in memory.  Grouped reduce views are paged on the group key.
+        """
+        docIDs = not (options.get('reduce', True) and \
+                      (options.get('group') or options.get('group_level')))
+        return self.iterRows('/%s/_design/%s/_view/%s' % (self.name, design, view),
+                             options, keys, pageSize, docIDs)
+
+    def iterAllDocs(self, options = {}, keys = [], pageSize = 1000):
+        """
+        _iterAllDocs_
+
+        Iterate over the rows of _all_docs like allDocs, pageSize rows at a
+        time.
+        """
+        return self.iterRows('/%s/_all_docs' % self.name, options, keys,
+                             pageSize, docIDs = False)
+
+    def iterList(self, design, list, view, options = {}, keys = [], chunkSize = 65536):
+        """
+        _iterList_
+
+        Return the output of a list function in chunks of chunkSize bytes
+        as it is read.  Like loadList the data is not decoded.
+        """
+        encodedOptions = self.encodeOptions(options)
+        uri = '/%s/_design/%s/_list/%s/%s' % (self.name, design, list, view)
+        if len(keys):
+            if encodedOptions:
+                uri = '%s?%s' % (uri, urllib.urlencode(encodedOptions))
+            return self.streamBody(uri, {'keys': keys}, 'POST', chunkSize = chunkSize)
+        return self.streamBody(uri, encodedOptions, chunkSize = chunkSize)
+
     def loadList(self, design, list, view, options = {}, keys = []):
         """
         Load data from a list function. This returns data that hasn't been
@@ -529,13 +910,13 @@ class Database(CouchDBRequests):
         if len(keys):
             if (encodedOptions):
                 data = urllib.urlencode(encodedOptions)
-                return self.post('/%s/_all_docs?%s' % (self.name, data),
-                                 {'keys':keys})
+                return self.loadRows('/%s/_all_docs?%s' % (self.name, data),
+                                     {'keys':keys}, 'POST')
             else:
-                return self.post('/%s/_all_docs' % self.name,
-                                 {'keys':keys})
+                return self.loadRows('/%s/_all_docs' % self.name,
+                                     {'keys':keys}, 'POST')
         else:
-            return self.get('/%s/_all_docs' % self.name, encodedOptions)
+            return self.loadRows('/%s/_all_docs' % self.name, encodedOptions)
 
     def info(self):
         """
@@ -601,8 +982,7 @@ class Database(CouchDBRequests):
         if len(ids) == 0:
             return None
         
-        docs = self.allDocs(keys=ids)['rows']
-        for j in docs:
+        for j in self.iterAllDocs(keys=ids):
             doc = {}
             doc["_id"]  = j['id']
             doc["_rev"] = j['value']['rev']
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""
+_CouchClient_
+
+Keep-alive HTTP client used by CMSCouch.
+
+Connections to the CouchDB servers are kept open in a process wide pool and
+shared by all the CouchDB objects, so a new TCP (and SSL) connection isn't
+opened for every request or for every Database object.  A connection is
+only used by one request at a time, so several threads can have requests
+in flight against the same server.
+
+Large responses can be decoded while they are read: JSONRowStream decodes
+the rows of a view one at a time instead of reading the whole body into a
+string and decoding it in one go.
+"""
+
+import re
+import ssl
+import json
+import socket
+import httplib
+import threading
+
+from WMCore.Wrappers.JsonWrapper.JSONThunker import JSONThunker
+
+# Errors raised when a connection kept in the pool was closed by the server
+STALE_CONNECTION_ERRORS = (socket.error, httplib.BadStatusLine,
+                           httplib.CannotSendRequest, httplib.ResponseNotReady)
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+def httpsOptions():
+    """
+    _httpsOptions_
+
+    Extra HTTPSConnection arguments.  Python 2.7.9 and later verify the
+    server certificate and host name by default, disable that like
+    Requests does, we don't have a single PEM with all the CAs.
+    """
+    if hasattr(ssl, "_create_unverified_context"):
+        return {"context": ssl._create_unverified_context()}
+    return {}
+
+class ConnectionPool(object):
+    """
+    _ConnectionPool_
+
+    Idle keep-alive connections, by server and credentials.
+    """
+    def __init__(self, maxIdle = 8):
+        self.maxIdle = maxIdle
+        self.lock = threading.Lock()
+        self.idle = {}
+        return
+
+    def acquire(self, scheme, netloc, timeout = None, key = None, cert = None):
+        """
+        _acquire_
+
+        Return a connection to the given server and whether it was reused
+        from the pool.  Reused connections may have been closed by the
+        server in the meantime.
+        """
+        poolKey = (scheme, netloc, key, cert)
+        self.lock.acquire()
+        try:
+            connections = self.idle.get(poolKey, [])
+            if connections:
+                return connections.pop(), True
+        finally:
+            self.lock.release()
+
+        if scheme == "https":
+            conn = httplib.HTTPSConnection(netloc, key_file = key,
+                                           cert_file = cert, timeout = timeout,
+                                           **httpsOptions())
+        else:
+            conn = httplib.HTTPConnection(netloc, timeout = timeout)
+        conn.poolKey = poolKey
+        return conn, False
+
+    def release(self, conn):
+        """
+        _release_
+
+        Give back a connection whose last response was read completely.
+        """
+        self.lock.acquire()
+        try:
+            connections = self.idle.setdefault(conn.poolKey, [])
+            if len(connections) < self.maxIdle:
+                connections.append(conn)
+                return
+        finally:
+            self.lock.release()
+        conn.close()
+        return
+
+    def clear(self):
+        """
+        _clear_
+
+        Close all the idle connections.
+        """
+        self.lock.acquire()
+        try:
+            idle = self.idle
+            self.idle = {}
+        finally:
+            self.lock.release()
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+        return
+
+_connectionPool = ConnectionPool()
+
+def getConnectionPool():
+    """
+    _getConnectionPool_
+
+    Return the connection pool shared by the whole process.
+    """
+    return _connectionPool
+
+class PooledResponse(object):
+    """
+    _PooledResponse_
+
+    HTTP response read from a pooled connection.  The connection goes back to
+    the pool once the body has been read completely, or is closed if the
+    response is closed before that.
+    """
+    def __init__(self, response, conn, pool):
+        self.response = response
+        self.conn = conn
+        self.pool = pool
+        self.status = response.status
+        self.reason = response.reason
+        return
+
+    def getheader(self, name, default = None):
+        return self.response.getheader(name, default)
+
+    def read(self, amt = None):
+        """
+        _read_
+
+        Read amt bytes of the body, or all of it.  An empty string is returned
+        at the end of the body.
+        """
+        if self.conn == None:
+            return ''
+        try:
+            if amt == None:
+                data = self.response.read()
+            else:
+                data = self.response.read(amt)
+        except Exception:
+            self.close()
+            raise
+
+        if amt == None or not data:
+            self._finish()
+        return data
+
+    def _finish(self):
+        """
+        _finish_
+
+        The body was read, give the connection back unless the server is
+        going to close it.
+        """
+        conn = self.conn
+        self.conn = None
+        if self.response.will_close:
+            conn.close()
+        else:
+            self.pool.release(conn)
+        return
+
+    def close(self):
+        """
+        _close_
+
+        Drop the connection, the rest of the body is not read.
+        """
+        if self.conn != None:
+            self.conn.close()
+            self.conn = None
+        return
+
+class JSONRowStream(object):
+    """
+    _JSONRowStream_
+
+    Decode a JSON object of the form {..., "rows": [row, row, ...], ...}, as
+    returned by views and _all_docs, from a read function.  Iterating over
+    the stream returns the rows as they are decoded.  The other members of
+    the object are stored in the members dictionary as they are found, they
+    are all there once the iteration is over.
+
+    The result is the same as decoding the whole body with JSONRequests:
+    the values of the members are unthunked, the rows (list items) are not.
+    """
+    def __init__(self, read, rowsKey = "rows", chunkSize = 65536, unthunk = True):
+        self.read = read
+        self.rowsKey = rowsKey
+        self.chunkSize = chunkSize
+        self.members = {}
+        self.decoder = json.JSONDecoder()
+        self.thunker = None
+        if unthunk:
+            self.thunker = JSONThunker()
+
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        return
+
+    def _fill(self, amount):
+        """
+        _fill_
+
+        Append at least amount bytes (unless the body is over) to the buffer,
+        dropping what was already decoded.  Return False at the end of the body.
+        """
+        if self.eof:
+            return False
+        chunks = [self.buffer[self.position:]]
+        read = 0
+        while read < amount:
+            data = self.read(max(amount - read, self.chunkSize))
+            if not data:
+                self.eof = True
+                break
+            chunks.append(data)
+            read += len(data)
+        self.buffer = ''.join(chunks)
+        self.position = 0
+        return read > 0
+
+    def _skip(self):
+        """
+        _skip_
+
+        Skip whitespace and return the next character, or '' at the end of
+        the body.
+        """
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill(self.chunkSize):
+                return ''
+
+    def _expect(self, characters):
+        """
+        _expect_
+
+        Consume the next character, which must be one of characters.
+        """
+        character = self._skip()
+        if character == '' or character not in characters:
+            raise ValueError("Expecting one of '%s' at offset %i of the decoded buffer, found '%s'" % \
+                             (characters, self.position, character))
+        self.position += 1
+        return character
+
+    def _value(self, unthunk = False):
+        """
+        _value_
+
+        Decode the next JSON value.  A value that runs up to the end of the
+        buffer may be truncated (numbers), so the buffer is refilled first.
+        """
+        self._skip()
+        amount = self.chunkSize
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    if unthunk and self.thunker != None:
+                        value = self.thunker.unthunk(value)
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill(amount)
+            amount *= 2
+
+    def __iter__(self):
+        self._expect('{')
+        if self._skip() == '}':
+            return
+
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == self.rowsKey:
+                self.members[key] = []
+                self._expect('[')
+                if self._skip() == ']':
+                    self.position += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.members[key] = self._value(unthunk = True)
+
+            if self._expect(',}') == '}':
+                break
+        return
+
+    def decode(self):
+        """
+        _decode_
+
+        Decode the whole object, with the rows in a list.
+        """
+        rows = list(self)
+        result = dict(self.members)
+        if self.rowsKey in result:
+            result[self.rowsKey] = rows
+        return result
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+_DAOProfiler_
+
+Opt-in profiling of the DAOs created through the DAOFactory.
+
+Once enableProfiling() has been called every DAO handed out by a DAOFactory
+has its execute method wrapped.  For each DAO class the number of calls, the
+wall time spent in execute and the number of binds sent and rows returned by
+the queries it ran through DBInterface.processData are accumulated.
+
+The statistics are kept per thread so that every worker thread of a
+component gets the figures of its own polling cycle.  At the end of a cycle
+dumpCycle() writes them as JSON to the component directory, where the agent
+REST interface picks them up with loadProfiles().
+"""
+
+import os
+import json
+import glob
+import time
+import threading
+
+from WMCore.Database.ResultSet import ResultSet
+
+_local = threading.local()
+_enabled = False
+
+def enableProfiling(enabled = True):
+    """
+    _enableProfiling_
+
+    Switch DAO profiling on (or off) for the whole process.  Only DAOs created
+    after profiling has been enabled are instrumented.
+    """
+    global _enabled
+    _enabled = enabled
+    return
+
+def profilingEnabled():
+    return _enabled
+
+def _threadStats():
+    stats = getattr(_local, "stats", None)
+    if stats == None:
+        stats = _local.stats = {}
+        _local.stack = []
+        _local.cycleStart = time.time()
+    return stats
+
+def profileDAO(instance):
+    """
+    _profileDAO_
+
+    Wrap the execute method of a DAO instance so that its calls are timed.
+    """
+    daoName = instance.__class__.__module__
+    execute = instance.execute
+
+    def profiledExecute(*args, **kwargs):
+        stats = _threadStats()
+        if daoName not in stats:
+            stats[daoName] = {"calls": 0, "time": 0.0, "max": 0.0,
+                              "binds": 0, "rows": 0}
+        daoStats = stats[daoName]
+
+        _local.stack.append(daoStats)
+        startTime = time.time()
+        try:
+            return execute(*args, **kwargs)
+        finally:
+            elapsed = time.time() - startTime
+            _local.stack.pop()
+            daoStats["calls"] += 1
+            daoStats["time"] += elapsed
+            daoStats["max"] = max(daoStats["max"], elapsed)
+
+    instance.execute = profiledExecute
+    return instance
+
+def recordQuery(bindCount, result):
+    """
+    _recordQuery_
+
+    Called by DBInterface.processData, adds the binds and the rows of a query
+    to the DAO currently being executed in this thread, if any.
+    """
+    stack = getattr(_local, "stack", None)
+    if not stack:
+        return
+
+    rows = 0
+    for resultSet in result:
+        if isinstance(resultSet, ResultSet):
+            rows += resultSet.rowCount
+
+    daoStats = stack[-1]
+    daoStats["binds"] += bindCount
+    daoStats["rows"] += rows
+    return
+
+def cycleSummary(reset = True):
+    """
+    _cycleSummary_
+
+    Return the statistics gathered in this thread since the last reset.
+    """
+    stats = _threadStats()
+    summary = {"start": _local.cycleStart,
+               "duration": time.time() - _local.cycleStart,
+               "daos": dict([(name, dict(daoStats)) for name, daoStats in stats.items()])}
+    if reset:
+        stats.clear()
+        _local.cycleStart = time.time()
+    return summary
+
+def dumpCycle(directory, workerName, extra = None, logger = None):
+    """
+    _dumpCycle_
+
+    Write the statistics of the cycle that just ended in this thread to
+    DAOProfile_<workerName>.json in the given directory and reset them.
+    extra can hold further information (e.g. the connection pool metrics)
+    to be written along.  The DAOs are logged by decreasing time.
+    """
+    summary = cycleSummary()
+    summary["worker"] = workerName
+    summary["end"] = time.time()
+    if extra:
+        summary.update(extra)
+
+    if logger != None:
+        ranking = sorted(summary["daos"].items(), key = lambda x: x[1]["time"],
+                         reverse = True)
+        for name, daoStats in ranking[:10]:
+            logger.info("DAO profile %s: %s calls, %.3f s, %s binds, %s rows" % \
+                        (name, daoStats["calls"], daoStats["time"],
+                         daoStats["binds"], daoStats["rows"]))
+
+    profilePath = os.path.join(directory, "DAOProfile_%s.json" % workerName)
+    tempPath = "%s.tmp" % profilePath
+    handle = open(tempPath, "w")
+    try:
+        json.dump(summary, handle)
+    finally:
+        handle.close()
+    os.rename(tempPath, profilePath)
+    return summary
+
+def loadProfiles(workDir, component = None):
+    """
+    _loadProfiles_
+
+    Load the last cycle profiles dumped by the components living in workDir,
+    keyed by component and worker name.
+    """
+    if component:
+        pattern = os.path.join(workDir, component, "DAOProfile_*.json")
+    else:
+        pattern = os.path.join(workDir, "*", "DAOProfile_*.json")
+
+    profiles = {}
+    for profilePath in glob.glob(pattern):
+        componentName = os.path.basename(os.path.dirname(profilePath))
+        handle = open(profilePath, "r")
+        try:
+            profile = json.load(handle)
+        finally:
+            handle.close()
+        profiles.setdefault(componentName, {})[profile["worker"]] = profile
+
+    return profiles
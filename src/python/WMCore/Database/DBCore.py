@@ -9,8 +9,14 @@ Core Database APIs
 
 
 
+import re
+import time
+
 from WMCore.DataStructs.WMObject import WMObject
 from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.DBMetrics import callerName
+from WMCore.Database.Transaction import Transaction
+from WMCore.Database import DAOProfiler
 from copy import copy
 import WMCore.WMLogging
 
@@ -32,10 +38,11 @@ class DBInterface(WMObject):
     logger = None
     engine = None
 
-    def __init__(self, logger, engine):
+    def __init__(self, logger, engine, metrics = None):
         self.logger = logger
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
+        self.metrics = metrics
         self.maxBindsPerQuery = 500
 
     def buildbinds(self, sequence, thename, therest=[{}]):
@@ -53,7 +60,7 @@ class DBInterface(WMObject):
         return binds
 
     def executebinds(self, s=None, b=None, connection=None,
-                     returnCursor=False):
+                     returnCursor=False, columnar=False):
         """
         _executebinds_
 
@@ -67,13 +74,13 @@ class DBInterface(WMObject):
         if returnCursor:
             return resultProxy
 
-        result = ResultSet()
+        result = ResultSet(columnar=columnar)
         result.add(resultProxy)
         resultProxy.close()
         return result
 
     def executemanybinds(self, s=None, b=None, connection=None,
-                         returnCursor=False):
+                         returnCursor=False, columnar=False):
         """
         _executemanybinds_
         b is a list of dictionaries for the binds, e.g.:
@@ -100,7 +107,7 @@ class DBInterface(WMObject):
                 for bind in b:
                     result.append(connection.execute(s, bind))
             else:
-                result = ResultSet()
+                result = ResultSet(columnar=columnar)
                 for bind in b:
                     resultproxy = connection.execute(s, bind)
                     result.add(resultproxy)
@@ -114,20 +121,132 @@ class DBInterface(WMObject):
         result = connection.execute(s, b)
         return self.makelist(result)
 
+    def executebatchedselect(self, s=None, b=None, connection=None,
+                             returnCursor=False, columnar=False):
+        """
+        _executebatchedselect_
+
+        Run a select that has a single bind variable against a list of binds
+        by rewriting the "column = :bind" clause into chunked "column IN
+        (:bind_0, :bind_1, ...)" clauses, each chunk holding at most
+        maxBindsPerQuery values.  This replaces one round trip per bind with
+        one round trip per chunk.
+
+        The rows are reassembled into a single ResultSet in the same order
+        (and with the same duplication) that executemanybinds would have
+        produced.  That requires the select to return the bind value in a
+        column with the same name as the bind variable, e.g.:
+
+          SELECT wfl.fileid AS id, ... WHERE wfl.fileid = :id
+
+        If the statement can't be rewritten, because the bind variable is used
+        more than once or with another operator than =, this falls back to
+        executemanybinds.  If the bind column isn't returned the rows are
+        returned in the order the database sent them.
+        """
+        b = self.makelist(b)
+        if returnCursor or len(b) == 0 or len(b[0].keys()) != 1:
+            return self.executemanybinds(s, b, connection=connection,
+                                         returnCursor=returnCursor,
+                                         columnar=columnar)
+
+        # Only a plain equality can be rewritten, not >=, <= or !=, and the
+        # bind variable must not be used anywhere else in the statement
+        bindName = b[0].keys()[0]
+        bindRegexp = re.compile(r"(?<![<>!])=\s*:%s\b" % re.escape(bindName), re.IGNORECASE)
+        bindUses = re.findall(r":%s\b" % re.escape(bindName), s, re.IGNORECASE)
+        if len(bindRegexp.findall(s)) != 1 or len(bindUses) != 1:
+            return self.executemanybinds(s, b, connection=connection,
+                                         returnCursor=returnCursor,
+                                         columnar=columnar)
+
+        bindValues = []
+        seenValues = set()
+        for bind in b:
+            if bind[bindName] not in seenValues:
+                seenValues.add(bind[bindName])
+                bindValues.append(bind[bindName])
+
+        keys = []
+        rows = []
+        while len(bindValues) > 0:
+            chunk = bindValues[:self.maxBindsPerQuery]
+            bindValues = bindValues[self.maxBindsPerQuery:]
+
+            chunkBinds = {}
+            bindNames = []
+            for i, value in enumerate(chunk):
+                chunkBindName = "%s_%d" % (bindName, i)
+                chunkBinds[chunkBindName] = value
+                bindNames.append(":%s" % chunkBindName)
+
+            chunkSQL = bindRegexp.sub("IN (%s)" % ", ".join(bindNames), s)
+            chunkResult = self.executebinds(chunkSQL, chunkBinds,
+                                            connection=connection)
+            if len(keys) == 0:
+                keys = chunkResult.keys
+            rows.extend(chunkResult.data)
+
+        result = ResultSet(columnar=columnar)
+        result.keys = keys
+
+        bindColumn = None
+        for i, key in enumerate(keys):
+            if str(key).lower() == bindName.lower():
+                bindColumn = i
+                break
+
+        if bindColumn == None:
+            result.extend(rows)
+            return [result]
+
+        rowsByValue = {}
+        for row in rows:
+            rowsByValue.setdefault(row[bindColumn], []).append(row)
+
+        if len(set(rowsByValue.keys()) - seenValues) > 0:
+            # The database handed back the bind column with a different type
+            # than what was bound, don't try to guess the matching.
+            result.extend(rows)
+            return [result]
+
+        for bind in b:
+            result.extend(rowsByValue.get(bind[bindName], []))
+
+        return [result]
+
     def connection(self):
         """
         Return a connection to the engine (from the connection pool)
         """
-        return self.engine.connect()
+        if self.metrics == None:
+            return self.engine.connect()
+
+        startTime = time.time()
+        connection = self.engine.connect()
+        self.metrics.recordCheckoutWait(time.time() - startTime)
+        return connection
 
 
     def processData(self, sqlstmt, binds={}, conn=None,
-                    transaction=False, returnCursor=False):
+                    transaction=False, returnCursor=False, batchSelect=False,
+                    columnar=False, _nested=False):
         """
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
+        set batchSelect = True to run a single bind variable select over a
+        list of binds as chunked IN (...) queries, see executebatchedselect()
+        set columnar = True to get back ResultSets that store one list of
+        values per column instead of one row object per record
 
         """
+        # Time the query for the DAO calling us, chunks of the same query
+        # run recursively (_nested) are not counted separately
+        daoName = None
+        if self.metrics != None and not _nested:
+            daoName = callerName(skip = (DBInterface, Transaction))
+            startTime = time.time()
+
         connection = None
         try:
             if not conn:
@@ -139,6 +258,10 @@ class DBInterface(WMObject):
             # Can take either a single statement or a list of statements and binds
             sqlstmt = self.makelist(sqlstmt)
             binds = self.makelist(binds)
+            if len(binds) == 0 or binds[0] == {} or binds[0] == None:
+                bindCount = 0
+            else:
+                bindCount = len(binds)
             if len(sqlstmt) > 0 and (len(binds) == 0 or (binds[0] == {} or binds[0] == None)):
                 # Should only be run by create statements
                 if not transaction:
@@ -147,11 +270,24 @@ class DBInterface(WMObject):
 
                 for i in sqlstmt:
                     r = self.executebinds(i, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=returnCursor,
+                                          columnar=columnar)
                     result.append(r)
 
                 if not transaction:
                     trans.commit()
+            elif len(binds) > len(sqlstmt) and len(sqlstmt) == 1 and batchSelect \
+                     and sqlstmt[0].strip().lower().startswith("select"):
+                #Run single select statement for a list of binds as IN (...) chunks
+                if not transaction:
+                    trans = connection.begin()
+
+                result.extend(self.executebatchedselect(sqlstmt[0].strip(), binds,
+                                                        connection=connection,
+                                                        returnCursor=returnCursor,
+                                                        columnar=columnar))
+                if not transaction:
+                    trans.commit()
             elif len(binds) > len(sqlstmt) and len(sqlstmt) == 1:
                 #Run single SQL statement for a list of binds - use execute_many()
                 if not transaction:
@@ -159,12 +295,14 @@ class DBInterface(WMObject):
                 while(len(binds) > self.maxBindsPerQuery):
                     result.extend(self.processData(sqlstmt, binds[:self.maxBindsPerQuery],
                                                    conn=connection, transaction=True,
-                                                   returnCursor=returnCursor))
+                                                   returnCursor=returnCursor,
+                                                   columnar=columnar, _nested=True))
                     binds = binds[self.maxBindsPerQuery:]
 
                 for i in sqlstmt:
                     result.extend(self.executemanybinds(i, binds, connection=connection,
-                                                        returnCursor=returnCursor))
+                                                        returnCursor=returnCursor,
+                                                        columnar=columnar))
                 if not transaction:
                     trans.commit()
             elif len(binds) == len(sqlstmt):
@@ -176,7 +314,8 @@ class DBInterface(WMObject):
                     b = binds[i]
 
                     r = self.executebinds(s, b, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=returnCursor,
+                                          columnar=columnar)
                     result.append(r)
 
                 if not transaction:
@@ -198,7 +337,12 @@ class DBInterface(WMObject):
                                            (type(sqlstmt), type(binds), type(connection), type(transaction)))
                 raise Exception, """DBInterface.processData Nothing executed, problem with your arguments
                 Probably mismatched sizes for sql (%i) and binds (%i)""" % (len(sqlstmt), len(binds))
+
+            if not _nested:
+                DAOProfiler.recordQuery(bindCount, result)
         finally:
             if not conn and connection != None:
                 connection.close() # Return connection to the pool
+            if daoName != None:
+                self.metrics.recordQuery(daoName, time.time() - startTime)
         return result
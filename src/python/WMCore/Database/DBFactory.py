@@ -6,11 +6,13 @@ from sqlalchemy import __version__ as sqlalchemy_version
 from WMCore.Database.Dialects import MySQLDialect
 from WMCore.Database.Dialects import SQLiteDialect
 from WMCore.Database.Dialects import OracleDialect
+from WMCore.Database.DBMetrics import DBMetrics, PoolListener
 
 class DBFactory(object):
 
     # class variable
     _engineMap = {}
+    _metricsMap = {}
     _defaultEngineParams = {"convert_unicode" : True,
                             "strategy": "threadlocal",
                             "pool_recycle": 7200}
@@ -18,9 +20,15 @@ class DBFactory(object):
     def __init__(self, logger, dburl=None, options={}):
         self.logger = logger
         # get the engine parameter from option
+        engineParams = dict(self._defaultEngineParams)
         if 'engine_parameters' in options.keys():
-            self._defaultEngineParams.update(options['engine_parameters'])
+            engineParams.update(options['engine_parameters'])
             del options['engine_parameters']
+        # test pooled connections with a trivial query before handing them out
+        prePing = False
+        if 'pre_ping' in options.keys():
+            prePing = options['pre_ping']
+            del options['pre_ping']
 
         if dburl:
             self.dburl = dburl
@@ -85,18 +93,26 @@ class DBFactory(object):
 
             self.engine = None
             self.dia = None
+            self.metrics = None
 
         else:
             if self.dburl.split(':')[0].lower() == "sqlite":
                 self.engine = create_engine(self.dburl,
                                             connect_args = options,
-                                            **self._defaultEngineParams)
+                                            **engineParams)
+                self.metrics = DBMetrics()
+                self._addPoolListener(prePing)
+            elif self.dburl not in self._engineMap:
+                self.engine = create_engine(self.dburl,
+                                            connect_args = options,
+                                            **engineParams)
+                self.metrics = DBMetrics()
+                self._addPoolListener(prePing)
+                self._engineMap[self.dburl] = self.engine
+                self._metricsMap[self.dburl] = self.metrics
             else:
-                self.engine = self._engineMap.setdefault(self.dburl,
-                                             create_engine(self.dburl,
-                                                           connect_args = options,
-                                                           **self._defaultEngineParams)
-                                                      )
+                self.engine = self._engineMap[self.dburl]
+                self.metrics = self._metricsMap[self.dburl]
             self.dia = self.engine.dialect
 
         self.lock = threading.Condition()
@@ -114,10 +130,33 @@ class DBFactory(object):
             else:
                 from WMCore.Database.DBCore import DBInterface
             # we instantiate within the lock so we can safely return the local instance.
-            dbInterface =  DBInterface(self.logger, self.engine)
+            dbInterface =  DBInterface(self.logger, self.engine, self.metrics)
 
         else:
             dbInterface =  None
 
         self.lock.release()
         return dbInterface
+
+    def _addPoolListener(self, prePing):
+        """
+        _addPoolListener_
+
+        Hook the metrics (and the optional pre-ping) into the connection pool.
+        """
+        if isinstance(self.engine.dialect, OracleDialect):
+            pingSQL = "SELECT 1 FROM DUAL"
+        else:
+            pingSQL = "SELECT 1"
+        self.engine.pool.add_listener(PoolListener(self.metrics, prePing, pingSQL))
+        return
+
+    def getMetrics(self):
+        """
+        _getMetrics_
+
+        Snapshot of the connection pool and query metrics of the engine.
+        """
+        if self.metrics == None:
+            return {}
+        return self.metrics.snapshot()
@@ -13,6 +13,7 @@ import time
 import types 
 
 from WMCore.DataStructs.WMObject import WMObject
+from WMCore.Database.ResultSet import ResultSet, StreamingResultSet
 
 class DBFormatter(WMObject):
     def __init__(self, logger, dbinterface):
@@ -95,10 +96,67 @@ class DBFormatter(WMObject):
 
         r = result[0]
         description = map(lambda x: str(x).lower(), r.keys)
-        if len(r.data) < 1:
+        row = r.fetchone()
+        if len(row) < 1:
             return {}
 
-        return dict(zip(description, r.fetchone()))
+        return dict(zip(description, row))
+
+    def formatColumns(self, result):
+        """
+        Returns a dictionary keyed by the lower case column name holding a
+        list of values for each column.  Works with both regular and columnar
+        ResultSets as well as cursors returned with returnCursor = True, and
+        doesn't build a dictionary per row.
+        """
+        columnsOut = {}
+        for r in result:
+            if not isinstance(r, (ResultSet, StreamingResultSet)):
+                r = StreamingResultSet(r)
+
+            descriptions = [str(x).lower() for x in r.keys]
+            for description in descriptions:
+                columnsOut.setdefault(description, [])
+
+            for index, column in enumerate(r.fetchcolumns()):
+                values = columnsOut[descriptions[index]]
+                for value in column:
+                    if type(value) == unicode:
+                        values.append(str(value))
+                    else:
+                        values.append(value)
+
+            r.close()
+
+        return columnsOut
+
+    def formatDictChunks(self, result, size = 1000):
+        """
+        Generator version of formatDict(), yields lists of at most size
+        dictionaries so that only one chunk of formatted rows is held in
+        memory at any time.  Cursors returned with returnCursor = True are
+        read from the database as the chunks are consumed.
+        """
+        for r in result:
+            if not isinstance(r, (ResultSet, StreamingResultSet)):
+                r = StreamingResultSet(r, chunkSize = size)
+
+            descriptions = [str(x).lower() for x in r.keys]
+            for rows in r.fetchchunks(size):
+                dictOut = []
+                for row in rows:
+                    entry = {}
+                    for index, description in enumerate(descriptions):
+                        if type(row[index]) == unicode:
+                            entry[description] = str(row[index])
+                        else:
+                            entry[description] = row[index]
+                    dictOut.append(entry)
+                yield dictOut
+
+            r.close()
+
+        return
 
 
     def formatCursor(self, cursor, size=10):
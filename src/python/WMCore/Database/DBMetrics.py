@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+_DBMetrics_
+
+Connection pool and query metrics for a database engine.
+
+One DBMetrics object is shared by all the DBInterfaces built on the same
+engine.  It keeps track of the time spent waiting for a connection from
+the pool, the number of connections checked out and a latency histogram
+of the queries run through processData, keyed by the class of the DAO
+that ran them.  The PoolListener below feeds the pool counters and does
+the optional pre-ping of connections handed out by the pool.
+"""
+
+import sys
+import threading
+
+try:
+    from sqlalchemy.exc import DisconnectionError
+except ImportError:
+    from sqlalchemy.exceptions import DisconnectionError
+
+# Upper bounds of the latency histogram bins, in seconds.  Slower queries
+# end up in the last, open ended, bin.
+LATENCY_BINS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+def callerName(skip = ()):
+    """
+    _callerName_
+
+    Name of the class (or module) of the code calling the function that
+    called callerName(), e.g. the DAO calling processData().  Frames of
+    methods of the classes in skip are passed over, so the name is the same
+    however many database layer wrappers the call went through.
+    """
+    frame = sys._getframe(2)
+    while frame != None:
+        caller = frame.f_locals.get("self", None)
+        if caller == None:
+            return frame.f_globals.get("__name__", "unknown")
+        if not isinstance(caller, skip):
+            return caller.__class__.__module__
+        frame = frame.f_back
+    return "unknown"
+
+class DBMetrics(object):
+    """
+    _DBMetrics_
+
+    Thread safe counters for a connection pool and the queries run on it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.activeConnections = 0
+        self.reset()
+        return
+
+    def reset(self):
+        """
+        _reset_
+
+        Clear the counters, the number of active connections is kept.
+        """
+        self.lock.acquire()
+        try:
+            self.checkouts = 0
+            self.checkoutWait = 0.0
+            self.maxCheckoutWait = 0.0
+            self.maxActiveConnections = self.activeConnections
+            self.disconnects = 0
+            self.queries = {}
+        finally:
+            self.lock.release()
+        return
+
+    def recordCheckoutWait(self, elapsed):
+        """
+        _recordCheckoutWait_
+
+        Record how long it took to get a connection from the pool.
+        """
+        self.lock.acquire()
+        try:
+            self.checkouts += 1
+            self.checkoutWait += elapsed
+            self.maxCheckoutWait = max(self.maxCheckoutWait, elapsed)
+        finally:
+            self.lock.release()
+        return
+
+    def connectionCheckedOut(self):
+        self.lock.acquire()
+        try:
+            self.activeConnections += 1
+            self.maxActiveConnections = max(self.maxActiveConnections,
+                                            self.activeConnections)
+        finally:
+            self.lock.release()
+        return
+
+    def connectionCheckedIn(self):
+        self.lock.acquire()
+        try:
+            self.activeConnections = max(self.activeConnections - 1, 0)
+        finally:
+            self.lock.release()
+        return
+
+    def connectionInvalidated(self):
+        self.lock.acquire()
+        try:
+            self.disconnects += 1
+        finally:
+            self.lock.release()
+        return
+
+    def recordQuery(self, name, elapsed):
+        """
+        _recordQuery_
+
+        Add a query to the latency histogram of the given DAO class.
+        """
+        self.lock.acquire()
+        try:
+            if name not in self.queries:
+                self.queries[name] = {"count": 0, "time": 0.0, "max": 0.0,
+                                      "histogram": [0] * (len(LATENCY_BINS) + 1)}
+            queryInfo = self.queries[name]
+            queryInfo["count"] += 1
+            queryInfo["time"] += elapsed
+            queryInfo["max"] = max(queryInfo["max"], elapsed)
+
+            index = 0
+            while index < len(LATENCY_BINS) and elapsed > LATENCY_BINS[index]:
+                index += 1
+            queryInfo["histogram"][index] += 1
+        finally:
+            self.lock.release()
+        return
+
+    def snapshot(self):
+        """
+        _snapshot_
+
+        Return a copy of all the counters that can be JSON encoded.
+        """
+        self.lock.acquire()
+        try:
+            queries = {}
+            for name, queryInfo in self.queries.items():
+                queries[name] = {"count": queryInfo["count"],
+                                 "time": queryInfo["time"],
+                                 "max": queryInfo["max"],
+                                 "histogram": list(queryInfo["histogram"])}
+
+            averageWait = 0.0
+            if self.checkouts > 0:
+                averageWait = self.checkoutWait / self.checkouts
+
+            return {"checkouts": self.checkouts,
+                    "checkout_wait": self.checkoutWait,
+                    "avg_checkout_wait": averageWait,
+                    "max_checkout_wait": self.maxCheckoutWait,
+                    "active_connections": self.activeConnections,
+                    "max_active_connections": self.maxActiveConnections,
+                    "disconnects": self.disconnects,
+                    "latency_bins": list(LATENCY_BINS),
+                    "queries": queries}
+        finally:
+            self.lock.release()
+
+class PoolListener(object):
+    """
+    _PoolListener_
+
+    SQLAlchemy pool listener counting the connections checked out of the
+    pool.  If prePing is set every connection is tested with a trivial query
+    when it is checked out, dead connections are replaced by the pool.
+    """
+    def __init__(self, metrics, prePing = False, pingSQL = "SELECT 1"):
+        self.metrics = metrics
+        self.prePing = prePing
+        self.pingSQL = pingSQL
+        return
+
+    def checkout(self, dbapi_con, con_record, con_proxy):
+        if self.prePing:
+            try:
+                cursor = dbapi_con.cursor()
+                cursor.execute(self.pingSQL)
+                cursor.close()
+            except Exception as ex:
+                self.metrics.connectionInvalidated()
+                raise DisconnectionError("Connection failed pre-ping: %s" % str(ex))
+
+        self.metrics.connectionCheckedOut()
+        return
+
+    def checkin(self, dbapi_con, con_record):
+        self.metrics.connectionCheckedIn()
+        return
@@ -116,7 +116,7 @@ class MySQLInterface(DBInterface):
         return (updatedSQL, mySQLBindVarsList)
 
     def executebinds(self, s = None, b = None, connection = None,
-                     returnCursor = False):
+                     returnCursor = False, columnar = False):
         """
         _executebinds_
 
@@ -124,10 +124,11 @@ class MySQLInterface(DBInterface):
         Transform the bind variables into the format that MySQL expects.
         """
         s, b = self.substitute(s, b)
-        return DBInterface.executebinds(self, s, b, connection, returnCursor)
+        return DBInterface.executebinds(self, s, b, connection, returnCursor,
+                                        columnar)
 
     def executemanybinds(self, s = None, b = None, connection = None,
-                         returnCursor = False):
+                         returnCursor = False, columnar = False):
         """
         _executemanybinds_
 
@@ -137,4 +138,4 @@ class MySQLInterface(DBInterface):
         newsql, binds = self.substitute(s, b)
 
         return DBInterface.executemanybinds(self, newsql, binds, connection,
-                                            returnCursor)
+                                            returnCursor, columnar)
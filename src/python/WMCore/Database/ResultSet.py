@@ -4,6 +4,12 @@ _ResultSet_
 A class to read in a SQLAlchemy result proxy and hold the data, such that the
 SQLAlchemy result sets (aka cursors) can be closed. Make this class look as much
 like the SQLAlchemy class to minimise the impact of adding this class.
+
+A ResultSet can also be created in columnar mode, in which case the rows are
+not kept around but their values are appended to one list per column.  This
+avoids holding a row object per record for large selects.  The
+StreamingResultSet wraps a live result proxy and hands back rows in chunks
+without ever copying the whole result.
 """
 
 
@@ -11,33 +17,172 @@ like the SQLAlchemy class to minimise the impact of adding this class.
 
 import threading
 
+def proxyKeys(resultproxy):
+    """
+    _proxyKeys_
+
+    Depending on the SQLAlchemy version the column names of a result proxy are
+    either a list or a method returning a list/set.
+    """
+    keys = resultproxy.keys
+    if callable(keys):
+        keys = keys()
+    return list(keys)
+
 class ResultSet:
-    def __init__(self):
+    def __init__(self, columnar = False, chunkSize = 1000):
         self.data = []
         self.keys = []
+        self.columnar = columnar
+        self.columns = []
+        self.rowCount = 0
+        self.chunkSize = chunkSize
 
     def close(self):
         return
 
     def fetchone(self):
+        if self.columnar:
+            if self.rowCount > 0:
+                return [column[0] for column in self.columns]
+            return []
+
         if len(self.data) > 0:
             return self.data[0]
         else:
             return []
 
     def fetchall(self):
+        if self.columnar:
+            return zip(*self.columns)
         return self.data
 
+    def fetchchunks(self, size = None):
+        """
+        _fetchchunks_
+
+        Yield the rows in lists of at most size rows.
+        """
+        size = size or self.chunkSize
+        for start in xrange(0, self.rowCount, size):
+            if self.columnar:
+                yield zip(*[column[start:start + size] for column in self.columns])
+            else:
+                yield self.data[start:start + size]
+        return
+
+    def fetchcolumns(self):
+        """
+        _fetchcolumns_
+
+        Return a list with one list of values per column, in the same order as
+        the keys.
+        """
+        if self.columnar:
+            return self.columns
+
+        columns = [[] for key in self.keys]
+        for row in self.data:
+            for index, value in enumerate(row):
+                columns[index].append(value)
+        return columns
+
+    def extend(self, rows):
+        """
+        _extend_
+
+        Append already fetched rows to the result set.
+        """
+        if self.columnar:
+            if len(self.columns) == 0:
+                self.columns = [[] for key in self.keys]
+            for row in rows:
+                for index, value in enumerate(row):
+                    self.columns[index].append(value)
+                self.rowCount += 1
+        else:
+            self.data.extend(rows)
+            self.rowCount = len(self.data)
+
+        return
+
     def add(self, resultproxy):
 
         myThread = threading.currentThread()
 
         if resultproxy.closed:
             return
+        elif self.columnar:
+            if len(self.keys) == 0:
+                self.keys.extend(proxyKeys(resultproxy))
+            while True:
+                rows = resultproxy.fetchmany(self.chunkSize)
+                if not rows:
+                    break
+                self.extend(rows)
         else:
             for r in resultproxy:
                 if len(self.keys) == 0:
                     self.keys.extend(r.keys())
                 self.data.append(r)
+            self.rowCount = len(self.data)
 
         return
+
+class StreamingResultSet:
+    """
+    _StreamingResultSet_
+
+    Wrap a result proxy that is still open, handing back the rows in chunks
+    as they are fetched from the database.  The connection the proxy belongs
+    to must stay open until the result set has been consumed.
+    """
+    def __init__(self, resultproxy, chunkSize = 1000):
+        self.resultproxy = resultproxy
+        self.keys = proxyKeys(resultproxy)
+        self.chunkSize = chunkSize
+
+    def close(self):
+        if not self.resultproxy.closed:
+            self.resultproxy.close()
+        return
+
+    def fetchone(self):
+        if self.resultproxy.closed:
+            return []
+
+        row = self.resultproxy.fetchone()
+        if row == None:
+            self.close()
+            return []
+        return row
+
+    def fetchchunks(self, size = None):
+        """
+        _fetchchunks_
+
+        Yield the remaining rows in lists of at most size rows, closing the
+        proxy once it has been exhausted.
+        """
+        size = size or self.chunkSize
+        while not self.resultproxy.closed:
+            rows = self.resultproxy.fetchmany(size)
+            if not rows:
+                self.close()
+                break
+            yield rows
+        return
+
+    def fetchall(self):
+        rows = []
+        for chunk in self.fetchchunks():
+            rows.extend(chunk)
+        return rows
+
+    def fetchcolumns(self):
+        columns = [[] for key in self.keys]
+        for chunk in self.fetchchunks():
+            for row in chunk:
+                for index, value in enumerate(row):
+                    columns[index].append(value)
+        return columns
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+_CompactReport_
+
+Compact on disk format for the framework job report.
+
+ConfigSection trees can only hold strings, numbers, None and lists, tuples
+and dictionaries of those, so they are flattened into nested tuples and
+pickled as such, which is much cheaper than pickling the ConfigSections.
+Reports are written on the worker nodes and read by the agent, so only
+pickle protocol 2 is used, which any python 2 can read.  The file starts
+with a header holding the format version, the pickle protocol and the length
+of an index.
+The index lists the offset and length of every section blob: one blob for
+the top of the report (steps and their plain attributes, like the status
+and the start and stop times) and one blob for each child section of a
+step (errors, output, input, performance...).  This allows loading only
+the sections of the steps that are actually needed.
+"""
+
+import struct
+import marshal
+import cPickle
+
+from WMCore.Configuration import ConfigSection
+
+class UnsupportedCompactReport(IOError):
+    """
+    _UnsupportedCompactReport_
+
+    The report has a compact report header this version can't read.
+    """
+    pass
+
+FORMAT_VERSION = 2
+PICKLE_PROTOCOL = 2
+FORMAT_MAGIC = "WMFJ"
+HEADER_FORMAT = "!4sBBI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+def isCompact(handle):
+    """
+    _isCompact_
+
+    Check whether the open file starts with a compact report header, the
+    file position is restored.
+    """
+    position = handle.tell()
+    magic = handle.read(len(FORMAT_MAGIC))
+    handle.seek(position)
+    return magic == FORMAT_MAGIC
+
+def encodeSection(section, skip = None):
+    """
+    _encodeSection_
+
+    Flatten a ConfigSection tree into nested tuples.  The children listed in
+    skip are left out.
+    """
+    settings = []
+    children = []
+    for name in section._internal_settings:
+        if skip and name in skip:
+            continue
+        if name in section._internal_children:
+            children.append(encodeSection(getattr(section, name)))
+        else:
+            settings.append((name, getattr(section, name)))
+
+    return (section._internal_name, section._internal_documentation,
+            section._internal_docstrings, tuple(settings), tuple(children))
+
+def decodeSection(encoded, parent = None):
+    """
+    _decodeSection_
+
+    Rebuild the ConfigSection tree flattened by encodeSection.  The values
+    were validated when the tree was built, so they are set directly.
+    """
+    name, documentation, docstrings, settings, children = encoded
+
+    section = ConfigSection.__new__(ConfigSection)
+    attributes = section.__dict__
+    attributes.update(settings)
+    attributes["_internal_name"] = name
+    attributes["_internal_documentation"] = documentation
+    attributes["_internal_docstrings"] = docstrings
+    attributes["_internal_parent_ref"] = parent
+
+    childNames = set()
+    for child in children:
+        attributes[child[0]] = decodeSection(child, section)
+        childNames.add(child[0])
+
+    attributes["_internal_children"] = childNames
+    attributes["_internal_settings"] = childNames.union([x[0] for x in settings])
+    return section
+
+def dumpReport(data, handle):
+    """
+    _dumpReport_
+
+    Write the report ConfigSection in the compact format.
+    """
+    steps = [x for x in getattr(data, "steps", []) if x in data._internal_children]
+
+    blobs = []
+    blobs.append((None, None, encodeSection(data, skip = steps)))
+    stepSections = []
+    for stepName in steps:
+        stepSection = getattr(data, stepName)
+        children = list(stepSection._internal_children)
+        stepSections.append(encodeSection(stepSection, skip = children))
+        for childName in children:
+            blobs.append((stepName, childName,
+                          encodeSection(getattr(stepSection, childName))))
+    blobs[0] = (None, None, blobs[0][2] + (tuple(stepSections),))
+
+    index = []
+    offset = 0
+    encodedBlobs = []
+    for stepName, sectionName, encoded in blobs:
+        blob = cPickle.dumps(encoded, PICKLE_PROTOCOL)
+        index.append((stepName, sectionName, offset, len(blob)))
+        encodedBlobs.append(blob)
+        offset += len(blob)
+
+    encodedIndex = cPickle.dumps(tuple(index), PICKLE_PROTOCOL)
+    handle.write(struct.pack(HEADER_FORMAT, FORMAT_MAGIC, FORMAT_VERSION,
+                             PICKLE_PROTOCOL, len(encodedIndex)))
+    handle.write(encodedIndex)
+    for blob in encodedBlobs:
+        handle.write(blob)
+    return
+
+def loadReport(handle, sections = None):
+    """
+    _loadReport_
+
+    Read a report written by dumpReport and return its ConfigSection.  If
+    sections is given only the listed step sections are loaded (e.g.
+    ["errors", "output"]), the step attributes are always loaded.
+
+    Reports of the first version of the format were encoded with marshal,
+    they are read if their marshal version is known.  Headers that can't be
+    read raise UnsupportedCompactReport.
+    """
+    header = handle.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE:
+        raise IOError("Truncated compact job report")
+    magic, version, encoding, indexLength = struct.unpack(HEADER_FORMAT, header)
+    if magic == FORMAT_MAGIC and version == 1 and encoding <= marshal.version:
+        decode = marshal.loads
+    elif magic == FORMAT_MAGIC and version == FORMAT_VERSION and \
+             encoding <= cPickle.HIGHEST_PROTOCOL:
+        decode = cPickle.loads
+    else:
+        msg = "Unsupported compact job report (version %s, encoding %s)" % \
+              (version, encoding)
+        raise UnsupportedCompactReport(msg)
+
+    index = decode(handle.read(indexLength))
+    dataStart = handle.tell()
+
+    topEncoded = None
+    stepChildren = {}
+    for stepName, sectionName, offset, length in index:
+        if stepName != None and sections != None and sectionName not in sections:
+            continue
+        handle.seek(dataStart + offset)
+        encoded = decode(handle.read(length))
+        if stepName == None:
+            topEncoded = encoded
+        else:
+            stepChildren.setdefault(stepName, []).append(encoded)
+
+    if topEncoded == None:
+        raise IOError("Compact job report without top section")
+
+    stepSections = topEncoded[5]
+    encodedSteps = []
+    for encodedStep in stepSections:
+        children = tuple(stepChildren.get(encodedStep[0], []))
+        encodedSteps.append(encodedStep[:4] + (encodedStep[4] + children,))
+
+    return decodeSection(topEncoded[:4] + (topEncoded[4] + tuple(encodedSteps),))
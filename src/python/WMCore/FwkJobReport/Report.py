@@ -22,6 +22,7 @@ from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
 
 from WMCore.FwkJobReport.FileInfo import FileInfo
+from WMCore.FwkJobReport import CompactReport
 from WMCore.WMException           import WMException
 from WMCore.WMExceptions import WMJobErrorCodes
 
@@ -342,26 +343,51 @@ class Report:
 
         return returnCode
 
-    def persist(self, filename):
+    def persist(self, filename, compact = True):
         """
         _persist_
 
-        Pickle this object and save it to disk.
+        Save this object to disk, in the compact format unless told
+        otherwise, in which case it is pickled.  A report loaded with only
+        some of its sections is completed first.
         """
+        self.completeLoad()
+
         handle = open(filename, 'w')
-        cPickle.dump(self.data, handle)
-        handle.close()
+        try:
+            if compact:
+                CompactReport.dumpReport(self.data, handle)
+            else:
+                cPickle.dump(self.data, handle)
+        finally:
+            handle.close()
         return
 
-    def unpersist(self, filename, reportname = None):
+    def unpersist(self, filename, reportname = None, sections = None):
         """
         _unpersist_
 
-        Load a pickled FWJR from disk.
+        Load a FWJR from disk, either pickled or in the compact format.  For
+        compact reports sections can list the step sections to be loaded,
+        e.g. ["errors", "output"], the step status and times are always
+        there.
         """
         handle = open(filename, 'r')
-        self.data = cPickle.load(handle)
-        handle.close()
+        try:
+            data = None
+            if CompactReport.isCompact(handle):
+                try:
+                    data = CompactReport.loadReport(handle, sections)
+                    if sections != None:
+                        self.partialLoad = (filename, sections)
+                except CompactReport.UnsupportedCompactReport as ex:
+                    logging.warning("%s, trying to unpickle %s" % (str(ex), filename))
+                    handle.seek(0)
+            if data == None:
+                data = cPickle.load(handle)
+            self.data = data
+        finally:
+            handle.close()
 
         # old self.report (if it existed) became unattached
         if reportname:
@@ -369,6 +395,36 @@ class Report:
 
         return
 
+    def completeLoad(self):
+        """
+        _completeLoad_
+
+        Load the step sections that were left out when the report was
+        loaded, the sections already loaded are kept as they are.
+        """
+        if getattr(self, "partialLoad", None) == None:
+            return
+
+        filename, sections = self.partialLoad
+        self.partialLoad = None
+
+        handle = open(filename, 'r')
+        try:
+            fullData = CompactReport.loadReport(handle)
+        finally:
+            handle.close()
+
+        for stepName in fullData.steps:
+            stepSection = self.retrieveStep(stepName)
+            if stepSection == None:
+                continue
+            fullStep = getattr(fullData, stepName)
+            for sectionName in fullStep._internal_children:
+                if sectionName not in sections:
+                    setattr(stepSection, sectionName, getattr(fullStep, sectionName))
+
+        return
+
     def addOutputModule(self, moduleName):
         """
         _addOutputModule_
@@ -677,13 +733,13 @@ class Report:
         reportSection = getattr(self.data, step, None)
         return reportSection
 
-    def load(self, filename):
+    def load(self, filename, sections = None):
         """
         _load_
 
         This just maps to unpersist
         """
-        self.unpersist(filename)
+        self.unpersist(filename, sections = sections)
         return
 
     def save(self, filename):
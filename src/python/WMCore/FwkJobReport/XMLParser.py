@@ -15,7 +15,7 @@ import xml.parsers.expat
 
 from WMCore.FwkJobReport import Report
 from WMCore.DataStructs.Run import Run
-from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode, coroutine
+from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode, coroutine, expat_parse
 
 def reportBuilder(nodeStruct, report, target):
     """
@@ -27,6 +27,18 @@ def reportBuilder(nodeStruct, report, target):
     for node in nodeStruct.children:
         target.send((report, node))
 
+def dispatchNode(report, node, targets):
+    """
+    _dispatchNode_
+
+    Hand a child node of the FrameworkJobReport element to its handler.
+    """
+    if node.name in targets:
+        targets[node.name].send( (report, node) )
+    else:
+        setattr(report.report.parameters, node.name, node.text)
+    return
+
 @coroutine
 def reportDispatcher(targets):
     """
@@ -43,24 +55,85 @@ def reportDispatcher(targets):
             continue
 
         for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send( (report, subnode) )
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send( (report, subnode) )
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send( (report, subnode) )
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send( (report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send( (report, subnode) )
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send( (report, subnode) )
-            elif subnode.name == "FallbackAttempt":
-                targets['FallbackAttempt'].send( (report, subnode) )
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send( (report, subnode) )
+            dispatchNode(report, subnode, targets)
+
+@coroutine
+def streamDispatcher(report, targets):
+    """
+    _streamDispatcher_
+
+    Single pass alternative to building the full node tree and feeding it to
+    the reportDispatcher.  It is fed the expat events directly and only
+    builds the node tree of one child of the FrameworkJobReport element at a
+    time, which is dispatched as soon as its end tag has been seen.
+
+    The Run and LumiSection elements of the Runs section of output and input
+    files are not turned into nodes at all, the Run objects are built on the
+    fly and attached to the Runs node for the runHandler.
+    """
+    path = []
+    nodeStack = []
+    charCache = []
+    runsNode = None
+    currentRun = None
+    handling = False
+    while True:
+        event, value = (yield)
+        if event == "text":
+            charCache.append(value)
+            continue
+
+        if event == "start":
+            charCache = []
+            name, attrs = value
+            path.append(name)
+            depth = len(path)
+
+            if depth == 1:
+                handling = (name == "FrameworkJobReport")
+                if not handling:
+                    print "Not Handling: ", name
+            elif not handling:
+                continue
+            elif runsNode != None:
+                if name == "Run":
+                    currentRun = None
+                    if "ID" in attrs:
+                        currentRun = Run(runNumber = str(attrs["ID"]))
+                elif name == "LumiSection" and currentRun != None and "ID" in attrs:
+                    currentRun.lumis.append(int(attrs["ID"]))
             else:
-                setattr(report.report.parameters, subnode.name, subnode.text)
+                newNode = Node(name, attrs)
+                if depth > 2:
+                    nodeStack[-1].children.append(newNode)
+                nodeStack.append(newNode)
+                if name == "Runs" and depth == 3 and \
+                       nodeStack[0].name in ("File", "InputFile"):
+                    runsNode = newNode
+                    runsNode.runs = []
+            continue
+
+        # end
+        depth = len(path)
+        path.pop()
+        if depth == 1 or not handling:
+            charCache = []
+            continue
+
+        if runsNode != None and depth > 3:
+            if value == "Run" and depth == 4 and currentRun != None:
+                runsNode.runs.append(currentRun)
+                currentRun = None
+            charCache = []
+            continue
+
+        node = nodeStack.pop()
+        node.text = str(''.join(charCache)).strip()
+        charCache = []
+        if node is runsNode:
+            runsNode = None
+        if depth == 2:
+            dispatchNode(report, node, targets)
 
 @coroutine
 def fileHandler(targets):
@@ -223,6 +296,13 @@ def runHandler():
     """
     while True:
         fileSection, node = (yield)
+        # The streamDispatcher already built the Run objects
+        runs = getattr(node, "runs", None)
+        if runs != None:
+            for runInfo in runs:
+                Report.addRunInfoToFile(fileSection, runInfo)
+            continue
+
         for subnode in node.children:
             if subnode.name == "Run":
                 runId = subnode.attrs.get("ID", None)
@@ -482,20 +562,13 @@ def perfStoreHandler():
 
 
 
-def xmlToJobReport(reportInstance, xmlFile):
+def buildDispatchers():
     """
-    _xmlToJobReport_
-
-    parse the XML file and insert the information into the
-    Report instance provided
+    _buildDispatchers_
 
+    Set up the coroutine pipeline that fills a report, returns the handlers
+    of the children of the FrameworkJobReport element keyed by name.
     """
-    # read XML, build node structure
-    node = xmlFileToNode(xmlFile)
-
-    #  //
-    # // Set up coroutine pipeline
-    #//
     fileDispatchers = {
         "Runs" : runHandler(),
         "Branches" : branchHandler(),
@@ -520,13 +593,45 @@ def xmlToJobReport(reportInstance, xmlFile):
         "SkippedEvent" : skippedEventHandler(),
         }
 
+    return dispatchers
+
+def xmlToJobReport(reportInstance, xmlFile):
+    """
+    _xmlToJobReport_
+
+    parse the XML file and insert the information into the
+    Report instance provided
+
+    The expat events are streamed straight into the handlers, the node
+    tree of the whole file is never built.
+    """
+    xmlHandle = open(xmlFile, 'r')
+    try:
+        expat_parse(xmlHandle,
+                    streamDispatcher(reportInstance, buildDispatchers()))
+    finally:
+        xmlHandle.close()
+
+    return
+
+def xmlTreeToJobReport(reportInstance, xmlFile):
+    """
+    _xmlTreeToJobReport_
+
+    Build the node tree of the XML file first and then feed it to the
+    handlers.  Slower than xmlToJobReport(), kept as a reference.
+    """
+    # read XML, build node structure
+    node = xmlFileToNode(xmlFile)
+
     #  //
     # // Feed pipeline with node structure and report result instance
     #//
     reportBuilder(
         node, reportInstance,
-        reportDispatcher(dispatchers)
+        reportDispatcher(buildDispatchers())
         )
 
     return
+
 childrenMatching = lambda node, nname: [x for x in node.children if x.name == nname]
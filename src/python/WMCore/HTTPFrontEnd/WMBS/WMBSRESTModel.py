@@ -11,6 +11,7 @@ from WMCore.WebTools.RESTModel import RESTModel
 from WMCore.DAOFactory import DAOFactory
 from WMCore.Services.Requests import JSONRequests
 from WMCore.HTTPFrontEnd.ContentTypeHandler import ContentTypeHandler
+from WMCore.Database import DAOProfiler
 
 class WMBSRESTModel(RESTModel):
     """
@@ -113,8 +114,23 @@ class WMBSRESTModel(RESTModel):
         self._addMethod('GET', 'jobinfobyid', self.jobInfoByID,
                        args = ['jobID'])
 
+        self._addMethod('GET', 'daoprofile', self.getDAOProfile,
+                       args = ['component'])
+
         return
 
+    def getDAOProfile(self, component = None):
+        """
+        _getDAOProfile_
+
+        Return the DAO statistics of the last polling cycle of every worker
+        of the components running with profileDAOs enabled.
+        """
+        workDir = getattr(self.config, "workDir", None)
+        if workDir == None:
+            return {}
+        return DAOProfiler.loadProfiles(workDir, component)
+
     def getJobSummary(self):
         from WMCore.HTTPFrontEnd.WMBS.External.CouchDBSource import JobInfo
         return JobInfo.getJobSummaryByWorkflow(self.config.couchConfig)
@@ -44,6 +44,7 @@ class JobFactory(WMObject):
         self.proxies       = []
         self.grabByProxy   = False
         self.daoFactory    = None
+        self.exhausted     = False
         self.timing = {'jobInstance': 0, 'sortByLocation': 0, 'acquireFiles': 0, 'jobGroup': 0}
 
         if package == 'WMCore.WMBS':
@@ -94,6 +95,41 @@ class JobFactory(WMObject):
         map(lambda x: x.finish(), self.generators)
         return self.jobGroups
 
+    def iterate(self, maxChunks = 0, **kwargs):
+        """
+        _iterate_
+
+        Generator version of __call__.  When the factory grabs files by proxy
+        (see open()) every pass splits at most `limit` files from the cursor,
+        commits the resulting job groups and yields them, so only one chunk of
+        files and jobs is held in memory at a time.
+
+        If maxChunks is set the iteration stops after that many passes, even
+        if the cursor still holds files.  Files that were put into jobs are
+        acquired by the subscription and the others stay available, so the
+        next open()/iterate() resumes where this one stopped.  The exhausted
+        attribute tells whether all the available files were processed.
+        """
+        self.exhausted = False
+        chunks = 0
+        while True:
+            jobGroups = self(**kwargs)
+            if jobGroups == []:
+                self.exhausted = True
+                break
+
+            yield jobGroups
+            chunks += 1
+
+            if not self.grabByProxy:
+                # Everything was loaded in one go
+                self.exhausted = True
+                break
+            if maxChunks and chunks >= maxChunks:
+                break
+
+        return
+
     def algorithm(self, *args, **kwargs):
         """
         _algorithm_
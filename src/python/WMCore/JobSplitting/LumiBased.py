@@ -10,12 +10,14 @@ a set of jobs based on lumi sections
 
 
 
+import bisect
 import operator
 import logging
 import threading
 import traceback
 
 from WMCore.DataStructs.Run import Run
+from WMCore.DataStructs.Mask import Mask
 
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.WMBS.File               import File
@@ -44,6 +46,36 @@ def isGoodLumi(goodRunList, run, lumi):
             return True
     return False
 
+def getGoodLumis(goodRunList, files):
+    """
+    _getGoodLumis_
+
+    Check all the lumis of the files against the goodRunList in one go,
+    using the merged range lookup of Mask.filterRunLumis, and return the set
+    of the (run, lumi) pairs that are good.  Returns None if there is no
+    goodRunList, then every lumi is good.
+    """
+    if goodRunList == None or goodRunList == {}:
+        return None
+
+    goodMask = Mask()
+    for run, lumiRanges in goodRunList.items():
+        validRanges = []
+        for lumiRange in lumiRanges:
+            if not len(lumiRange) == 2:
+                # Then we're very confused and should drop it
+                logging.error("Invalid run range!  Failing its lumis!")
+            else:
+                validRanges.append(lumiRange)
+        goodMask.addRunWithLumiRanges(run = int(run), lumiList = validRanges)
+
+    runLumis = []
+    for f in files:
+        for run in f['runs']:
+            runLumis.extend([(run.run, lumi) for lumi in run.lumis])
+
+    return set(goodMask.filterRunLumis(runLumis))
+
 def isGoodRun(goodRunList, run):
     """
     _isGoodRun_
@@ -68,10 +100,15 @@ class LumiChecker:
     """
 
     def __init__(self, applyLumiCorrection):
-        # This is a dictionary that contains (run, lumis) pairs as keys, and job ojects as values
+        # This is a dictionary that contains (run, lumis) pairs as keys
         # The run/lumi keys are added as soon as the lumi is processed by the splitting algorithm
-        # The job value is added when the newJob method is invoked
         self.lumiJobs = {}
+        # This dictionary contains runs as keys, and the (start, end, job) tuples of the ranges
+        # in the job masks as values. The ranges are added when the newJob method is invoked
+        self.jobLumiRanges = {}
+        # The same ranges sorted by their first lumi, as a pair of lists per run: the start
+        # lumis and the (start, end, job) tuples. Built once all the jobs are closed
+        self.sortedLumiRanges = None
         # This dictionary contains (run, lumis) pairs as keys, and a list of files as values
         # The logic is that as soon as a split lumi is seen we add its input file here
         self.splitLumiFiles = {}
@@ -81,9 +118,8 @@ class LumiChecker:
         """ Check if a lumi has already been processed, and return True if it is the case.
             Also saves the input file containing the lumi if this happens.
 
-            The method adds the (run, lumi) pair key to lumiJobs, and it sets its value to None.
-            This value will be set from None to the job object as soon as the splitting algorithm
-            switch to a new job.
+            The method adds the (run, lumi) pair key to lumiJobs, the job processing the lumi is
+            known as soon as the splitting algorithm switch to a new job (see closeJob).
             If a split lumi is encountered we add its input file to the self.splitLumiFiles dict
         """
         if not self.applyLumiCorrection: # if we don't have to apply the correction simply exit
@@ -103,19 +139,34 @@ class LumiChecker:
         return isSplit
 
     def closeJob(self, job):
-        """ Go through the list of lumis of the job and add an entry to "lumiJobs"
+        """ Go through the lumi ranges of the job and add them to "jobLumiRanges"
 
-            For each (run,lumi) pair in the job I create an entry in the dictionary so we know if the lumi
-            has already been added to another job, and we know to which job (so later we can add files to this
-            job if duplicated lumis are found)
+            The ranges are collected without expanding them into single lumis, they are sorted
+            once by getJob so we know to which job a (run,lumi) pair was added (so later we can
+            add files to this job if duplicated lumis are found).
         """
         if not self.applyLumiCorrection:
             return
         if job: # the first time you call "newJob" in the splitting algorithm currentJob is None
             for run, lumiIntervals in job['mask']['runAndLumis'].iteritems():
+                ranges = self.jobLumiRanges.setdefault(run, [])
                 for startLumi, endLumi in lumiIntervals:
-                    for lumi in xrange(startLumi, endLumi + 1):
-                        self.lumiJobs[(run, lumi)] = job
+                    ranges.append((startLumi, endLumi, job))
+            self.sortedLumiRanges = None
+
+    def getJob(self, run, lumi):
+        """ Return the closed job whose mask contains the (run, lumi) pair, or None
+        """
+        if self.sortedLumiRanges == None:
+            self.sortedLumiRanges = {}
+            for jobRun, ranges in self.jobLumiRanges.iteritems():
+                ranges = sorted(ranges, key = operator.itemgetter(0))
+                self.sortedLumiRanges[jobRun] = ([x[0] for x in ranges], ranges)
+        starts, ranges = self.sortedLumiRanges.get(run, ([], []))
+        index = bisect.bisect_right(starts, lumi) - 1
+        if index >= 0 and ranges[index][1] >= lumi:
+            return ranges[index][2]
+        return None
 
     def fixInputFiles(self):
         """ Called at the end. Iterates over the split lumis, and add their input files to the first job where the lumi
@@ -125,8 +176,9 @@ class LumiChecker:
         if not self.applyLumiCorrection:
             return
         for (run, lumi), files in self.splitLumiFiles.iteritems():
+            job = self.getJob(run, lumi)
             for file_ in files:
-                self.lumiJobs[(run, lumi)].addFile(file_)
+                job.addFile(file_)
 
 
 
@@ -254,6 +306,7 @@ class LumiBased(JobFactory):
         lumisInJob = 0
         lumisInTask = 0
         self.lumiChecker = LumiChecker(applyLumiCorrection)
+        goodLumis = getGoodLumis(goodRunList, [f for files in locationDict.values() for f in files])
         for location in locationDict.keys():
 
             # For each location, we need a new jobGroup
@@ -285,7 +338,7 @@ class LumiBased(JobFactory):
 
                     # Now loop over the lumis
                     for lumi in run:
-                        if (not isGoodLumi(goodRunList, run = run.run, lumi = lumi)
+                        if ((goodLumis != None and (run.run, lumi) not in goodLumis)
                                 or self.lumiChecker.isSplitLumi(run.run, lumi, f)): # splitLumi checks if the lumi is split across jobs
                             # Kill the chain of good lumis
                             # Skip this lumi
@@ -87,8 +87,12 @@ class ChangeState(WMObject, WMConnectionBase):
         self.workflowTaskDAO = self.daofactory("Jobs.GetWorkflowTask")
         self.jobTypeDAO = self.daofactory("Jobs.GetType")
         self.updateLocationDAO = self.daofactory("Jobs.UpdateLocation")
+        self.changeStateDAO = self.daofactory("Jobs.ChangeState")
 
         self.maxUploadedInputFiles = getattr(self.config.JobStateMachine, 'maxFWJRInputFiles', 1000)
+        # Number of documents fetched and written back per _bulk_docs request
+        # when recording state transitions of jobs already in couch
+        self.couchBulkSize = getattr(self.config.JobStateMachine, 'couchBulkSize', 250)
         return
 
     def _connectDatabases(self):
@@ -170,6 +174,45 @@ class ChangeState(WMObject, WMConnectionBase):
 
         return
 
+    def propagateMany(self, transitions, updatesummary = False):
+        """
+        _propagateMany_
+
+        Bulk version of propagate().  Takes a list of (job, newstate, oldstate)
+        tuples, groups the jobs by transition and updates WMBS for all of
+        them with a single multi-row update.  The couch and dashboard
+        bookkeeping is then done in bulk for every transition.
+        """
+        groupedJobs = {}
+        allJobs = []
+        for job, newstate, oldstate in transitions:
+            groupedJobs.setdefault((newstate, oldstate), []).append(job)
+            allJobs.append(job)
+
+        if len(allJobs) == 0:
+            return
+
+        for newstate, oldstate in groupedJobs.keys():
+            self.check(newstate, oldstate)
+
+        self.loadExtraJobInformation(allJobs)
+        self.persistMany(groupedJobs)
+
+        for (newstate, oldstate), jobs in groupedJobs.items():
+            try:
+                self.recordInCouch(jobs, newstate, oldstate, updatesummary)
+            except Exception as ex:
+                logging.error("Error updating job in couch: %s" % str(ex))
+                logging.error(traceback.format_exc())
+
+            try:
+                self.reportToDashboard(jobs, newstate, oldstate)
+            except Exception as ex:
+                logging.error("Error reporting to the dashboard: %s" % str(ex))
+                logging.error(traceback.format_exc())
+
+        return
+
     def check(self, newstate, oldstate):
         """
         check that the transition is allowed. return a tuple of the transition
@@ -197,13 +240,33 @@ class ChangeState(WMObject, WMConnectionBase):
 
         timestamp = int(time.time())
         couchRecordsToUpdate = []
+        jobTransitions = {}
+
+        if newstate == "new":
+            oldstate = "none"
+
+        # updating the status of the summary doc only when it is explicitely requested
+        # doc is already in couch
+        if updatesummary:
+            # map retrydone state to jobfailed state for monitoring
+            if newstate == "retrydone":
+                monitorState = "jobfailed"
+            else:
+                monitorState = newstate
+            summaryTransitions = {}
+            for job in jobs:
+                summaryTransitions[job["name"]] = {"oldstate": oldstate,
+                                                   "newstate": monitorState,
+                                                   "location": job["location"],
+                                                   "timestamp": timestamp}
+            self.bulkStateTransition(self.jsumdatabase, summaryTransitions,
+                                     "WMStatsAgent", "jobStateTransition",
+                                     self._addSummaryTransition)
+            logging.debug("Updated job summary states for %i jobs" % len(summaryTransitions))
 
         for job in jobs:
             couchDocID = job.get("couch_record", None)
 
-            if newstate == "new":
-                oldstate = "none"
-
             if job.get("site_cms_name", None):
                 if newstate == "executing":
                     jobLocation = job["site_cms_name"]
@@ -261,40 +324,12 @@ class ChangeState(WMObject, WMConnectionBase):
                                              "couchid": jobDocument["_id"]})
                 self.jobsdatabase.queue(jobDocument, callback = discardConflictingDocument)
             else:
-                # We send a PUT request to the stateTransition update handler.
-                # Couch expects the parameters to be passed as arguments to in
-                # the URI while the Requests class will only encode arguments
-                # this way for GET requests.  Changing the Requests class to
-                # encode PUT arguments as couch expects broke a bunch of code so
-                # we'll just do our own encoding here.
-                updateUri = "/" + self.jobsdatabase.name + "/_design/JobDump/_update/stateTransition/" + couchDocID
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    newstate,
-                                                                                    jobLocation,
-                                                                                    timestamp)
-                self.jobsdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-
-            # updating the status of the summary doc only when it is explicitely requested
-            # doc is already in couch
-            if updatesummary:
-                jobSummaryId = job["name"]
-                updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobSummaryState/" + jobSummaryId
-                # map retrydone state to jobfailed state for monitoring
-                if newstate == "retrydone":
-                    monitorState = "jobfailed"
-                else:
-                    monitorState = newstate
-                updateUri += "?newstate=%s&timestamp=%s" % (monitorState, timestamp)
-                self.jsumdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-                logging.debug("Updated job summary status for job %s" % jobSummaryId)
-                
-                updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobStateTransition/" + jobSummaryId
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    monitorState,
-                                                                                    job["location"],
-                                                                                    timestamp)
-                self.jsumdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-                logging.debug("Updated job summary state history for job %s" % jobSummaryId)
+                # Documents already in couch get the transition appended in
+                # bulk once all the jobs have been looked at.
+                jobTransitions[couchDocID] = {"oldstate": oldstate,
+                                              "newstate": newstate,
+                                              "location": jobLocation,
+                                              "timestamp": timestamp}
 
             if job.get("fwjr", None):
 
@@ -406,32 +441,123 @@ class ChangeState(WMObject, WMConnectionBase):
                                      transaction = self.existingTransaction())
 
         self.jobsdatabase.commit(callback = discardConflictingDocument)
+        self.bulkStateTransition(self.jobsdatabase, jobTransitions,
+                                 "JobDump", "stateTransition",
+                                 self._addJobTransition)
         self.fwjrdatabase.commit(callback = discardConflictingDocument)
         self.jsumdatabase.commit()
         return
 
+    def _addJobTransition(self, doc, transition):
+        """
+        _addJobTransition_
+
+        Python version of the JobDump stateTransition update handler.
+        """
+        states = doc.setdefault("states", {})
+        maxKey = max([0] + [int(key) for key in states.keys()])
+        states[str(maxKey + 1)] = transition
+        return doc
+
+    def _addSummaryTransition(self, doc, transition):
+        """
+        _addSummaryTransition_
+
+        Python version of the WMStatsAgent jobSummaryState and
+        jobStateTransition update handlers.
+        """
+        doc["state"] = transition["newstate"]
+        doc["timestamp"] = transition["timestamp"]
+        doc.setdefault("state_history", []).append(transition)
+        return doc
+
+    def bulkStateTransition(self, database, transitions, design, updateHandler,
+                            addTransition):
+        """
+        _bulkStateTransition_
+
+        Append state transitions to documents already in couch.  transitions
+        is keyed by document id.  The documents are loaded and written back
+        with _bulk_docs in batches of couchBulkSize, documents that conflict
+        or can't be found fall back to the update handler in the couchapp.
+        """
+        docIDs = transitions.keys()
+        for start in range(0, len(docIDs), self.couchBulkSize):
+            batchIDs = docIDs[start:start + self.couchBulkSize]
+            retryIDs = []
+
+            result = database.allDocs(options = {"include_docs": True},
+                                      keys = batchIDs)
+            updatedDocs = []
+            for row in result.get("rows", []):
+                if row.get("doc", None) == None:
+                    retryIDs.append(row["key"])
+                    continue
+                updatedDocs.append(addTransition(row["doc"], transitions[row["key"]]))
+
+            if len(updatedDocs) > 0:
+                commitResult = database.post("/%s/_bulk_docs/" % database.name,
+                                             {"docs": updatedDocs})
+                for row in commitResult:
+                    if row.get("error", None):
+                        retryIDs.append(row["id"])
+
+            for docID in retryIDs:
+                transition = transitions[docID]
+                updateUri = "/%s/_design/%s/_update/%s/%s" % (database.name, design,
+                                                              updateHandler, docID)
+                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (transition["oldstate"],
+                                                                                    transition["newstate"],
+                                                                                    transition["location"],
+                                                                                    transition["timestamp"])
+                database.makeRequest(uri = updateUri, type = "PUT", decode = False)
+                if updateHandler == "jobStateTransition":
+                    # The summary state lives in a separate handler
+                    updateUri = "/%s/_design/%s/_update/jobSummaryState/%s" % (database.name, design, docID)
+                    updateUri += "?newstate=%s&timestamp=%s" % (transition["newstate"],
+                                                                transition["timestamp"])
+                    database.makeRequest(uri = updateUri, type = "PUT", decode = False)
+
+        return
+
     def persist(self, jobs, newstate, oldstate):
         """
         _persist_
 
         Update the job state in the database.
         """
-        
-        if newstate == "killed":
-            self.incrementRetryDAO.execute(jobs, increment = 99999,
-                                           conn = self.getDBConn(),
-                                           transaction = self.existingTransaction())
-        elif oldstate == "submitcooloff" or oldstate == "jobcooloff" or oldstate == "createcooloff" :
-            self.incrementRetryDAO.execute(jobs,
-                                           conn = self.getDBConn(),
-                                           transaction = self.existingTransaction())
-        for job in jobs:
-            job['state'] = newstate
-            job['oldstate'] = oldstate
+        self.persistMany({(newstate, oldstate): jobs})
+        return
 
-        dao = self.daofactory(classname = "Jobs.ChangeState")
-        dao.execute(jobs, conn = self.getDBConn(),
-                    transaction = self.existingTransaction())
+    def persistMany(self, transitions):
+        """
+        _persistMany_
+
+        Update the job state in the database for several transitions at once,
+        transitions is a dictionary of job lists keyed by (newstate, oldstate).
+        All the state changes are done in a single multi-row update.
+        """
+        allJobs = []
+        for (newstate, oldstate), jobs in transitions.items():
+            if newstate == "killed":
+                self.incrementRetryDAO.execute(jobs, increment = 99999,
+                                               conn = self.getDBConn(),
+                                               transaction = self.existingTransaction())
+            elif oldstate == "submitcooloff" or oldstate == "jobcooloff" or oldstate == "createcooloff" :
+                self.incrementRetryDAO.execute(jobs,
+                                               conn = self.getDBConn(),
+                                               transaction = self.existingTransaction())
+            for job in jobs:
+                job['state'] = newstate
+                job['oldstate'] = oldstate
+            allJobs.extend(jobs)
+
+        if len(allJobs) == 0:
+            return
+
+        self.changeStateDAO.execute(allJobs, conn = self.getDBConn(),
+                                    transaction = self.existingTransaction())
+        return
 
     def reportToDashboard(self, jobs, newstate, oldstate):
         """
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+_WorkerPool_
+
+Pool of worker processes applying a function to pieces of work in the
+background, for components that overlap CPU bound work with their database
+work.  Unlike the ProcessPool the workers are forked from the component and
+need neither a configuration nor a database connection.
+
+Work is submitted under a key and its result collected by key.  Work that
+does not come back in time is abandoned: the workers are killed and
+restarted, so none of them can still be working on it when the caller does
+it itself.
+"""
+
+import time
+import Queue
+import logging
+import multiprocessing
+
+def poolWorker(function, input, results):
+    """
+    _poolWorker_
+
+    Worker process loop.  Gets (key, work) tuples from the input queue and
+    puts a (key, result, error) tuple per piece of work in the results queue.
+    """
+    while True:
+        try:
+            work = input.get()
+        except (EOFError, IOError):
+            logging.error("Hit EOF/IO in getting new work, exiting pool worker")
+            break
+
+        if work == 'STOP':
+            break
+
+        key, args = work
+        try:
+            results.put((key, function(args), None))
+        except Exception as ex:
+            results.put((key, None, str(ex)))
+
+    return
+
+class WorkerPool:
+    """
+    _WorkerPool_
+
+    Pool of nProc processes calling function on the submitted work.
+    """
+    def __init__(self, function, nProc, timeout = 300):
+        self.function = function
+        self.nProc    = nProc
+        self.timeout  = timeout
+        self.pool     = []
+        self.pending  = set()
+        self.done     = {}
+
+        self.start()
+        return
+
+    def start(self):
+        """
+        _start_
+
+        Start the worker processes, with new queues.
+        """
+        self.input   = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        for _ in range(self.nProc):
+            process = multiprocessing.Process(target = poolWorker,
+                                              args = (self.function, self.input,
+                                                      self.results))
+            process.start()
+            self.pool.append(process)
+        return
+
+    def restart(self):
+        """
+        _restart_
+
+        Kill the worker processes and start new ones.  All the pending work is
+        abandoned.
+        """
+        for process in self.pool:
+            process.terminate()
+        for process in self.pool:
+            process.join()
+
+        self.pool    = []
+        self.pending = set()
+        self.start()
+        return
+
+    def submit(self, key, work):
+        """
+        _submit_
+
+        Queue a piece of work under the given key.
+        """
+        self.pending.add(key)
+        self.input.put((key, work))
+        return
+
+    def isPending(self, key):
+        """
+        _isPending_
+
+        Whether the work of key is queued or being done by the workers.
+        """
+        return key in self.pending
+
+    def collect(self, keys = None):
+        """
+        _collect_
+
+        Wait for the work of the given keys, all the pending work by default,
+        for at most timeout seconds in all.  Returns the (result, error)
+        tuples of the work that came back by key.  If the wait times out the
+        workers are restarted, the work that did not come back is abandoned
+        and has to be done by the caller.
+        """
+        if keys == None:
+            keys = list(self.pending) + self.done.keys()
+
+        waitingFor = set([key for key in keys if key in self.pending])
+        deadline = time.time() + self.timeout
+        while waitingFor:
+            try:
+                key, result, error = self.results.get(timeout = max(deadline - time.time(), 0))
+            except Queue.Empty:
+                logging.error("Timed out waiting for %i results from the worker processes, restarting them" % len(waitingFor))
+                self.restart()
+                break
+
+            self.pending.discard(key)
+            self.done[key] = (result, error)
+            waitingFor.discard(key)
+
+        results = {}
+        for key in keys:
+            if key in self.done:
+                results[key] = self.done.pop(key)
+        return results
+
+    def close(self):
+        """
+        _close_
+
+        Stop the worker processes.
+        """
+        for process in self.pool:
+            try:
+                self.input.put('STOP')
+            except Exception as ex:
+                logging.debug("Error stopping pool worker: %s" % str(ex))
+
+        for process in self.pool:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+        self.pool    = []
+        self.pending = set()
+        self.done    = {}
+        return
@@ -3,8 +3,17 @@
 _ResourceControl_
 
 Library from manipulating and querying the resource control database.
+
+The thresholds can be served from snapshots shared by all the ResourceControl
+objects of the process.  A snapshot is reloaded from the database when it's
+older than the age the caller accepts, in between the job counts are kept up
+to date with changeJobCounts().
 """
 
+import copy
+import time
+import threading
+
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMConnectionBase import WMConnectionBase
 from WMCore.WMException import WMException
@@ -19,6 +28,23 @@ class ResourceControlException(WMException):
     pass
 
 
+# Threshold snapshots by DAO name, shared by the whole process
+_thresholdSnapshots = {}
+_snapshotLock = threading.Lock()
+
+def clearThresholdSnapshots():
+    """
+    _clearThresholdSnapshots_
+
+    Drop the threshold snapshots, the next listing queries the database.
+    """
+    _snapshotLock.acquire()
+    try:
+        _thresholdSnapshots.clear()
+    finally:
+        _snapshotLock.release()
+    return
+
 class ResourceControl(WMConnectionBase):
     def __init__(self, config = None):
         WMConnectionBase.__init__(self, daoPackage = "WMCore.ResourceControl")
@@ -44,6 +70,7 @@ class ResourceControl(WMConnectionBase):
                              plugin = plugin, cmsName = cmsName,
                              conn = self.getDBConn(),
                              transaction = self.existingTransaction())
+        clearThresholdSnapshots()
         return
 
     def changeSiteState(self, siteName, state):
@@ -56,6 +83,7 @@ class ResourceControl(WMConnectionBase):
         setStateAction.execute(siteName = siteName, state = state,
                                conn = self.getDBConn(),
                                transaction = self.existingTransaction())
+        clearThresholdSnapshots()
 
         executingJobs = self.wmbsDAOFactory(classname = "Jobs.ListByState")
         jobInfo = executingJobs.execute(state = 'executing')
@@ -118,6 +146,7 @@ class ResourceControl(WMConnectionBase):
                               conn = self.getDBConn(),
                               transaction = existingTransaction)
         self.commitTransaction(existingTransaction)
+        clearThresholdSnapshots()
         return
 
     def insertThreshold(self, siteName, taskType, maxSlots, pendingSlots):
@@ -155,9 +184,66 @@ class ResourceControl(WMConnectionBase):
                                      transaction = self.existingTransaction())
 
         self.commitTransaction(existingTransaction)
+        clearThresholdSnapshots()
+        return
+
+    def _listThresholds(self, daoName, maxAge):
+        """
+        _listThresholds_
+
+        Run one of the threshold listing DAOs, or return a copy of its snapshot
+        if it is younger than maxAge seconds.
+        """
+        if maxAge > 0:
+            _snapshotLock.acquire()
+            try:
+                snapshot = _thresholdSnapshots.get(daoName, None)
+                if snapshot != None and time.time() - snapshot["time"] < maxAge:
+                    return copy.deepcopy(snapshot["thresholds"])
+            finally:
+                _snapshotLock.release()
+
+        loadTime = time.time()
+        listAction = self.daofactory(classname = daoName)
+        thresholds = listAction.execute(conn = self.getDBConn(),
+                                        transaction = self.existingTransaction())
+
+        if maxAge > 0:
+            _snapshotLock.acquire()
+            try:
+                _thresholdSnapshots[daoName] = {"time": loadTime,
+                                                "thresholds": copy.deepcopy(thresholds)}
+            finally:
+                _snapshotLock.release()
+        return thresholds
+
+    def changeJobCounts(self, siteName, taskType, pendingJobs = 0, runningJobs = 0):
+        """
+        _changeJobCounts_
+
+        Apply a change of the number of pending and running jobs of a task type
+        at a site to the submit threshold snapshot, so it stays close to the
+        database until it is reloaded.  Components call this for the job
+        transitions they make themselves.
+        """
+        _snapshotLock.acquire()
+        try:
+            snapshot = _thresholdSnapshots.get("ListThresholdsForSubmit", None)
+            if snapshot == None or siteName not in snapshot["thresholds"]:
+                return
+            siteInfo = snapshot["thresholds"][siteName]
+            siteInfo["total_pending_jobs"] += pendingJobs
+            siteInfo["total_running_jobs"] += runningJobs
+            for threshold in siteInfo["thresholds"]:
+                if threshold["task_type"] == taskType:
+                    threshold["task_pending_jobs"] += pendingJobs
+                    threshold["task_running_jobs"] += runningJobs
+                    break
+        finally:
+            _snapshotLock.release()
         return
 
-    def listThresholdsForSubmit(self):
+    def listThresholdsForSubmit(self, maxAge = 0):
         """
         _listThresholdsForSubmit_
 
@@ -180,12 +266,11 @@ class ResourceControl(WMConnectionBase):
           task_running_jobs   - Running jobs for the task type
           task_pending_jobs   - Pending jobs for the task type
           priority            - Priority assigned to the task type
+        With maxAge > 0 a snapshot up to maxAge seconds old may be returned.
         """
-        listAction = self.daofactory(classname = "ListThresholdsForSubmit")
-        return listAction.execute(conn = self.getDBConn(),
-                                  transaction = self.existingTransaction())
+        return self._listThresholds("ListThresholdsForSubmit", maxAge)
 
-    def listThresholdsForCreate(self):
+    def listThresholdsForCreate(self, maxAge = 0):
         """
         _listThresholdsForCreate_
 
@@ -193,10 +278,9 @@ class ResourceControl(WMConnectionBase):
         keyed by site name.  The second level will have the following keys:
           total_slots - Total number of pending slots available at the site
           pending_jobs - Total number of jobs pending at the site per priority level, it is a dictionary
+        With maxAge > 0 a snapshot up to maxAge seconds old may be returned.
         """
-        listAction = self.daofactory(classname = "ListThresholdsForCreate")
-        return listAction.execute(conn = self.getDBConn(),
-                                  transaction = self.existingTransaction())
+        return self._listThresholds("ListThresholdsForCreate", maxAge)
 
     def listWorkloadsForTaskSite(self, taskType, siteName):
         """
@@ -229,6 +313,8 @@ class ResourceControl(WMConnectionBase):
                                        conn = self.getDBConn(),
                                        transaction = self.existingTransaction())
 
+        clearThresholdSnapshots()
+
     def thresholdBySite(self, siteName):
         """
         _thresholdBySite_
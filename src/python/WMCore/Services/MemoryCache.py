@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+_MemoryCache_
+
+In process cache of service responses, used by Service in front of its file
+cache.  The cache is bounded both in number of entries and in bytes, the
+least recently used entries are evicted first.  Entries are fresh for a
+given time to live, and can then be served stale for a while, as long as
+someone refreshes them.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+class MemoryCache(object):
+    """
+    _MemoryCache_
+
+    Size bounded LRU cache of response bodies with hit and miss counters.
+    """
+    def __init__(self, maxEntries = 100, maxBytes = 64 * 1024 * 1024):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.staleHits = 0
+        self.misses = 0
+        self.evictions = 0
+        return
+
+    def get(self, key, ttl, staleTime = 0):
+        """
+        _get_
+
+        Return the data cached for key and whether it is fresh (younger than
+        ttl seconds) or stale (younger than ttl + staleTime seconds), or
+        (None, None) if there is no usable entry.
+        """
+        self.lock.acquire()
+        try:
+            entry = self.entries.pop(key, None)
+            if entry == None:
+                self.misses += 1
+                return None, None
+
+            data, storeTime = entry
+            age = time.time() - storeTime
+            if age > ttl + staleTime:
+                self.bytes -= len(data)
+                self.misses += 1
+                return None, None
+
+            # Move to the most recently used end
+            self.entries[key] = entry
+            if age > ttl:
+                self.staleHits += 1
+                return data, "stale"
+            self.hits += 1
+            return data, "fresh"
+        finally:
+            self.lock.release()
+
+    def put(self, key, data):
+        """
+        _put_
+
+        Cache data for key, evicting the least recently used entries to stay
+        in bounds.  Data bigger than the whole cache is not cached.
+        """
+        self.lock.acquire()
+        try:
+            old = self.entries.pop(key, None)
+            if old != None:
+                self.bytes -= len(old[0])
+            if len(data) > self.maxBytes:
+                return
+
+            self.entries[key] = (data, time.time())
+            self.bytes += len(data)
+            while len(self.entries) > self.maxEntries or self.bytes > self.maxBytes:
+                _, (evicted, _) = self.entries.popitem(last = False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+        finally:
+            self.lock.release()
+        return
+
+    def remove(self, key):
+        """
+        _remove_
+
+        Drop the entry for key, if any.
+        """
+        self.lock.acquire()
+        try:
+            entry = self.entries.pop(key, None)
+            if entry != None:
+                self.bytes -= len(entry[0])
+        finally:
+            self.lock.release()
+        return
+
+    def clear(self):
+        """
+        _clear_
+
+        Drop all the entries, the counters are kept.
+        """
+        self.lock.acquire()
+        try:
+            self.entries = OrderedDict()
+            self.bytes = 0
+        finally:
+            self.lock.release()
+        return
+
+    def stats(self):
+        """
+        _stats_
+
+        Return the counters and the size of the cache.
+        """
+        return {"hits": self.hits, "stale_hits": self.staleHits,
+                "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.entries), "bytes": self.bytes}
@@ -3,6 +3,7 @@ import logging
 from WMCore.Services.Service import Service
 from WMCore.Wrappers import JsonWrapper
 from WMCore.Services.EmulatorSwitch import emulatorHook
+from WMCore.Lexicon import slicedIterator
 
 # emulator hook is used to swap the class instance
 # when emulator values are set.
@@ -31,8 +32,13 @@ class PhEDEx(Service):
             dict['endpoint'] = "https://cmsweb.cern.ch/phedex/datasvc/%s/prod/" % self.responseType
 
         dict.setdefault('cacheduration', 0)
+        # Only the node list is kept in memory, see memoryCacheTTL
+        dict.setdefault('memcachesize', 10)
         Service.__init__(self, dict)
 
+        # Number of blocks per request when looking up many blocks
+        self.blockSliceSize = 100
+
     def _getResult(self, callname, clearCache = False,
                    args = None, verb = "POST"):
         """
@@ -58,6 +64,36 @@ class PhEDEx(Service):
 
         return result
 
+    def memoryCacheTTL(self, url, verb):
+        """
+        _memoryCacheTTL_
+
+        The node list is used to map every node and SE name and rarely
+        changes, keep it in memory for half an hour.  Data location must
+        always be fresh.
+        """
+        if url == 'nodes':
+            return 0.5
+        return 0
+
+    def _getResults(self, callname, argsList, verb = "POST"):
+        """
+        _getResults_
+
+        Like _getResult for each of the argument dictionaries in argsList,
+        the calls are made concurrently.
+        """
+        results = []
+        file = callname.replace("/", "_")
+        for f in self.refreshCacheMulti(file, callname, argsList, verb = verb):
+            result = f.read()
+            f.close()
+            if self.responseType == "json":
+                result = JsonWrapper.loads(result)
+            results.append(result)
+
+        return results
+
     def injectBlocks(self, node, xmlData, strict = 1):
 
         """
@@ -169,6 +205,15 @@ class PhEDEx(Service):
         callname = 'blockreplicas'
         return self._getResult(callname, args = kwargs)
 
+    def getReplicaInfoForBlocksMulti(self, argsList):
+        """
+        _getReplicaInfoForBlocksMulti_
+
+        Call getReplicaInfoForBlocks with each of the kwargs dictionaries in
+        argsList, concurrently.  Returns the results in the same order.
+        """
+        return self._getResults('blockreplicas', argsList)
+
     def getReplicaInfoForFiles(self, **args):
         """
         _getReplicaInfoForFiles_
@@ -503,12 +548,24 @@ class PhEDEx(Service):
         """
 
         callname = 'blockreplicas'
-        response = self._getResult(callname, args = kwargs)
-        
+        blocks = kwargs.get('block', [])
+        if not isinstance(blocks, basestring) and len(blocks) > self.blockSliceSize:
+            # Query big lists of blocks in slices, concurrently
+            argsList = []
+            for blockSlice in slicedIterator(list(blocks), self.blockSliceSize):
+                args = dict(kwargs)
+                args['block'] = blockSlice
+                argsList.append(args)
+            blocksInfo = []
+            for response in self._getResults(callname, argsList):
+                blocksInfo.extend(response['phedex']['block'])
+        else:
+            response = self._getResult(callname, args = kwargs)
+            blocksInfo = response['phedex']['block']
+
         blockSE = dict()
         blockNodes = dict()
 
-        blocksInfo = response['phedex']['block']
         if not blocksInfo:
             return {}
         
@@ -281,6 +281,79 @@ class Requests(dict):
         #TODO: maybe just return result and response...
         return result, response.status, response.reason, response.fromcache
 
+    def multiRequest(self, requests, verb='GET', incoming_headers={},
+                     encoder=True, decoder=True, contentType=None,
+                     maxConnections=10, retries=2, raiseErrors=True):
+        """
+        Make many requests concurrently through pycurl, whatever the
+        pycurl setting of this object. requests is a list of (uri, data)
+        tuples, relative to the host like in makeRequest.
+
+        At most maxConnections requests are in flight, connections to the
+        host are kept alive and reused, requests failing with a connection
+        error, a timeout or a 5xx status are retried retries times.
+
+        Returns the results in the order of the requests, each one like the
+        return value of makeRequest. If any request fails the first error is
+        raised once all of them are done, unless raiseErrors is False, then
+        the failed requests get their exception as result.
+        """
+        if  not requests:
+            return []
+
+        ckey, cert = None, None
+        if self['endpoint_components'].scheme == 'https':
+            # only add certs to https requests, not all of them need one
+            try:
+                ckey, cert = self.getKeyCert()
+            except Exception as ex:
+                msg = 'No certificate or key found, authentication may fail'
+                self['logger'].info(msg)
+                self['logger'].debug(str(ex))
+        capath = self.getCAPath()
+        if  not contentType:
+            contentType = self['content_type']
+        headers = {"Content-type": contentType,
+               "User-agent": "WMCore.Services.Requests/v001",
+               "Accept": self['accept_type']}
+        headers.update(self.additionalHeaders)
+        headers.update(incoming_headers)
+
+        curlRequests = []
+        for uri, data in requests:
+            if  verb != 'GET' and data:
+                if  callable(encoder):
+                    data = encoder(data)
+                elif encoder != False:
+                    data = self.encode(data)
+            curlRequests.append({'url': self['host'] + uri, 'params': data or {},
+                                 'headers': headers, 'verb': verb})
+
+        handler = getattr(self, 'reqmgr', None)
+        if  handler == None:
+            handler = RequestHandler({'timeout': self['timeout']}, self['logger'])
+        results = handler.concurrent_requests(curlRequests, ckey=ckey, cert=cert,
+                                              capath=capath, maxconn=maxConnections,
+                                              retries=retries)
+
+        if  raiseErrors:
+            for result in results:
+                if  isinstance(result, Exception):
+                    raise result
+
+        decoded = []
+        for result in results:
+            if  isinstance(result, Exception):
+                decoded.append(result)
+                continue
+            response, data = result
+            if  callable(decoder):
+                data = decoder(data)
+            elif decoder != False:
+                data = self.decode(data)
+            decoded.append((data, response.status, response.reason, response.fromcache))
+        return decoded
+
     def encode(self, data):
         """
         encode data into some appropriate format, for now make it a string...
@@ -79,6 +79,7 @@ import os
 import time
 import types
 import logging
+import threading
 try:
     from cStringIO import cStringIO as StringIO
 except ImportError:
@@ -91,6 +92,7 @@ from httplib2 import HttpLib2Error
 from urlparse import urlparse
 
 from WMCore.Services.Requests import Requests, JSONRequests
+from WMCore.Services.MemoryCache import MemoryCache
 from WMCore.WMException import WMException
 from WMCore.Wrappers import JsonWrapper as json
 
@@ -127,6 +129,15 @@ class Service(dict):
         #Set a timeout for the socket
         self.setdefault("timeout", 300)
 
+        # In memory cache in front of the cache files, disabled by default.
+        # memcachesize is the maximum number of responses kept in memory,
+        # memcachettl how long (hours) they are used without asking the
+        # service, memcachestale how long (hours) after that they are still
+        # returned while being refreshed in the background.
+        self.setdefault("memcachesize", 0)
+        self.setdefault("memcachettl", None)
+        self.setdefault("memcachestale", 0)
+
         # then update with the incoming dict
         self.update(cfg_dict)
 
@@ -164,6 +175,12 @@ class Service(dict):
             self['logger'] = logging.getLogger(self.__class__.__name__)
             self['requests']['logger'] = self['logger']
 
+        self.memoryCache = None
+        if self['memcachesize']:
+            self.memoryCache = MemoryCache(self['memcachesize'])
+        self.revalidating = set()
+        self.requestLock = threading.RLock()
+
         self['logger'].debug("""Service initialised (%s):
 \t host: %s, basepath: %s (%s)\n\t cache: %s (duration %s hours, max reuse %s hours)""" %
                   (self, self["requests"].getDomainName(), self["endpoint"],
@@ -208,15 +225,154 @@ class Service(dict):
         t = datetime.datetime.now() - datetime.timedelta(hours = self['cacheduration'])
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
 
+        memoryKey = None
+        if openfile and self.memoryCache != None and self.memoryCacheTTL(url, verb) > 0:
+            memoryKey = self.memoryCacheKey(url, verb, inputdata)
+            ttl = self.memoryCacheTTL(url, verb)
+            data, state = self.memoryCache.get(memoryKey, ttl * 3600,
+                                               self['memcachestale'] * 3600)
+            if state == "stale":
+                self._revalidate(memoryKey, cachefile, url, inputdata, incoming_headers,
+                                 encoder, decoder, verb, contentType)
+            if data != None:
+                return StringIO(data)
+
         if cache_expired(cachefile):
             self.getData(cachefile, url, inputdata, incoming_headers, encoder, decoder, verb, contentType)
 
+        if memoryKey != None:
+            return StringIO(self._cacheInMemory(memoryKey, cachefile))
+
         # cachefile may be filename or file object
         if openfile and not isfile(cachefile):
             return open(cachefile, 'r')
         else:
             return cachefile
 
+    def memoryCacheKey(self, url, verb, inputdata):
+        """
+        Key of a query in the memory cache.
+        """
+        if not inputdata:
+            inputdata = self['inputdata']
+        return (url, verb, self._makeHash(inputdata, 0))
+
+    def memoryCacheTTL(self, url, verb):
+        """
+        How long (hours) the response of a call stays fresh in the memory
+        cache, by default memcachettl or else cacheduration. Services can
+        override this to cache some of their calls only, calls with a time
+        to live of 0 don't go through the memory cache.
+        """
+        if self['memcachettl'] != None:
+            return self['memcachettl']
+        return self['cacheduration'] or 0
+
+    def memoryCacheStats(self):
+        """
+        Return the hit/miss counters of the memory cache, None if there is no
+        memory cache.
+        """
+        if self.memoryCache == None:
+            return None
+        return self.memoryCache.stats()
+
+    def _cacheInMemory(self, memoryKey, cachefile):
+        """
+        Put the content of the cachefile in the memory cache and return it.
+        """
+        if isfile(cachefile):
+            data = cachefile.getvalue()
+        else:
+            f = open(cachefile, 'r')
+            data = f.read()
+            f.close()
+        self.memoryCache.put(memoryKey, data)
+        return data
+
+    def _revalidate(self, memoryKey, cachefile, url, inputdata, incoming_headers,
+                    encoder, decoder, verb, contentType):
+        """
+        Refresh a stale memory cache entry in a background thread, the stale
+        entry is used in the meantime.
+        """
+        if memoryKey in self.revalidating:
+            return
+        self.revalidating.add(memoryKey)
+
+        def refresh():
+            try:
+                try:
+                    if isfile(cachefile):
+                        target = StringIO()
+                    else:
+                        target = cachefile
+                    self.getData(target, url, inputdata, dict(incoming_headers),
+                                 encoder, decoder, verb, contentType, force_refresh = True)
+                    self._cacheInMemory(memoryKey, target)
+                except Exception as ex:
+                    self['logger'].warning('Refreshing %s in the background failed: %s' % (url, str(ex)))
+            finally:
+                self.revalidating.discard(memoryKey)
+
+        thread = threading.Thread(target = refresh)
+        thread.setDaemon(True)
+        thread.start()
+        return
+
+    def refreshCacheMulti(self, cachefile, url='', inputdataList = [], openfile=True,
+                          encoder = True, decoder = True, verb = 'GET', contentType = None,
+                          incoming_headers={}, maxConnections = 10):
+        """
+        Like refreshCache, for the same call made with each of the input data
+        in inputdataList. The expired caches are refreshed with concurrent
+        requests, the requests that fail are made again one by one through
+        getData (and its stale cache handling). Return the list of cachefiles,
+        in the order of inputdataList.
+        """
+        verb = self._verbCheck(verb)
+
+        cachefiles = [self.cacheFileName(cachefile, verb, inputdata) \
+                      for inputdata in inputdataList]
+        expired = [index for index, cache in enumerate(cachefiles) if cache_expired(cache)]
+
+        results = None
+        if len(expired) > 1:
+            requests = [(url, inputdataList[index] or self["inputdata"]) for index in expired]
+            try:
+                results = self["requests"].multiRequest(requests, verb, incoming_headers,
+                                                        encoder, decoder, contentType,
+                                                        maxConnections, raiseErrors = False)
+            except Exception as ex:
+                self['logger'].warning('Concurrent requests to %s failed, making them one by one: %s' % \
+                                       (url, str(ex)))
+
+        for position, index in enumerate(expired):
+            if results == None or isinstance(results[position], Exception):
+                self.getData(cachefiles[index], url, inputdataList[index], incoming_headers,
+                             encoder, decoder, verb, contentType)
+            else:
+                self._writeCache(cachefiles[index], results[position][0])
+
+        if openfile:
+            return [cache if isfile(cache) else open(cache, 'r') for cache in cachefiles]
+        return cachefiles
+
+    def _writeCache(self, cachefile, data):
+        """
+        Write the data of a response to the cachefile.
+        """
+        if isfile(cachefile):
+            cachefile.write(str(data))
+            cachefile.seek (0, 0) # return to beginning of file
+        else:
+            f = open(cachefile, 'w')
+            if isinstance(data, dict) or isinstance(data, list):
+                f.write(json.dumps(data))
+            else:
+                f.write(str(data))
+            f.close()
+
     def forceRefresh(self, cachefile, url='', inputdata = {}, openfile=True,
                      encoder = True, decoder = True, verb = 'GET',
                      contentType = None, incoming_headers={}):
@@ -233,6 +389,11 @@ class Service(dict):
         incoming_headers.update({'cache-control':'no-cache'})
         self.getData(cachefile, url, inputdata, incoming_headers,
                      encoder, decoder, verb, contentType, force_refresh = True, )
+        if self.memoryCache != None:
+            memoryKey = self.memoryCacheKey(url, verb, inputdata)
+            if openfile:
+                return StringIO(self._cacheInMemory(memoryKey, cachefile))
+            self.memoryCache.remove(memoryKey)
         if openfile and not isfile(cachefile):
             return open(cachefile, 'r')
         else:
@@ -240,8 +401,12 @@ class Service(dict):
 
     def clearCache(self, cachefile, inputdata = {}, verb = 'GET'):
         """
-        Delete the cache file and the httplib2 cache.
+        Delete the cache file and the httplib2 cache. The memory cache is
+        cleared completely, since it is not keyed by cachefile.
         """
+        if self.memoryCache != None:
+            self.memoryCache.clear()
+
         if not self['cachepath'] or not cachefile:
             # nothing to clear
             return
@@ -273,13 +438,18 @@ class Service(dict):
                 inputdata = self["inputdata"]
             self['logger'].debug('getData: \n\turl: %s\n\tdata: %s' % \
                                  (url, inputdata))
-            data, status, reason, from_cache = self["requests"].makeRequest(uri = url,
+            # The requests object may be shared with a background refresh
+            self.requestLock.acquire()
+            try:
+                data, status, reason, from_cache = self["requests"].makeRequest(uri = url,
                                                     verb = verb,
                                                     data = inputdata,
                                                     incoming_headers = incoming_headers,
                                                     encoder = encoder,
                                                     decoder = decoder,
                                                     contentType = contentType)
+            finally:
+                self.requestLock.release()
             if from_cache:
                 # If it's coming from the cache we don't need to write it to the
                 # second cache, or do we?
@@ -287,16 +457,7 @@ class Service(dict):
             else:
                 # Don't need to prepend the cachepath, the methods calling
                 # getData have done that for us
-                if isfile(cachefile):
-                    cachefile.write(str(data))
-                    cachefile.seek (0, 0) # return to beginning of file
-                else:
-                    f = open(cachefile, 'w')
-                    if isinstance(data, dict) or isinstance(data, list):
-                        f.write(json.dumps(data))
-                    else:
-                        f.write(str(data))
-                    f.close()
+                self._writeCache(cachefile, data)
 
 
         except (IOError, HttpLib2Error, HTTPException) as he:
@@ -35,6 +35,10 @@ class SiteDBJSON(Service):
     def __init__(self, config={}):
         config = dict(config)
         config['endpoint'] = "https://cmsweb.cern.ch/sitedb/data/prod/"
+        # SiteDB data rarely changes, keep the responses in memory for the
+        # cache duration and use them for an hour more while refreshing them
+        config.setdefault('memcachesize', 50)
+        config.setdefault('memcachestale', 1)
         Service.__init__(self, config)
 
     def getJSON(self, callname, file = 'result.json', clearCache = False, verb = 'GET', data={}):
@@ -189,6 +189,102 @@ class RequestHandler(object):
                     verbose, ckey, cert, doseq)
         return header
 
+    def concurrent_requests(self, requests, ckey=None, cert=None, capath=None,
+                            decode=False, cainfo=None, maxconn=10, maxhostconn=4,
+                            retries=2):
+        """
+        Fetch a list of requests concurrently. Each request is a dictionary
+        with the url and optionally the params, headers, verb and doseq
+        arguments of the request method.
+
+        At most maxconn requests are in flight, at most maxhostconn of them
+        to the same host. The curl handles are reused, so their connections
+        are kept alive between requests to the same host. Requests failing
+        with a curl error (connection failure, timeout) or a 5xx status are
+        retried up to retries times.
+
+        Returns the results in the order of the requests, either a
+        (header, data) tuple or the exception raised by request for the
+        same request (HTTPException or pycurl.error).
+        """
+        results = [None] * len(requests)
+        if  not requests:
+            return results
+
+        multi = pycurl.CurlMulti()
+        try:
+            multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, maxhostconn)
+        except (AttributeError, pycurl.error):
+            # libcurl older than 7.30, no per host limit
+            pass
+        free = [pycurl.Curl() for _ in range(min(maxconn, len(requests)))]
+        pending = [(index, 0) for index in range(len(requests))]
+        active = {}
+
+        try:
+            while pending or active:
+                while pending and free:
+                    index, attempt = pending.pop(0)
+                    curl = free.pop()
+                    curl.reset()
+                    request = requests[index]
+                    bbuf, hbuf = self.set_opts(curl, request['url'],
+                            request.get('params', {}), request.get('headers', {}),
+                            ckey, cert, capath, None, request.get('verb', 'GET'),
+                            request.get('doseq', True), cainfo)
+                    active[id(curl)] = (curl, index, attempt, bbuf, hbuf)
+                    multi.add_handle(curl)
+
+                while True:
+                    ret, _ = multi.perform()
+                    if  ret != pycurl.E_CALL_MULTI_PERFORM:
+                        break
+
+                while True:
+                    numq, done, failed = multi.info_read()
+                    finished = [(handle, None) for handle in done]
+                    finished.extend([(handle, pycurl.error(code, msg)) \
+                                     for handle, code, msg in failed])
+                    for curl, error in finished:
+                        multi.remove_handle(curl)
+                        _, index, attempt, bbuf, hbuf = active.pop(id(curl))
+                        free.append(curl)
+                        request = requests[index]
+                        header = None
+                        if  error == None:
+                            header = self.parse_header(hbuf.getvalue())
+                            if  header.status >= 300:
+                                error = HTTPException()
+                                setattr(error, 'req_data', request.get('params', {}))
+                                setattr(error, 'req_headers', request.get('headers', {}))
+                                setattr(error, 'url', request['url'])
+                                setattr(error, 'result', bbuf.getvalue())
+                                setattr(error, 'status', header.status)
+                                setattr(error, 'reason', header.reason)
+                                setattr(error, 'headers', header.header)
+                        if  error == None:
+                            results[index] = \
+                                (header, self.parse_body(bbuf.getvalue(), decode))
+                        elif attempt < retries and \
+                                (header == None or header.status >= 500):
+                            self.logger.debug('Retrying %s: %s' % (request['url'], error))
+                            pending.append((index, attempt + 1))
+                        else:
+                            results[index] = error
+                    if  not numq:
+                        break
+
+                if  active:
+                    multi.select(1.0)
+        finally:
+            for curl, _, _, _, _ in active.values():
+                multi.remove_handle(curl)
+                curl.close()
+            for curl in free:
+                curl.close()
+            multi.close()
+        return results
+
     def multirequest(self, url, parray, headers=None,
                 ckey=None, cert=None, verbose=None):
         """Fetch data for given set of parameters"""
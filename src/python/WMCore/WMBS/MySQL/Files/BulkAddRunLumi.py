@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+_BulkAddRunLumi_
+
+MySQL implementation of Files.BulkAddRunLumi
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class BulkAddRunLumi(DBFormatter):
+    """
+    _BulkAddRunLumi_
+
+    Insert the run/lumi information of a list of files.  Unlike AddRunLumi
+    the file IDs are looked up once per file instead of once per lumi and
+    duplicated lumis are dropped before anything is sent to the database.
+    The rows are then inserted by ID with a single array bind.
+
+    Meant for files created in the same transaction, that don't have any
+    run/lumi information yet.
+    """
+    idSQL = """SELECT lfn, id FROM wmbs_file_details WHERE lfn = :lfn"""
+
+    sql = """INSERT IGNORE INTO wmbs_file_runlumi_map (fileid, run, lumi)
+               VALUES (:fileid, :run, :lumi)"""
+
+    def getRunLumis(self, files):
+        """
+        _getRunLumis_
+
+        Return the distinct (run, lumi) pairs of every file, keyed by LFN.
+        """
+        runLumis = {}
+        for entry in files:
+            fileRunLumis = runLumis.setdefault(entry['lfn'], set())
+            for run in entry['runs']:
+                for lumi in run:
+                    fileRunLumis.add((run.run, lumi))
+        return runLumis
+
+    def getFileIDs(self, lfns, conn = None, transaction = False):
+        binds = [{'lfn': lfn} for lfn in lfns]
+        result = self.dbi.processData(self.idSQL, binds, conn = conn,
+                                      transaction = transaction,
+                                      batchSelect = True)
+        return dict(self.format(result))
+
+    def execute(self, files, conn = None, transaction = False):
+        runLumis = self.getRunLumis(files)
+        if len(runLumis) == 0:
+            return
+
+        fileIDs = self.getFileIDs(runLumis.keys(), conn = conn,
+                                  transaction = transaction)
+
+        binds = []
+        for lfn in runLumis.keys():
+            if lfn not in fileIDs:
+                raise Exception, "File %s does not exist" % lfn
+            for run, lumi in sorted(runLumis[lfn]):
+                binds.append({'fileid': fileIDs[lfn], 'run': run, 'lumi': lumi})
+
+        if len(binds) > 0:
+            self.dbi.processData(self.sql, binds, conn = conn,
+                                 transaction = transaction)
+        return
@@ -46,5 +46,6 @@ class GetBulkRunLumi(DBFormatter):
         binds = self.getBinds(files)
 
         result = self.dbi.processData(self.sql, binds,
-                         conn = conn, transaction = transaction)
+                         conn = conn, transaction = transaction,
+                         batchSelect = True)
         return self.format(result)
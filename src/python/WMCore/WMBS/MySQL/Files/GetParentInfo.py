@@ -5,7 +5,9 @@ _GetParentInfo_
 Figure out parentage information for a file in WMBS.  This will return
 information about a file's parent and it's grand parent such as the
 lfn, id and whether or not the file is merged.  This will also determine
-whether or not the file is a redneck parent or redneck child.
+whether or not the file is a redneck parent or redneck child.  The LFN of
+the child is returned as child_lfn, so the information of many files can
+be retrieved at once.
 """
 
 
@@ -14,7 +16,7 @@ whether or not the file is a redneck parent or redneck child.
 from WMCore.Database.DBFormatter import DBFormatter
 
 class GetParentInfo(DBFormatter):
-    sql = """SELECT wfp.id, wfp.lfn, wfp.merged,
+    sql = """SELECT wfd.lfn AS child_lfn, wfp.id, wfp.lfn, wfp.merged,
                     wfgp.lfn AS gplfn, wfgp.merged AS gpmerged
              FROM wmbs_file_details wfp
              INNER JOIN wmbs_file_parent wfpa ON wfpa.parent = wfp.id
@@ -32,5 +34,6 @@ class GetParentInfo(DBFormatter):
             bindVars.append({"child_lfn": childLFN})
 
         result = self.dbi.processData(self.sql, bindVars,
-                         conn = conn, transaction = transaction)
+                         conn = conn, transaction = transaction,
+                         batchSelect = True)
         return self.formatDict(result)
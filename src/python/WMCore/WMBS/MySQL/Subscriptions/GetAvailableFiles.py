@@ -54,6 +54,33 @@ class GetAvailableFiles(DBFormatter):
 
         return finalResults
 
+    def formatColumnResults(self, columns):
+        """
+        _formatColumnResults_
+
+        Same as formatDict() but working from the column lists returned by
+        formatColumns(), this avoids creating a dictionary for every row of
+        large subscriptions.
+        """
+        fileIDs = columns.get("file", columns.get("fileid", []))
+        seNames = columns.get("se_name", [None] * len(fileIDs))
+
+        tempResults = {}
+        for fileID, seName in zip(fileIDs, seNames):
+            fileID = int(fileID)
+            locations = tempResults.setdefault(fileID, [])
+            if seName != None and not seName in locations:
+                locations.append(seName)
+
+        finalResults = []
+        for key in tempResults.keys():
+            tmpDict = {"file": key}
+            if not tempResults[key] == []:
+                tmpDict['locations'] = tempResults[key]
+            finalResults.append(tmpDict)
+
+        return finalResults
+
     def execute(self, subscription, conn = None, transaction = False, returnCursor = False):
         if returnCursor:
             return self.dbi.processData(self.sql, {"subscription": subscription},
@@ -61,5 +88,6 @@ class GetAvailableFiles(DBFormatter):
                                         returnCursor = returnCursor)
 
         results = self.dbi.processData(self.sql, {"subscription": subscription},
-                                       conn = conn, transaction = transaction)
-        return self.formatDict(results)
+                                       conn = conn, transaction = transaction,
+                                       columnar = True)
+        return self.formatColumnResults(self.formatColumns(results))
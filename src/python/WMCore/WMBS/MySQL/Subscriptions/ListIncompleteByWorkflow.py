@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+_ListIncompleteByWorkflow_
+
+MySQL implementation of Subscription.ListIncompleteByWorkflow
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class ListIncompleteByWorkflow(DBFormatter):
+    """
+    _ListIncompleteByWorkflow_
+
+    Same as ListIncomplete but group the subscription IDs by workflow.
+    """
+    sql = """SELECT DISTINCT wmbs_subscription.id AS id,
+                             wmbs_subscription.workflow AS workflow
+             FROM wmbs_subscription
+               INNER JOIN wmbs_sub_files_available ON
+                 wmbs_sub_files_available.subscription = wmbs_subscription.id
+             WHERE wmbs_subscription.id >= :minsub"""
+
+    def format(self, result):
+        results = DBFormatter.format(self, result)
+
+        subIDs = {}
+        for row in results:
+            subIDs.setdefault(row[1], []).append(row[0])
+
+        for workflow in subIDs.keys():
+            subIDs[workflow].sort()
+
+        return subIDs
+
+    def execute(self, minSub = 0, conn = None, transaction = False):
+        result = self.dbi.processData(self.sql, binds = {"minsub": minSub},
+                                      conn = conn, transaction = transaction)
+        return self.format(result)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+"""
+_BulkAddRunLumi_
+
+Oracle implementation of Files.BulkAddRunLumi
+"""
+
+from WMCore.WMBS.MySQL.Files.BulkAddRunLumi import BulkAddRunLumi as MySQLBulkAddRunLumi
+
+class BulkAddRunLumi(MySQLBulkAddRunLumi):
+    """
+    _BulkAddRunLumi_
+
+    The lumis are deduplicated by the DAO and the files are new, so unlike
+    Files.AddRunLumi no NOT EXISTS check is done for every row.
+    """
+    sql = """INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi)
+               VALUES (:fileid, :run, :lumi)"""
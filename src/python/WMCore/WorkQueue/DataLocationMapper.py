@@ -111,12 +111,28 @@ class DataLocationMapper():
                 args['subscribed'] = 'y'
             if not fullResync and self.lastLocationUpdate:
                 args['update_since'] = timeFloor(self.lastLocationUpdate, self.params['updateIntervalCoarseness'])
-            for dataItem in dataItems:
+            searchKey = 'dataset' if datasetSearch else 'block'
+            dataItems = list(dataItems)
+            # Query all the items concurrently, if that fails query them one
+            # by one so that only the items in error are skipped
+            try:
+                argsList = []
+                for dataItem in dataItems:
+                    itemArgs = dict(args)
+                    itemArgs[searchKey] = [dataItem]
+                    argsList.append(itemArgs)
+                responses = self.phedex.getReplicaInfoForBlocksMulti(argsList)
+            except Exception as ex:
+                logging.error('Error getting block locations from phedex: %s' % str(ex))
+                responses = [None] * len(dataItems)
+
+            for dataItem, response in zip(dataItems, responses):
                 try:
-                    if datasetSearch:
-                        response = self.phedex.getReplicaInfoForBlocks(dataset = [dataItem], **args)['phedex']
-                    else:
-                        response = self.phedex.getReplicaInfoForBlocks(block = [dataItem], **args)['phedex']
+                    if response == None:
+                        itemArgs = dict(args)
+                        itemArgs[searchKey] = [dataItem]
+                        response = self.phedex.getReplicaInfoForBlocks(**itemArgs)
+                    response = response['phedex']
                     for block in response['block']:
                         nodes = [se['node'] for se in block['replica']]
                         if datasetSearch:
@@ -129,15 +129,17 @@ def killWorkflow(workflowName, jobCouchConfig, bossAirConfig = None):
             changeState.propagate(jobsByState, "killed", state)
     return
 
-def freeSlots(multiplier = 1.0, minusRunning = False, allowedStates = ['Normal'], knownCmsSites = None):
+def freeSlots(multiplier = 1.0, minusRunning = False, allowedStates = ['Normal'], knownCmsSites = None,
+              snapshotAge = 0):
     """
     Get free resources from wmbs.
 
     Specify multiplier to apply a ratio to the actual numbers.
     minusRunning control if running jobs should be counted
+    snapshotAge is the age in seconds of the thresholds snapshot that can be used
     """
     from WMCore.ResourceControl.ResourceControl import ResourceControl
-    rc_sites = ResourceControl().listThresholdsForCreate()
+    rc_sites = ResourceControl().listThresholdsForCreate(maxAge = snapshotAge)
     thresholds = defaultdict(lambda: 0)
     jobCounts = defaultdict(dict)
     for name, site in rc_sites.items():
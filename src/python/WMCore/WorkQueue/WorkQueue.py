@@ -120,6 +120,7 @@ class WorkQueue(WorkQueueBase):
         self.params.setdefault("GlobalDBS",
                                "https://cmsweb.cern.ch/dbs/prod/global/DBSReader")
         self.params.setdefault('QueueDepth', 1) # when less than this locally
+        self.params.setdefault('ThresholdSnapshotAge', 0) # seconds wmbs thresholds can be cached
         self.params.setdefault('LocationRefreshInterval', 600)
         self.params.setdefault('FullLocationRefreshInterval', 7200)
         self.params.setdefault('TrackLocationOrSubscription', 'subscription')
@@ -724,7 +725,8 @@ class WorkQueue(WorkQueueBase):
         if not resources:
             # find out available resources from wmbs
             from WMCore.WorkQueue.WMBSHelper import freeSlots
-            thresholds, jobCounts = freeSlots(self.params['QueueDepth'], knownCmsSites = cmsSiteNames())
+            thresholds, jobCounts = freeSlots(self.params['QueueDepth'], knownCmsSites = cmsSiteNames(),
+                                              snapshotAge = self.params['ThresholdSnapshotAge'])
             # resources for new work are free wmbs resources minus what we already have queued
             _, resources, jobCounts = self.backend.availableWork(thresholds, jobCounts)
 
@@ -554,9 +554,8 @@ class WorkQueueBackend(object):
         options["reduce"] = False
         
         for couchdb in dbs:
-            result = couchdb.loadView("WorkQueue", "elementsByWorkflow", options, workflowNames)
             ids = []
-            for entry in result["rows"]:
+            for entry in couchdb.iterView("WorkQueue", "elementsByWorkflow", options, workflowNames):
                 ids.append(entry["id"])
             if ids:
                 couchdb.bulkDeleteByIDs(ids)
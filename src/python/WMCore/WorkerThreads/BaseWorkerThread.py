@@ -19,6 +19,7 @@ import sys
 from WMCore.Database.Transaction import Transaction
 from WMCore.Database.CMSCouch import CouchError
 from WMCore.Database.CouchUtils import CouchConnectionError
+from WMCore.Database import DAOProfiler
 from WMCore.WMFactory import WMFactory
 
 from WMCore.Alerts import API as alertAPI
@@ -177,6 +178,8 @@ class BaseWorkerThread:
                                     msg += " Raise a bug against me. Rollback."
                                     logging.error(msg)
                                     myThread.transaction.rollback()
+                                if DAOProfiler.profilingEnabled():
+                                    self.dumpDAOProfile()
                         except Exception as ex:
                             if myThread.transaction.transaction is not None:
                                 myThread.transaction.rollback()
@@ -217,6 +220,25 @@ class BaseWorkerThread:
         msg = "Worker thread %s terminated" % str(self)
         logging.info(msg)
 
+    def dumpDAOProfile(self):
+        """
+        _dumpDAOProfile_
+
+        Write the DAO statistics of the cycle that just finished, along with
+        the connection pool metrics, to the component directory.
+        """
+        try:
+            compName = self.component.config.Agent.componentName
+            compSect = getattr(self.component.config, compName)
+            extra = {"component": compName}
+            if hasattr(self.dbFactory, "getMetrics"):
+                extra["pool"] = self.dbFactory.getMetrics()
+            DAOProfiler.dumpCycle(compSect.componentDir, self.__class__.__name__,
+                                  extra, logging)
+        except Exception as ex:
+            logging.error("Failed to dump DAO profile for %s: %s" % (str(self), str(ex)))
+        return
+
     def sleepThread(self):
         """
         _sleepThread_
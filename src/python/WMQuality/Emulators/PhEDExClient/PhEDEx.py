@@ -227,6 +227,12 @@ class PhEDEx(dict):
                            'replica' : [{'node' : x + '_MSS' } for x in locations]})
         return data
 
+    def getReplicaInfoForBlocksMulti(self, argsList):
+        """
+        Where are blocks located, for several queries
+        """
+        return [self.getReplicaInfoForBlocks(**args) for args in argsList]
+
     def subscriptions(self, **args):
         """
         Where is data subscribed - for now just replicate blockreplicas
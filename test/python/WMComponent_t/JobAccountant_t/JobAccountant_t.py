@@ -661,6 +661,46 @@ class JobAccountantTest(unittest.TestCase):
 
         return
 
+    def testLoaderProcesses(self):
+        """
+        _testLoaderProcesses_
+
+        Verify that jobs are accounted correctly when the reports are loaded
+        by the report loader processes, one job per batch so that the next
+        report is loaded while a batch is written to the database.
+        """
+        self.setupDBForSplitJobSuccess()
+        self.testJobB["state"] = "complete"
+        self.testJobC["state"] = "complete"
+        self.stateChangeAction.execute(jobs = [self.testJobB, self.testJobC])
+
+        config = self.createConfig()
+        config.JobAccountant.loaderProcesses = 2
+        config.JobAccountant.accountantWorkSize = 1
+
+        accountant = JobAccountantPoller(config)
+        accountant.setup()
+        accountant.algorithm()
+        accountant.terminate(None)
+
+        fwjrBasePath = os.path.join(WMCore.WMBase.getTestBase(),
+                                    "WMComponent_t/JobAccountant_t/fwjrs/")
+        for testJob, fwjrName in [(self.testJobA, "SplitSuccessA.pkl"),
+                                  (self.testJobB, "SplitSuccessB.pkl"),
+                                  (self.testJobC, "SplitSuccessC.pkl")]:
+            jobReport = Report()
+            jobReport.unpersist(fwjrBasePath + fwjrName)
+            self.verifyFileMetaData(testJob["id"], jobReport.getAllFilesFromStep("cmsRun1"),
+                                    site = "srm-cms.cern.ch")
+            self.verifyJobSuccess(testJob["id"])
+
+        self.recoOutputFileset.loadData()
+        self.alcaOutputFileset.loadData()
+        self.assertEqual(len(self.testSubscription.filesOfStatus("Completed")), 1)
+        self.assertEqual(len(self.recoOutputFileset.getFiles(type = "list")), 3)
+        self.assertEqual(len(self.alcaOutputFileset.getFiles(type = "list")), 3)
+        return
+
     def setupDBForMergedSkimSuccess(self):
         """
         _setupDBForMergedSkimSuccess_
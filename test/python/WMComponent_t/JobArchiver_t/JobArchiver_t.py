@@ -13,6 +13,7 @@ import threading
 import unittest
 import time
 import shutil
+import tarfile
 import cProfile, pstats
 import inspect
 
@@ -278,6 +279,49 @@ class JobArchiverTest(unittest.TestCase):
 
         return
 
+    def testC_ClusterArchive(self):
+        """
+        _ClusterArchive_
+
+        Test that in cluster mode the jobs of a JobCluster folder are packed
+        in a single gzip archive, recorded in the index of the folder.
+        """
+        config = self.getConfig()
+        config.JobArchiver.archiveMode    = 'cluster'
+        config.JobArchiver.archiveThreads = 2
+        config.JobArchiver.archiveCodec   = 'gz'
+
+        cacheDir = os.path.join(self.testDir, 'test')
+        jobs = []
+        for jobID in [3, 1, 2, 1004]:
+            path = os.path.join(cacheDir, 'job%i' % jobID)
+            os.makedirs(path)
+            f = open(os.path.join(path, 'job%i.out' % jobID), 'w')
+            f.write('job%i' % jobID)
+            f.close()
+            jobs.append({'id': jobID, 'cache_dir': path, 'workflow': 'wf001'})
+
+        testJobArchiver = JobArchiverPoller(config = config)
+        testJobArchiver.cleanWorkArea(jobs)
+
+        self.assertEqual(os.listdir(cacheDir), [])
+
+        logPath = os.path.join(config.JobArchiver.componentDir, 'logDir', 'w', 'wf001')
+        for folder, archive, jobIDs in [('JobCluster_0', 'Jobs_1-3.tar.gz', [1, 2, 3]),
+                                        ('JobCluster_1', 'Jobs_1004-1004.tar.gz', [1004])]:
+            self.assertEqual(sorted(os.listdir(os.path.join(logPath, folder))),
+                             ['JobIndex.txt', archive])
+            tarball = tarfile.open(os.path.join(logPath, folder, archive))
+            self.assertEqual(sorted(tarball.getnames()),
+                             sorted(['Job_%i/job%i.out' % (x, x) for x in jobIDs]))
+            tarball.close()
+            f = open(os.path.join(logPath, folder, 'JobIndex.txt'))
+            index = sorted(f.read().splitlines())
+            f.close()
+            self.assertEqual(index, sorted(['%i %s' % (x, archive) for x in jobIDs]))
+
+        return
+
     @attr('integration')
     def testB_SpeedTest(self):
         """
@@ -15,7 +15,6 @@ import time
 import os
 import cProfile
 import pstats
-import cPickle
 
 from WMQuality.TestInitCouchApp import TestInitCouchApp as TestInit
 from WMQuality.Emulators import EmulatorSetup
@@ -27,6 +26,7 @@ from WMCore.WMBS.Fileset      import Fileset
 from WMCore.WMBS.Workflow     import Workflow
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.DataStructs.Run   import Run
+from WMCore.DataStructs.JobCacheStore import JobCacheStore
 
 from WMCore.Agent.Configuration              import Configuration
 from WMComponent.JobCreator.JobCreatorPoller import JobCreatorPoller
@@ -302,12 +302,15 @@ class JobCreatorTest(unittest.TestCase):
         self.assertTrue('job_1' in listOfDirs)
         self.assertTrue('job_2' in listOfDirs)
         self.assertTrue('job_3' in listOfDirs)
-        jobDir = os.listdir(groupDirectory)[0]
-        jobFile = os.path.join(groupDirectory, jobDir, 'job.pkl')
-        self.assertTrue(os.path.isfile(jobFile))
-        f = open(jobFile, 'r')
-        job = cPickle.load(f)
-        f.close()
+        self.assertTrue(JobCacheStore.exists(groupDirectory))
+        store = JobCacheStore(groupDirectory)
+        jobIDs = store.listJobs()
+        self.assertTrue(len(jobIDs) > 0)
+        job = store.loadJob(jobIDs[0])
+        summary = store.loadSummary(jobIDs[0])
+        store.close()
+        self.assertEqual(summary['name'], job['name'])
+        self.assertEqual(summary['cache_dir'], job['cache_dir'])
 
         self.assertEqual(job.baggage.PresetSeeder.generator.initialSeed, 1001)
         self.assertEqual(job.baggage.PresetSeeder.evtgenproducer.initialSeed, 1001)
@@ -589,6 +592,105 @@ class JobCreatorTest(unittest.TestCase):
 
         return
 
+    def getCreatedJobs(self, workflowName):
+        """
+        _getCreatedJobs_
+
+        Return the number of job groups created for a workflow and the input
+        files of its jobs, as found in WMBS and as found in the jobs saved in
+        the JobCacheStores.  The workflow name is taken out of the LFNs so
+        that workflows built from the same files can be compared.
+        """
+        myThread = threading.currentThread()
+
+        sql = """SELECT wmbs_job.id, wmbs_job.jobgroup, wmbs_job.cache_dir,
+                        wmbs_file_details.lfn FROM wmbs_job
+                   INNER JOIN wmbs_jobgroup ON wmbs_jobgroup.id = wmbs_job.jobgroup
+                   INNER JOIN wmbs_subscription ON wmbs_subscription.id = wmbs_jobgroup.subscription
+                   INNER JOIN wmbs_workflow ON wmbs_workflow.id = wmbs_subscription.workflow
+                   INNER JOIN wmbs_job_assoc ON wmbs_job_assoc.job = wmbs_job.id
+                   INNER JOIN wmbs_file_details ON wmbs_file_details.id = wmbs_job_assoc.fileid
+                 WHERE wmbs_workflow.name = :name"""
+        rows = myThread.dbi.processData(sql, {'name': workflowName})[0].fetchall()
+
+        jobGroups = set()
+        cacheDirs = {}
+        wmbsFiles = {}
+        for jobID, jobGroup, cacheDir, lfn in rows:
+            jobGroups.add(jobGroup)
+            cacheDirs[jobID] = cacheDir
+            wmbsFiles.setdefault(jobID, []).append(lfn.replace(workflowName, ''))
+
+        storeFiles = {}
+        stores = {}
+        for jobID, cacheDir in cacheDirs.items():
+            collectionDir = os.path.dirname(cacheDir)
+            if collectionDir not in stores:
+                self.assertTrue(JobCacheStore.exists(collectionDir))
+                stores[collectionDir] = JobCacheStore(collectionDir)
+            self.assertTrue(jobID in stores[collectionDir])
+            job = stores[collectionDir].loadJob(jobID)
+            self.assertEqual(job['workflow'], workflowName)
+            self.assertEqual(job['cache_dir'], cacheDir)
+            storeFiles[jobID] = [x['lfn'].replace(workflowName, '') for x in job['input_files']]
+        for store in stores.values():
+            store.close()
+
+        wmbsJobs = sorted([tuple(sorted(x)) for x in wmbsFiles.values()])
+        storeJobs = sorted([tuple(sorted(x)) for x in storeFiles.values()])
+        return len(jobGroups), wmbsJobs, storeJobs
+
+    def testF_ProcessPool(self):
+        """
+        _testF_ProcessPool_
+
+        Create the jobs of a workflow in the process pool (creatorSlaves > 0)
+        and check that the job groups, the jobs and the JobCacheStores are
+        the same as those created serially for the same files.
+        """
+        config = self.getConfig()
+
+        nSubs        = 3
+        nFiles       = 10
+        workloadName = 'TestWorkload'
+
+        workload = self.createWorkload(workloadName = workloadName)
+        workloadPath = os.path.join(self.testDir, 'workloadTest', 'TestWorkload', 'WMSandbox', 'WMWorkload.pkl')
+
+        # Same files at the same sites in both workflows
+        serialName = makeUUID()
+        random.seed(1234)
+        self.createJobCollection(name = serialName, nSubs = nSubs, nFiles = nFiles, workflowURL = workloadPath)
+        serialCreator = JobCreatorPoller(config = config)
+        serialCreator.algorithm()
+
+        poolName = makeUUID()
+        random.seed(1234)
+        self.createJobCollection(name = poolName, nSubs = nSubs, nFiles = nFiles, workflowURL = workloadPath)
+        config.JobCreator.creatorSlaves = 2
+        poolCreator = JobCreatorPoller(config = config)
+        try:
+            poolCreator.algorithm()
+            self.assertTrue(poolCreator.processPool != None)
+            self.assertEqual(poolCreator.processPool.inPort, '5571')
+            self.assertEqual(poolCreator.processPool.outPort, '5572')
+        finally:
+            if poolCreator.processPool != None:
+                poolCreator.processPool.close()
+
+        getJobsAction = self.daoFactory(classname = "Jobs.GetAllJobs")
+        result = getJobsAction.execute(state = 'Created', jobType = "Processing")
+        self.assertEqual(len(result), 2 * nSubs * nFiles)
+
+        serialGroups, serialJobs, serialStoreJobs = self.getCreatedJobs(serialName)
+        poolGroups, poolJobs, poolStoreJobs = self.getCreatedJobs(poolName)
+        self.assertEqual(len(serialJobs), nSubs * nFiles)
+        self.assertEqual(serialStoreJobs, serialJobs)
+        self.assertEqual(poolStoreJobs, poolJobs)
+        self.assertEqual(poolGroups, serialGroups)
+        self.assertEqual(poolJobs, serialJobs)
+        return
+
 
 if __name__ == "__main__":
 
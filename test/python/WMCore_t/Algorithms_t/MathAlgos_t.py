@@ -162,6 +162,44 @@ class MathAlgoTest(unittest.TestCase):
                                   {'a': 100, 'b': 198, 'name': 'Three'}])
         return
 
+    def testRunningSummary(self):
+        """
+        _testRunningSummary_
+
+        Test that the single pass summary gives the same average, standard
+        deviation, largest values and histogram as the list functions
+        """
+        numList = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        summary = MathAlgos.RunningSummary(nLargest = 3, reservoirSize = 100)
+        for value in numList:
+            summary.add(value, {'value': value})
+        summary.add(float('nan'), {'value': 0})
+
+        average, stdDev = summary.getAverageStdDev()
+        self.assertAlmostEqual(average, 5.5)
+        self.assertAlmostEqual(stdDev, MathAlgos.getAverageStdDev(numList = numList)[1])
+        self.assertEqual(summary.getLargestEntries(), [{'value': 10}, {'value': 9}, {'value': 8}])
+        self.assertEqual(summary.createHistogram(nBins = 2, limit = 10),
+                         MathAlgos.createHistogram(numList = numList, nBins = 2, limit = 10))
+
+        # Equal values keep their order
+        summary = MathAlgos.RunningSummary(nLargest = 2)
+        for name in ['One', 'Two', 'Three']:
+            summary.add(1.0, name)
+        self.assertEqual(summary.getLargestEntries(), ['One', 'Two'])
+        self.assertEqual(summary.getAverageStdDev(), (1.0, 0.0))
+
+        # Past the reservoir size the histogram is built from a sample
+        summary = MathAlgos.RunningSummary(reservoirSize = 100)
+        for value in range(1000):
+            summary.add(value % 10)
+        self.assertEqual(len(summary.reservoir), 100)
+        histogram = summary.createHistogram(nBins = 2, limit = 10)
+        self.assertEqual(sum([x['nEvents'] for x in histogram]), 1000)
+
+        self.assertEqual(MathAlgos.RunningSummary().getAverageStdDev(), (0.0, 0.0))
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
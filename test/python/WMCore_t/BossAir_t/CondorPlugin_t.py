@@ -9,11 +9,14 @@ import time
 import os.path
 import threading
 import unittest
+import subprocess
 
 from nose.plugins.attrib import attr
 from subprocess import Popen, PIPE, STDOUT
 
 from WMCore.BossAir.BossAirAPI   import BossAirAPI, BossAirException
+from WMCore.BossAir.Plugins.CondorPlugin import CondorPlugin
+from WMQuality.TestInit          import TestInit
 from WMCore.BossAir.StatusPoller import StatusPoller
 from WMCore.JobStateMachine.ChangeState          import ChangeState
 from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
@@ -466,5 +469,189 @@ class CondorPluginTest(BossAirTest):
         return
 
 
+
+class ChunkedOutput:
+    """
+    _ChunkedOutput_
+
+    Output of a fake command, read a few bytes at a time so that the
+    classAds are split across reads.
+    """
+    def __init__(self, data, chunkSize = 5):
+        self.data      = data
+        self.chunkSize = chunkSize
+
+    def read(self, size = -1):
+        if size < 0:
+            data, self.data = self.data, ''
+            return data
+        data = self.data[:self.chunkSize]
+        self.data = self.data[self.chunkSize:]
+        return data
+
+class FakePopen:
+    """
+    _FakePopen_
+
+    Stand in for subprocess.Popen.  Records the commands and returns the
+    (return code, stdout, stderr) tuples queued by command name.
+    """
+    commands = []
+    outputs  = {}
+
+    def __init__(self, command, stdout = None, stderr = None, shell = False):
+        FakePopen.commands.append(command)
+        self.exitCode, output, self.errors = FakePopen.outputs[command[0]].pop(0)
+        self.stdout = ChunkedOutput(output)
+        self.returncode = None
+        if hasattr(stderr, 'write'):
+            stderr.write(self.errors)
+
+    def wait(self):
+        self.returncode = self.exitCode
+        return self.returncode
+
+    def communicate(self):
+        self.wait()
+        return self.stdout.read(), self.errors
+
+class CondorPluginClassAdsTest(unittest.TestCase):
+    """
+    _CondorPluginClassAdsTest_
+
+    Test the classAd parsing and the bulk condor commands of the CondorPlugin
+    without a schedd, condor commands are faked.
+    """
+    def setUp(self):
+        self.testInit = TestInit(__file__)
+        self.testInit.setLogging()
+        self.testInit.setDatabaseConnection()
+
+        config = self.testInit.getConfiguration()
+        config.section_("Agent")
+        config.Agent.agentName = 'testAgent'
+        config.section_("BossAir")
+        config.BossAir.incrementalClassAds   = True
+        config.BossAir.condorBulkCommandSize = 2
+        self.plugin = CondorPlugin(config)
+
+        self.popen = subprocess.Popen
+        subprocess.Popen = FakePopen
+        FakePopen.commands = []
+        FakePopen.outputs  = {}
+        return
+
+    def tearDown(self):
+        subprocess.Popen = self.popen
+        self.testInit.clearDatabase()
+        return
+
+    def testQueryClassAds(self):
+        """
+        _testQueryClassAds_
+
+        ClassAds split across reads and values with colons are parsed, ads
+        without a WMAgent_JobID are dropped.
+        """
+        output  = '(JobStatus:1)  (stateTime:100)  (DESIRED_Sites:T1_US_FNAL, T2_CH_CERN)  (WMAgentID:1):::'
+        output += '(JobStatus:2)  (runningCMSSite:T2:odd:site)  (WMAgentID:2):::'
+        output += '(JobStatus:2):::(JobStatus:5)  (WMAgentID:3)'
+        FakePopen.outputs['condor_q'] = [(0, output, ''), (1, '', 'schedd down')]
+
+        jobInfo = self.plugin.queryClassAds(constraint = 'JobStatus == 1')
+        self.assertEqual(sorted(jobInfo.keys()), [1, 2, 3])
+        self.assertEqual(jobInfo[1], {'JobStatus': '1', 'stateTime': '100',
+                                      'DESIRED_Sites': 'T1_US_FNAL, T2_CH_CERN',
+                                      'WMAgentID': '1'})
+        self.assertEqual(jobInfo[2]['runningCMSSite'], 'T2:odd:site')
+        self.assertEqual(jobInfo[3]['JobStatus'], '5')
+
+        command = FakePopen.commands[0]
+        self.assertEqual(command[0], 'condor_q')
+        self.assertTrue('WMAgent_AgentName == "testAgent"' in command)
+        self.assertTrue('JobStatus == 1' in command)
+
+        self.assertEqual(self.plugin.queryClassAds(), None)
+        return
+
+    def testIncrementalClassAds(self):
+        """
+        _testIncrementalClassAds_
+
+        Unchanged jobs come from the cache, new jobs from the changed ads and
+        a job whose status changed behind our back forces a full query.
+        """
+        queries = []
+        responses = []
+        def queryClassAds(constraint = None, attributes = None):
+            queries.append(constraint)
+            return responses.pop(0)
+        self.plugin.queryClassAds = queryClassAds
+
+        responses.append({1: {'stateTime': '100', 'JobStatus': '1'},
+                          2: {'stateTime': '100', 'JobStatus': '1'}})
+        self.assertEqual(len(self.plugin.getClassAds()), 2)
+        self.assertEqual(queries, [None])
+
+        # Job 1 from the cache, job 2 changed and job 3 is new
+        responses.append({1: {'stateTime': '100'}, 2: {'stateTime': '200'}})
+        responses.append({2: {'stateTime': '200', 'JobStatus': '2'},
+                          3: {'stateTime': '200', 'JobStatus': '1'}})
+        jobInfo = self.plugin.getClassAds()
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(queries[2].startswith('EnteredCurrentStatus >= '))
+        self.assertEqual(jobInfo, {1: {'stateTime': '100', 'JobStatus': '1'},
+                                   2: {'stateTime': '200', 'JobStatus': '2'},
+                                   3: {'stateTime': '200', 'JobStatus': '1'}})
+
+        # Job 1 changed status but isn't in the changed ads
+        responses.append({1: {'stateTime': '300'}, 3: {'stateTime': '200'}})
+        responses.append({})
+        responses.append({1: {'stateTime': '300', 'JobStatus': '4'},
+                          3: {'stateTime': '200', 'JobStatus': '1'}})
+        jobInfo = self.plugin.getClassAds()
+        self.assertEqual(queries[-1], None)
+        self.assertEqual(jobInfo[1]['JobStatus'], '4')
+        self.assertEqual(self.plugin.classAdCycles, 0)
+        return
+
+    def testBulkCondorCommand(self):
+        """
+        _testBulkCondorCommand_
+
+        Jobs are edited and removed in chunks with a member() constraint,
+        errors are reported for the jobs still in the queue only.
+        """
+        FakePopen.outputs['condor_qedit'] = [(0, '', ''), (1, '', 'failed'), (0, '', '')]
+        FakePopen.outputs['condor_q'] = [(0, '3\n', '')]
+        results = self.plugin.bulkCondorCommand('condor_qedit', [5, 1, 2, 3, 4, 1],
+                                                ['DESIRED_Sites', '"T1_US_FNAL"'])
+        self.assertEqual(FakePopen.commands,
+                         [['condor_qedit', '-constraint', 'member(WMAgent_JobID, {1, 2})',
+                           'DESIRED_Sites', '"T1_US_FNAL"'],
+                          ['condor_qedit', '-constraint', 'member(WMAgent_JobID, {3, 4})',
+                           'DESIRED_Sites', '"T1_US_FNAL"'],
+                          ['condor_q', '-constraint', 'member(WMAgent_JobID, {3, 4})',
+                           '-format', '%d\n', 'WMAgent_JobID'],
+                          ['condor_qedit', '-constraint', 'member(WMAgent_JobID, {5})',
+                           'DESIRED_Sites', '"T1_US_FNAL"']])
+        self.assertEqual(results[1], None)
+        self.assertEqual(results[5], None)
+        self.assertEqual(results[3], 'Exit code 1: failed')
+        self.assertEqual(results[4], 'Job 4 is not in the queue')
+
+        # Jobs that left the queue are removed, as far as condor_rm goes
+        FakePopen.commands = []
+        FakePopen.outputs['condor_rm'] = [(1, '', 'failed'), (1, '', 'failed')]
+        FakePopen.outputs['condor_q'] = [(0, '2\n', ''), (1, '', 'schedd down')]
+        results = self.plugin.bulkCondorCommand('condor_rm', [1, 2, 3])
+        self.assertEqual(results, {1: None, 2: 'Exit code 1: failed',
+                                   3: 'Exit code 1: failed'})
+
+        FakePopen.outputs['condor_rm'] = [(0, '', '')]
+        self.assertEqual(self.plugin.kill([{'jobid': 1}]), None)
+        return
+
+
 if __name__ == '__main__':
     unittest.main()
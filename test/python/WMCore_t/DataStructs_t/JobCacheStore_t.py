@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+_JobCacheStore_t_
+
+Unittests for the append-only job cache store.
+"""
+
+import os
+import cPickle
+import unittest
+
+from WMQuality.TestInit import TestInit
+
+from WMCore.DataStructs.JobCacheStore import JobCacheStore, loadJob
+from WMCore.DataStructs.JobCacheStore import loadSubmitSummary, submitSummary
+from WMCore.DataStructs.JobCacheStore import loadJobData, removeStore
+from WMCore.DataStructs.Job import Job
+from WMCore.DataStructs.File import File
+
+class JobCacheStoreTest(unittest.TestCase):
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a JobCollection like directory to hold the store.
+        """
+        self.testInit = TestInit(__file__)
+        self.collectionDir = os.path.join(self.testInit.generateWorkDir(),
+                                          "JobCollection_1_0")
+        os.makedirs(self.collectionDir)
+        return
+
+    def tearDown(self):
+        self.testInit.delWorkDir()
+        return
+
+    def makeJob(self, jobID):
+        newJob = Job("Job%s" % jobID)
+        newJob["id"] = jobID
+        newJob["cache_dir"] = os.path.join(self.collectionDir, "job_%i" % jobID)
+        setattr(newJob.getBaggage(), "seed1", jobID * 11)
+        return newJob
+
+    def testAppendAndLoad(self):
+        """
+        _testAppendAndLoad_
+
+        Verify that jobs and summaries can be read back, also while the store
+        is still being appended to.
+        """
+        writer = JobCacheStore(self.collectionDir)
+        reader = JobCacheStore(self.collectionDir)
+        for jobID in range(1, 51):
+            writer.append(jobID, self.makeJob(jobID), {"name": "Job%s" % jobID})
+
+        self.assertEqual(sorted(reader.listJobs()), range(1, 51))
+        self.assertEqual(reader.loadJob(20)["name"], "Job20")
+        self.assertEqual(reader.loadJob(20).getBaggage().seed1, 220)
+
+        for jobID in range(51, 101):
+            writer.append(jobID, self.makeJob(jobID), {"name": "Job%s" % jobID})
+        writer.close()
+
+        self.assertTrue(100 in reader)
+        self.assertFalse(101 in reader)
+        self.assertEqual(reader.loadJob(100)["name"], "Job100")
+        self.assertEqual(reader.loadSummary(75), {"name": "Job75"})
+        self.assertEqual(reader.loadFields(75, ["name"]), {"name": "Job75"})
+        self.assertEqual(reader.loadFields(75, ["name", "id"]),
+                         {"name": "Job75", "id": 75})
+        self.assertRaises(KeyError, reader.loadJob, 101)
+        reader.close()
+
+        # The last record of a job wins
+        writer = JobCacheStore(self.collectionDir)
+        updatedJob = self.makeJob(10)
+        updatedJob["retry_count"] = 3
+        writer.append(10, updatedJob)
+        writer.close()
+
+        reader = JobCacheStore(self.collectionDir, useMmap = False)
+        self.assertEqual(len(reader.listJobs()), 100)
+        self.assertEqual(reader.loadJob(10)["retry_count"], 3)
+        self.assertEqual(reader.loadJob(11)["retry_count"], 0)
+        reader.close()
+        return
+
+    def testLoadJob(self):
+        """
+        _testLoadJob_
+
+        Verify that loadJob() finds jobs in the store as well as in job.pkl
+        files written by older agents.
+        """
+        store = JobCacheStore(self.collectionDir)
+        store.append(1, self.makeJob(1))
+        store.close()
+
+        oldJob = self.makeJob(2)
+        os.makedirs(oldJob["cache_dir"])
+        output = open(os.path.join(oldJob["cache_dir"], "job.pkl"), "w")
+        cPickle.dump(oldJob, output, cPickle.HIGHEST_PROTOCOL)
+        output.close()
+
+        stores = {}
+        self.assertEqual(loadJob(self.makeJob(1)["cache_dir"], stores)["name"], "Job1")
+        self.assertEqual(loadJob(oldJob["cache_dir"], stores)["name"], "Job2")
+        self.assertEqual(loadJob(self.makeJob(3)["cache_dir"], stores), None)
+        self.assertEqual(stores.keys(), [self.collectionDir])
+        for store in stores.values():
+            store.close()
+        return
+
+    def testArchiveAndRemove(self):
+        """
+        _testArchiveAndRemove_
+
+        Verify that the pickled jobs can be read for archiving and that the
+        store is only removed once no job cache directory is left.
+        """
+        store = JobCacheStore(self.collectionDir)
+        for jobID in [1, 2]:
+            store.append(jobID, self.makeJob(jobID))
+            os.makedirs(self.makeJob(jobID)["cache_dir"])
+        store.close()
+
+        stores = {}
+        jobData = loadJobData(self.makeJob(1)["cache_dir"], stores)
+        self.assertEqual(cPickle.loads(jobData)["name"], "Job1")
+        self.assertEqual(loadJobData(self.makeJob(3)["cache_dir"], stores), None)
+        for store in stores.values():
+            store.close()
+
+        os.rmdir(self.makeJob(1)["cache_dir"])
+        self.assertFalse(removeStore(self.collectionDir))
+        self.assertTrue(JobCacheStore.exists(self.collectionDir))
+
+        os.rmdir(self.makeJob(2)["cache_dir"])
+        self.assertTrue(removeStore(self.collectionDir))
+        self.assertFalse(os.path.exists(self.collectionDir))
+        self.assertFalse(removeStore(self.collectionDir))
+        return
+
+    def testSubmitSummary(self):
+        """
+        _testSubmitSummary_
+
+        Verify that submit summaries are read from the store when they were
+        written with the job and built from the full job otherwise.
+        """
+        newJob = self.makeJob(1)
+        newJob["siteWhitelist"] = ["T1_US_FNAL"]
+        newJob.addFile(File("/store/data/1.root", locations = set(["se.fnal.gov"])))
+        newJob.getBaggage().numberOfCores = 4
+
+        summary = submitSummary(newJob)
+        self.assertEqual(summary["inputLocations"], ["se.fnal.gov"])
+        self.assertEqual(summary["siteWhitelist"], ["T1_US_FNAL"])
+        self.assertEqual(summary["siteBlacklist"], [])
+        self.assertEqual(summary["numberOfCores"], 4)
+        self.assertEqual(summary["cache_dir"], newJob["cache_dir"])
+
+        store = JobCacheStore(self.collectionDir)
+        store.append(1, newJob, summary)
+        store.append(2, self.makeJob(2), {"name": "Job2"})
+        store.close()
+
+        stores = {}
+        self.assertEqual(loadSubmitSummary(newJob["cache_dir"], stores), summary)
+        oldSummary = loadSubmitSummary(self.makeJob(2)["cache_dir"], stores)
+        self.assertEqual(oldSummary["name"], "Job2")
+        self.assertEqual(oldSummary["inputLocations"], [])
+        self.assertEqual(oldSummary["numberOfCores"], 1)
+        self.assertEqual(loadSubmitSummary(self.makeJob(3)["cache_dir"], stores), None)
+        for store in stores.values():
+            store.close()
+        return
+
+if __name__ == '__main__':
+    unittest.main()
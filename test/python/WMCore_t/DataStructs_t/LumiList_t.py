@@ -1,5 +1,8 @@
 #! /usr/bin/env python
 
+import os
+import shutil
+import tempfile
 import unittest
 
 #import FWCore.ParameterSet.Config as cms
@@ -11,6 +14,21 @@ class LumiListTest(unittest.TestCase):
 
     """
 
+    def setUp(self):
+        """
+        Write the JSON file read by the tests into a scratch directory
+        """
+        self.testDir = tempfile.mkdtemp()
+        self.jsonFile = os.path.join(self.testDir, 'lumiTest.json')
+        jsonFile = open(self.jsonFile, 'w')
+        jsonFile.write('{"1": [[1, 33], [35, 35], [37, 47]], "2": [[49, 75], [77, 130], [133, 136]]}')
+        jsonFile.close()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
     def notestRead(self):
         """
         Test reading from JSON
@@ -20,7 +38,7 @@ class LumiListTest(unittest.TestCase):
                     '2': [[49, 75], [77, 130], [133, 136]]}
         exVLBR   = cms.VLuminosityBlockRange('1:1-1:33', '1:35', '1:37-1:47', '2:49-2:75', '2:77-2:130', '2:133-2:136')
 
-        jsonList = LumiList(filename = 'lumiTest.json')
+        jsonList = LumiList(filename = self.jsonFile)
         lumiString = jsonList.getCMSSWString()
         lumiList = jsonList.getCompactList()
         lumiVLBR = jsonList.getVLuminosityBlockRange(True)
@@ -38,7 +56,7 @@ class LumiListTest(unittest.TestCase):
         listLs2 = range(49, 76) + range(77, 131) + range(133, 137)
         lumis = zip([1]*100, listLs1) + zip([2]*100, listLs2)
 
-        jsonLister = LumiList(filename = 'lumiTest.json')
+        jsonLister = LumiList(filename = self.jsonFile)
         jsonString = jsonLister.getCMSSWString()
         jsonList = jsonLister.getCompactList()
 
@@ -67,7 +85,7 @@ class LumiListTest(unittest.TestCase):
             '2': []
         }
 
-        jsonLister = LumiList(filename = 'lumiTest.json')
+        jsonLister = LumiList(filename = self.jsonFile)
         jsonString = jsonLister.getCMSSWString()
         jsonList   = jsonLister.getCompactList()
 
@@ -268,6 +286,60 @@ class LumiListTest(unittest.TestCase):
         self.assertTrue(sel.getCMSSWString() == res.getCMSSWString())
         self.assertTrue(sel.getCMSSWString() == rem.getCMSSWString())
 
+    def testUnsortedRanges(self):
+        """
+        Test set algebra and membership with overlapping, unsorted and open
+        ended ranges in the compact list
+        """
+        a = LumiList(compactList = {'1': [[20, 30], [1, 10], [5, 12], [13, 15]],
+                                    '2': [[50, 0], [1, 5]]})
+        b = LumiList(compactList = {'1': [[8, 22]],
+                                    '2': [[3, 3]]})
+
+        self.assertEqual((a - b).getCompactList(),
+                         {'1': [[1, 7], [23, 30]], '2': [[1, 2], [4, 5], [50, 0]]})
+        self.assertEqual((a & b).getCompactList(),
+                         {'1': [[8, 15], [20, 22]], '2': [[3, 3]]})
+
+        # Ranges with an upper bound of 0 extend to the end of the run
+        c = LumiList(compactList = {'2': [[40, 60], [70, 0]]})
+        self.assertEqual((a & c).getCompactList(), {'2': [[50, 60], [70, 0]]})
+        self.assertEqual((a - c).getCompactList(), {'1': [[1, 15], [20, 30]],
+                                                    '2': [[1, 5], [61, 69]]})
+        self.assertEqual((c - a).getCompactList(), {'2': [[40, 49]]})
+        self.assertEqual((a | c).getCompactList()['2'], [[1, 5], [40, 0]])
+
+        d = LumiList(compactList = {'1': [[1, 10]]}) | LumiList(compactList = {'1': [[5, 0]]})
+        self.assertEqual(d.getCompactList(), {'1': [[1, 0]]})
+        self.assertTrue(d.contains(1, 500))
+        d = LumiList(compactList = {'1': [[20, 0]]}) | LumiList(compactList = {'1': [[1, 10]], '2': [[3, 4]]})
+        self.assertEqual(d.getCompactList(), {'1': [[1, 10], [20, 0]], '2': [[3, 4]]})
+
+        self.assertTrue(a.contains(1, 11))
+        self.assertTrue(a.contains((1, 15)))
+        self.assertFalse(a.contains(1, 16))
+        self.assertTrue(a.contains(2, 1000))
+        self.assertFalse(a.contains(2, 49))
+        self.assertFalse(a.contains(3, 1))
+
+        self.assertEqual(a.filterLumis([(1, 16), (1, 20), (2, 5), (2, 1000), (3, 1)]),
+                         [(1, 20), (2, 5), (2, 1000)])
+
+        # Changes to the compact list are seen by the next lookup
+        a.getCompactList()['1'] = [[100, 200]]
+        self.assertFalse(a.contains(1, 11))
+        self.assertTrue(a.contains(1, 150))
+        a.getCompactList()['1'][0][1] = 300
+        self.assertTrue(a.contains(1, 250))
+        a.compactList['1'].append([400, 410])
+        self.assertTrue(a.contains(1, 405))
+        a.removeRuns([1])
+        self.assertFalse(a.contains(1, 150))
+        a.compactList = {'1': [[100, 300]]}
+        self.assertEqual(a.filterLumis([(1, 250), (1, 301)]), [(1, 250)])
+        self.assertEqual((a & LumiList(compactList = {'1': [[250, 260]]})).getCompactList(),
+                         {'1': [[250, 260]]})
+
     def testURL(self):
         URL = 'https://cms-service-dqm.web.cern.ch/cms-service-dqm/CAF/certification/Collisions12/8TeV/Reprocessing/Cert_190456-195530_8TeV_08Jun2012ReReco_Collisions12_JSON.txt'
         ll = LumiList(url=URL)
@@ -280,12 +352,11 @@ class LumiListTest(unittest.TestCase):
                   '4' : range(1,100),
                  }
         a = LumiList(runsAndLumis = alumis)
-        a.writeJSON('newFile.json')
+        fileName = os.path.join(self.testDir, 'newFile.json')
+        a.writeJSON(fileName)
+        self.assertEqual(LumiList(filename = fileName).getCMSSWString(), a.getCMSSWString())
 
 
 
 if __name__ == '__main__':
-    jsonFile = open('lumiTest.json','w')
-    jsonFile.write('{"1": [[1, 33], [35, 35], [37, 47]], "2": [[49, 75], [77, 130], [133, 136]]}')
-    jsonFile.close()
     unittest.main()
@@ -178,6 +178,26 @@ class MaskTest(unittest.TestCase):
         self.assertEqual(run.run, 1)
         self.assertEqual(run.lumis, [2,9])
 
+    def testFilterRunLumis(self):
+        """
+        Test bulk filtering of a list of (run, lumi) pairs
+        """
+        mask = Mask()
+        self.assertEqual(mask.filterRunLumis([(1, 1), (5, 7)]), [(1, 1), (5, 7)])
+
+        mask.addRunWithLumiRanges(run=1, lumiList=[[1, 9], [12, 12], [31, 31], [38, 39], [49, 49]])
+        mask.addRunAndLumis(run=2, lumis=[100, 1000000])
+        mask.addRunAndLumis(run=2, lumis=[5, 10])
+
+        runLumis = [(1, 9), (2, 100), (1, 10), (3, 1), (2, 4), (1, 38),
+                    (2, 999999), (1, 49), (1, 50), (2, 7)]
+        self.assertEqual(mask.filterRunLumis(runLumis),
+                         [(1, 9), (2, 100), (1, 38), (2, 999999), (1, 49), (2, 7)])
+        for run, lumi in runLumis:
+            self.assertEqual((run, lumi) in mask.filterRunLumis([(run, lumi)]),
+                             mask.runLumiInMask(run, lumi))
+        return
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -303,6 +303,34 @@ class CMSCouchTest(unittest.TestCase):
 
         return
 
+    def testCommitChunks(self):
+        """
+        Test that big queues are committed in several _bulk_docs requests
+        sent in parallel, with the results in the queue order
+        """
+        self.db.maxBulkSize = 1024
+        self.db.bulkThreads = 3
+        for i in range(200):
+            self.db.queue(Document(id = "chunk%03i" % i, inputDict = {'data': 'x' * 100}))
+        self.assertTrue(len(self.db._bulkChunks(self.db._queue, {})) > 20)
+
+        answer = self.db.commit()
+        self.assertEqual(200, len(answer))
+        self.assertEqual([x['id'] for x in answer], ["chunk%03i" % i for i in range(200)])
+        self.assertEqual(len(self.db._queue), 0)
+        self.assertEqual(200, self.db.allDocs()['total_rows'])
+
+        # conflicts are passed to the callback with the documents of their chunk
+        def callback(db, data, result):
+            self.assertTrue(result['id'] in [doc['_id'] for doc in data['docs']])
+            return 'resolved'
+
+        for i in range(200):
+            self.db.queue(Document(id = "chunk%03i" % i, inputDict = {'data': 'y'}))
+        answer = self.db.commit(callback = callback)
+        self.assertEqual(answer, ['resolved'] * 200)
+        return
+
     def testUpdateHandler(self):
         """
         Test that update function support works
@@ -363,6 +391,93 @@ class CMSCouchTest(unittest.TestCase):
         self.assertEquals(1, len(self.db.allDocs({'limit':1}, ["1", "3"])['rows']))
         self.assertEquals(True, 'error' in self.db.allDocs(keys = ["1", "4"])['rows'][1])
 
+    def testIterators(self):
+        """
+        Test paging through views and _all_docs
+        """
+        ddoc = {
+            '_id':'_design/foo',
+            'language': 'javascript',
+            'views' : {
+                       'byGroup' : {
+                                'map' : 'function(doc) {if (doc.group) {emit(doc.group, doc.num)}}',
+                                'reduce' : '_count'
+                                },
+                       'bySteps' : {
+                                'map' : 'function(doc) {if (doc.group) {for (var i = 0; i < 3; i++) {emit(doc.group, [doc.num, i])}}}'
+                                },
+                       },
+            'lists' : {
+                'count' : 'function(head, req) {var n = 0; while (getRow()) {n++}; send(n)}',
+            }
+        }
+        self.db.queue(ddoc)
+        # ten documents with the same key in each group, so that pages
+        # start in the middle of a key
+        for i in range(95):
+            self.db.queue(Document(id = "doc%02i" % i, inputDict = {'group': i / 10, 'num': i}))
+        self.db.commit()
+
+        view = self.db.loadView('foo', 'byGroup', {'reduce': False})['rows']
+        for pageSize in [1, 7, 10, 1000]:
+            rows = list(self.db.iterView('foo', 'byGroup', {'reduce': False}, pageSize = pageSize))
+            self.assertEqual(rows, view)
+
+        # several rows per document with the same key
+        view = self.db.loadView('foo', 'bySteps')['rows']
+        for pageSize in [1, 2, 4, 1000]:
+            rows = list(self.db.iterView('foo', 'bySteps', pageSize = pageSize))
+            self.assertEqual(rows, view)
+
+        rows = list(self.db.iterView('foo', 'byGroup', {'reduce': False, 'key': 3}, pageSize = 3))
+        self.assertEqual([x['value'] for x in rows], range(30, 40))
+        rows = list(self.db.iterView('foo', 'byGroup', {'reduce': False, 'limit': 15}, pageSize = 4))
+        self.assertEqual([x['value'] for x in rows], range(15))
+        rows = list(self.db.iterView('foo', 'byGroup', {'reduce': False}, keys = [1, 8], pageSize = 1))
+        self.assertEqual([x['value'] for x in rows], range(10, 20) + range(80, 90))
+
+        groups = list(self.db.iterView('foo', 'byGroup', {'group': True}, pageSize = 3))
+        self.assertEqual([(x['key'], x['value']) for x in groups],
+                         [(i, 10) for i in range(9)] + [(9, 5)])
+
+        allDocs = self.db.allDocs()['rows']
+        self.assertEqual(list(self.db.iterAllDocs(pageSize = 9)), allDocs)
+        self.assertEqual(len(list(self.db.iterAllDocs(keys = ["doc01", "doc02", "nodoc"], pageSize = 2))), 3)
+
+        self.assertEqual("".join(self.db.iterList('foo', 'count', 'byGroup', {'reduce': False}, chunkSize = 1)),
+                         "95")
+        return
+
+    def testIteratorsManyRowsPerKey(self):
+        """
+        Test paging through a view where a document emits more rows under one
+        key than fit in a page, pages start and end inside those rows
+        """
+        ddoc = {
+            '_id':'_design/bar',
+            'language': 'javascript',
+            'views' : {
+                       'bySteps' : {
+                                'map' : 'function(doc) {for (var i = 0; i < doc.steps; i++) {emit(doc.key, [doc._id, i])}}'
+                                },
+                       },
+        }
+        self.db.queue(ddoc)
+        self.db.queue(Document(id = "one", inputDict = {'key': 'a', 'steps': 7}))
+        self.db.queue(Document(id = "two", inputDict = {'key': 'a', 'steps': 2}))
+        self.db.queue(Document(id = "three", inputDict = {'key': 'b', 'steps': 5}))
+        self.db.commit()
+
+        view = self.db.loadView('bar', 'bySteps')['rows']
+        self.assertEqual(len(view), 14)
+        for pageSize in [1, 2, 3, 6, 1000]:
+            rows = list(self.db.iterView('bar', 'bySteps', pageSize = pageSize))
+            self.assertEqual(rows, view)
+
+        rows = list(self.db.iterView('bar', 'bySteps', {'key': 'a', 'limit': 8}, pageSize = 3))
+        self.assertEqual(rows, view[:8])
+        return
+
 if __name__ == "__main__":
     if len(sys.argv) >1 :
         suite = unittest.TestSuite()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+_CouchClient_t_
+
+Unit tests for the keep-alive connection pool and the streaming row decoder
+used by CMSCouch.
+"""
+
+import ssl
+import json
+import httplib
+import threading
+import unittest
+import cStringIO
+import BaseHTTPServer
+
+from WMCore.Database.CouchClient import ConnectionPool, PooledResponse, JSONRowStream
+from WMCore.Services.Requests import JSONRequests
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answer every GET with a small JSON view, keeping the connection open.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"total_rows": 1, "offset": 0,
+                           "rows": [{"id": self.path, "key": self.path,
+                                     "value": self.client_address[1]}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        return
+
+class QuietHTTPServer(BaseHTTPServer.HTTPServer):
+    """
+    Don't report the connections dropped by the client.
+    """
+    def handle_error(self, request, client_address):
+        return
+
+class CouchClientTest(unittest.TestCase):
+
+    def decodeInChunks(self, body, chunkSize):
+        """
+        _decodeInChunks_
+
+        Decode body with JSONRowStream, reading chunkSize bytes at a time.
+        """
+        handle = cStringIO.StringIO(body)
+        return JSONRowStream(lambda amt: handle.read(min(amt, chunkSize)),
+                             chunkSize = chunkSize).decode()
+
+    def testRowStream(self):
+        """
+        _testRowStream_
+
+        Verify that the rows decoded while reading the body are those
+        decoded from the whole body, whatever the size of the reads.
+        """
+        view = {"total_rows": 123456, "offset": 10,
+                "rows": [{"id": "doc%i" % i, "key": [i, "abc", None, 1.5e10],
+                          "value": {"size": i * 1234567, "lfn": u"/store/%i.root" % i}}
+                         for i in range(50)],
+                "update_seq": 98765}
+        body = json.dumps(view)
+        # Couch writes one row per line
+        body = body.replace('}, {"id"', '},\r\n{"id"')
+
+        for chunkSize in [1, 2, 7, 64, 65536]:
+            result = self.decodeInChunks(body, chunkSize)
+            self.assertEqual(result, view)
+            self.assertEqual(result, JSONRequests(idict = {"cachepath": None}).decode(body))
+
+        self.assertEqual(self.decodeInChunks('{"total_rows":0,"offset":0,"rows":[\r\n\r\n]}\n', 3),
+                         {"total_rows": 0, "offset": 0, "rows": []})
+        self.assertEqual(self.decodeInChunks('{"ok":true}', 4), {"ok": True})
+        self.assertRaises(ValueError, self.decodeInChunks, '{"rows":[{"id":1}', 4)
+        self.assertRaises(ValueError, self.decodeInChunks, '["a"]', 4)
+        return
+
+    def testRowIterator(self):
+        """
+        _testRowIterator_
+
+        Verify that iterating over the stream returns the rows one at a time
+        and fills the other members.
+        """
+        body = '{"total_rows":3,"offset":0,"rows":[{"id":"a"},{"id":"b"},{"id":"c"}]}'
+        stream = JSONRowStream(cStringIO.StringIO(body).read, chunkSize = 5)
+        ids = []
+        for row in stream:
+            ids.append(row["id"])
+            self.assertEqual(stream.members["total_rows"], 3)
+        self.assertEqual(ids, ["a", "b", "c"])
+        self.assertEqual(stream.members, {"total_rows": 3, "offset": 0, "rows": []})
+        return
+
+    def testConnectionReuse(self):
+        """
+        _testConnectionReuse_
+
+        Verify that connections whose responses were read go back to the
+        pool and are reused, while closed responses drop their connection.
+        """
+        server = QuietHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        serverThread = threading.Thread(target = server.serve_forever)
+        serverThread.setDaemon(True)
+        serverThread.start()
+        netloc = "127.0.0.1:%i" % server.server_address[1]
+
+        pool = ConnectionPool(maxIdle = 2)
+        try:
+            ports = set()
+            for i in range(5):
+                conn, reused = pool.acquire("http", netloc, 10)
+                self.assertEqual(reused, i > 0)
+                conn.request("GET", "/db/_all_docs")
+                response = PooledResponse(conn.getresponse(), conn, pool)
+                result = JSONRowStream(response.read).decode()
+                self.assertEqual(result["rows"][0]["id"], "/db/_all_docs")
+                ports.add(result["rows"][0]["value"])
+            self.assertEqual(len(ports), 1)
+
+            conn, reused = pool.acquire("http", netloc, 10)
+            self.assertTrue(reused)
+            conn.request("GET", "/db/_all_docs")
+            response = PooledResponse(conn.getresponse(), conn, pool)
+            response.close()
+            self.assertEqual(pool.idle[conn.poolKey], [])
+        finally:
+            pool.clear()
+            server.shutdown()
+            server.server_close()
+        return
+
+    def testHTTPSConnection(self):
+        """
+        _testHTTPSConnection_
+
+        Verify that https connections don't verify the server certificate,
+        like the Requests connections.
+        """
+        pool = ConnectionPool()
+        conn, reused = pool.acquire("https", "cmsweb.cern.ch:443", 10)
+        self.assertFalse(reused)
+        self.assertTrue(isinstance(conn, httplib.HTTPSConnection))
+        self.assertEqual(conn.poolKey, ("https", "cmsweb.cern.ch:443", None, None))
+        if hasattr(ssl, "_create_unverified_context"):
+            self.assertEqual(conn._context.verify_mode, ssl.CERT_NONE)
+            self.assertFalse(conn._context.check_hostname)
+
+        conn, reused = pool.acquire("http", "cmsweb.cern.ch:80", 10)
+        self.assertFalse(isinstance(conn, httplib.HTTPSConnection))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+_DAOProfiler_t_
+
+Unit tests for the DAO profiling.
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+from WMCore.Database.DBFactory import DBFactory
+from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.Database import DAOProfiler
+
+class ListNumbers(DBFormatter):
+    sql = "SELECT :number AS number"
+
+    def execute(self, numbers, conn = None, transaction = False):
+        binds = [{"number": number} for number in numbers]
+        result = self.dbi.processData(self.sql, binds, conn = conn,
+                                      transaction = transaction)
+        return self.formatDict(result)
+
+class DAOProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('DAOProfilerTest')
+        self.dbi = DBFactory(self.logger, dburl = 'sqlite://').connect()
+        self.workDir = tempfile.mkdtemp()
+        DAOProfiler.cycleSummary()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.workDir)
+        return
+
+    def testProfileDAO(self):
+        """
+        _testProfileDAO_
+
+        Verify that calls, binds and rows are counted per DAO and that the
+        cycle statistics can be dumped and loaded back.
+        """
+        dao = DAOProfiler.profileDAO(ListNumbers(self.logger, self.dbi))
+
+        self.assertEqual(len(dao.execute([1, 2, 3])), 3)
+        self.assertEqual(len(dao.execute(numbers = [4])), 1)
+
+        # Queries run outside of a profiled DAO are not counted
+        self.dbi.processData("SELECT 1")
+
+        componentDir = os.path.join(self.workDir, "JobSubmitter")
+        os.mkdir(componentDir)
+        summary = DAOProfiler.dumpCycle(componentDir, "JobSubmitterPoller",
+                                        {"component": "JobSubmitter"})
+
+        daoStats = summary["daos"][ListNumbers.__module__]
+        self.assertEqual(daoStats["calls"], 2)
+        self.assertEqual(daoStats["binds"], 4)
+        self.assertEqual(daoStats["rows"], 4)
+        self.assertTrue(daoStats["time"] >= daoStats["max"])
+        self.assertEqual(len(summary["daos"]), 1)
+
+        # The statistics are reset at the end of the cycle
+        self.assertEqual(DAOProfiler.cycleSummary()["daos"], {})
+
+        profiles = DAOProfiler.loadProfiles(self.workDir)
+        self.assertEqual(profiles.keys(), ["JobSubmitter"])
+        profile = profiles["JobSubmitter"]["JobSubmitterPoller"]
+        self.assertEqual(profile["component"], "JobSubmitter")
+        self.assertEqual(profile["daos"][ListNumbers.__module__]["rows"], 4)
+        self.assertEqual(DAOProfiler.loadProfiles(self.workDir, "JobCreator"), {})
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -284,6 +284,92 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testProcessDataBatchSelect(self):
+        """
+        _testProcessDataBatchSelect_
+
+        Verify that a batched select returns the same rows in the same order
+        as running the select once per bind.
+        """
+        binds = []
+        for i in range(1201):
+            binds.append({"one": i, "two": i * 2, "three": str(i * 3)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = \
+          """SELECT column1 AS one, column2, column3 FROM test_tablea
+             WHERE column1 = :one"""
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        selectBinds = []
+        for i in [1200, 5, 17, 5, 3000]:
+            selectBinds.append({"one": i})
+        for i in range(1000):
+            selectBinds.append({"one": i})
+
+        loopResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, selectBinds):
+            loopResults.extend(resultSet.fetchall())
+
+        batchResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, selectBinds,
+                                                  batchSelect = True):
+            batchResults.extend(resultSet.fetchall())
+
+        self.assertEqual(len(batchResults), 1004)
+        self.assertEqual(len(loopResults), len(batchResults))
+        for loopRow, batchRow in zip(loopResults, batchResults):
+            self.assertEqual(list(loopRow), list(batchRow))
+
+        self.assertEqual(batchResults[0][0], 1200)
+        self.assertEqual(batchResults[1][0], 5)
+        self.assertEqual(batchResults[3][0], 5)
+        self.assertEqual(batchResults[3][2], "15")
+        return
+
+    def testProcessDataBatchSelectOperators(self):
+        """
+        _testProcessDataBatchSelectOperators_
+
+        Verify that selects comparing the bind variable with another operator
+        than = or using it twice are not rewritten into IN (...) clauses.
+        """
+        binds = []
+        for i in range(20):
+            binds.append({"one": i, "two": i * 2, "three": str(i * 3)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        selectBinds = [{"one": 15}, {"one": 3}, {"one": 7}]
+        for operator in [">=", "<=", "!=", "<>", ">", "<"]:
+            selectSQL = """SELECT column1 AS one, column2, column3 FROM test_tablea
+                           WHERE column1 %s :one ORDER BY column1""" % operator
+
+            loopResults = []
+            for resultSet in myThread.dbi.processData(selectSQL, selectBinds):
+                loopResults.extend(resultSet.fetchall())
+            batchResults = []
+            for resultSet in myThread.dbi.processData(selectSQL, selectBinds,
+                                                      batchSelect = True):
+                batchResults.extend(resultSet.fetchall())
+
+            self.assertTrue(len(loopResults) > 0)
+            self.assertEqual([list(x) for x in loopResults],
+                             [list(x) for x in batchResults])
+
+        selectSQL = """SELECT column1 AS one, column2, column3 FROM test_tablea
+                       WHERE column1 = :one OR column2 = :one ORDER BY column1"""
+        batchResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, selectBinds,
+                                                  batchSelect = True):
+            batchResults.extend(resultSet.fetchall())
+        self.assertEqual([x[0] for x in batchResults], [15, 3, 7])
+        return
+
     def testInsertHugeNumber(self):
         """
         _testInsertHugeNumber_
@@ -99,6 +99,15 @@ insert into test (bind1, bind2) values (:bind1, :bind2) """
         result = myThread.transaction.processData(myThread.select)
         output = dbformatter.formatOneDict(result)
         self.assertEqual( output,  {'bind2': 'value2a', 'bind1': 'value1a'} )
+        result = myThread.transaction.processData(myThread.select, columnar = True)
+        output = dbformatter.formatColumns(result)
+        self.assertEqual( output, {'bind1': ['value1a', 'value1b', 'value1c'],
+                                   'bind2': ['value2a', 'value2b', 'value2d']} )
+        result = myThread.transaction.processData(myThread.select)
+        output = list(dbformatter.formatDictChunks(result, size = 2))
+        self.assertEqual( output, [[{'bind2': 'value2a', 'bind1': 'value1a'},
+                                    {'bind2': 'value2b', 'bind1': 'value1b'}],
+                                   [{'bind2': 'value2d', 'bind1': 'value1c'}]] )
 
 
 if __name__ == "__main__":
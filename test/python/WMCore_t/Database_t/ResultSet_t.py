@@ -16,7 +16,7 @@ import threading
 import os
 
 from WMCore.WMFactory import WMFactory
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, StreamingResultSet
 from WMQuality.TestInit import TestInit
 from sqlalchemy.engine.base import ResultProxy
 
@@ -121,6 +121,38 @@ class ResultSetTest(unittest.TestCase):
         return
 
 
+    def testColumnarResultSet(self):
+        """
+        _testColumnarResultSet_
+
+        Verify that a columnar ResultSet holds the same data as a regular one
+        and that the streaming result set returns rows in chunks.
+        """
+        binds = []
+        for i in range(25):
+            binds.append({'column1': 'value1%s' % i, 'column2': 'value2%s' % i})
+        self.myThread.dbi.processData("insert into test_tablec (column1, column2) values (:column1, :column2)", binds)
+
+        sql = "select column1, column2 from test_tablec"
+        rowSet = ResultSet()
+        rowSet.add(self.myThread.dbi.connection().execute(sql))
+
+        columnSet = ResultSet(columnar = True, chunkSize = 10)
+        columnSet.add(self.myThread.dbi.connection().execute(sql))
+
+        self.assertEqual(columnSet.rowCount, 25)
+        self.assertEqual(len(columnSet.fetchcolumns()), 2)
+        self.assertEqual([list(x) for x in columnSet.fetchall()],
+                         [list(x) for x in rowSet.fetchall()])
+        self.assertEqual(list(columnSet.fetchone()), list(rowSet.fetchone()))
+        self.assertEqual(columnSet.fetchcolumns(), rowSet.fetchcolumns())
+
+        streamSet = StreamingResultSet(self.myThread.dbi.connection().execute(sql))
+        chunks = list(streamSet.fetchchunks(size = 10))
+        self.assertEqual([len(x) for x in chunks], [10, 10, 5])
+        self.assertEqual(streamSet.fetchall(), [])
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -8,11 +8,15 @@ Unit tests for the Report class.
 import unittest
 import os
 import time
+import struct
+import marshal
+import cPickle
 
 from WMCore.Algorithms import BasicAlgos
 from WMCore.Configuration import ConfigSection
 from WMCore.Database.CMSCouch import CouchServer
 from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport import CompactReport
 from WMCore.WMBase import getTestBase
 from WMQuality.TestInitCouchApp import TestInitCouchApp
 
@@ -676,7 +680,7 @@ cms::Exception caught in EventProcessor and rethrown
 
         myReport.save(path1)
         info = BasicAlgos.getFileInfo(filename = path1)
-        self.assertEqual(info['Size'], 7101)
+        self.assertEqual(info['Size'], 3993)
 
         inputFiles = myReport.getAllInputFiles()
         self.assertEqual(len(inputFiles), 1)
@@ -685,10 +689,86 @@ cms::Exception caught in EventProcessor and rethrown
 
         myReport.save(path2)
         info = BasicAlgos.getFileInfo(filename = path2)
-        self.assertEqual(info['Size'], 6210)
+        self.assertEqual(info['Size'], 3299)
 
         return
 
+    def testCompactPersistency(self):
+        """
+        _testCompactPersistency_
+
+        Verify that reports saved in the compact format and pickled reports
+        load back the same and that a report can be loaded partially.
+        """
+        myReport = Report("cmsRun1")
+        myReport.parse(self.xmlPath)
+        myReport.setStepStartTime(stepName = "cmsRun1")
+        myReport.setStepStopTime(stepName = "cmsRun1")
+        myReport.addError("cmsRun1", 8001, "TestError", "Details")
+
+        compactPath = os.path.join(self.testDir, "compactReport.pkl")
+        picklePath = os.path.join(self.testDir, "pickledReport.pkl")
+        myReport.save(compactPath)
+        myReport.persist(picklePath, compact = False)
+
+        for path in [compactPath, picklePath]:
+            loadedReport = Report()
+            loadedReport.load(path)
+            self.assertEqual(loadedReport.data.dictionary_whole_tree_(),
+                             myReport.data.dictionary_whole_tree_())
+            self.assertEqual(loadedReport.getExitCode(), 8001)
+
+        partialReport = Report()
+        partialReport.load(compactPath, sections = ["errors"])
+        self.assertEqual(partialReport.getExitCode(), 8001)
+        self.assertEqual(partialReport.getTimes("cmsRun1"), myReport.getTimes("cmsRun1"))
+        self.assertFalse(hasattr(partialReport.data.cmsRun1, "output"))
+
+        # The missing sections are loaded before the report is saved again
+        partialReport.setTaskName("/Test/Task")
+        partialReport.save(compactPath)
+        loadedReport = Report()
+        loadedReport.load(compactPath)
+        self.assertEqual(loadedReport.getTaskName(), "/Test/Task")
+        self.assertEqual(len(loadedReport.getAllFilesFromStep("cmsRun1")), 2)
+        self.assertEqual(len(loadedReport.getAllInputFiles()), 1)
+
+        # Reports written with marshal by the first version of the format
+        # can still be read
+        handle = open(compactPath)
+        magic, version, protocol, indexLength = struct.unpack(CompactReport.HEADER_FORMAT,
+                                                              handle.read(CompactReport.HEADER_SIZE))
+        self.assertEqual((version, protocol), (2, 2))
+        index = cPickle.loads(handle.read(indexLength))
+        blobs = handle.read()
+        handle.close()
+        marshalIndex = []
+        marshalBlobs = ""
+        for stepName, sectionName, offset, length in index:
+            blob = marshal.dumps(cPickle.loads(blobs[offset:offset + length]))
+            marshalIndex.append((stepName, sectionName, len(marshalBlobs), len(blob)))
+            marshalBlobs += blob
+        marshalIndex = marshal.dumps(tuple(marshalIndex))
+        handle = open(compactPath, "w")
+        handle.write(struct.pack(CompactReport.HEADER_FORMAT, magic, 1, marshal.version,
+                                 len(marshalIndex)))
+        handle.write(marshalIndex + marshalBlobs)
+        handle.close()
+        loadedReport = Report()
+        loadedReport.load(compactPath)
+        self.assertEqual(loadedReport.getTaskName(), "/Test/Task")
+
+        # Unknown versions are refused by the compact reader
+        handle = open(compactPath, "r+")
+        handle.seek(len(magic))
+        handle.write(struct.pack("!B", 9))
+        handle.close()
+        handle = open(compactPath)
+        self.assertRaises(CompactReport.UnsupportedCompactReport,
+                          CompactReport.loadReport, handle)
+        handle.close()
+        return
+
     def testDuplicatStep(self):
         """
         _testDuplicateStep_
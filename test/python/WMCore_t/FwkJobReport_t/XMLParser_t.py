@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+_XMLParser_t_
+
+Unit tests and benchmark for the FrameworkJobReport XML parser.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+from xml.parsers.expat import ExpatError
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.XMLParser import xmlToJobReport, xmlTreeToJobReport
+from WMCore.WMBase import getTestBase
+
+class XMLParserTest(unittest.TestCase):
+    def setUp(self):
+        self.testDir = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t")
+        self.bigReport = None
+        return
+
+    def tearDown(self):
+        if self.bigReport != None:
+            os.remove(self.bigReport)
+        return
+
+    def parseBoth(self, xmlPath):
+        """
+        _parseBoth_
+
+        Parse an XML report with the streaming and with the tree parser.
+        """
+        streamReport = Report("cmsRun1")
+        xmlToJobReport(streamReport, xmlPath)
+        treeReport = Report("cmsRun1")
+        xmlTreeToJobReport(treeReport, xmlPath)
+        return streamReport, treeReport
+
+    def writeBigReport(self, numFiles = 10, numRuns = 500, numLumis = 20):
+        """
+        _writeBigReport_
+
+        Write a FrameworkJobReport with numFiles input and output files, each
+        holding numRuns runs of numLumis lumi sections.
+        """
+        runs = []
+        for run in range(1, numRuns + 1):
+            lumis = ["<LumiSection ID=\"%s\"/>" % lumi for lumi in range(1, numLumis + 1)]
+            runs.append("<Run ID=\"%s\">\n%s\n</Run>" % (run, "\n".join(lumis)))
+        runs = "<Runs>\n%s\n</Runs>" % "\n".join(runs)
+
+        fileTemplate = """<%(type)s>
+<LFN>/store/data/BigReport/%(type)s_%(index)s.root</LFN>
+<PFN>%(type)s_%(index)s.root</PFN>
+<Catalog></Catalog>
+<ModuleLabel>source</ModuleLabel>
+<GUID>%(index)s</GUID>
+<BranchHash>%(index)s</BranchHash>
+<Branches>
+  <Branch>a_branch</Branch>
+</Branches>
+<InputType>primaryFiles</InputType>
+<InputSourceClass>PoolSource</InputSourceClass>
+<OutputModuleClass>PoolOutputModule</OutputModuleClass>
+<DataType>Data</DataType>
+<TotalEvents>%(index)s</TotalEvents>
+<EventsRead>%(index)s</EventsRead>
+%(runs)s
+</%(type)s>
+"""
+        files = []
+        for index in range(numFiles):
+            files.append(fileTemplate % {"type": "InputFile", "index": index,
+                                         "runs": runs})
+            files.append(fileTemplate % {"type": "File", "index": index,
+                                         "runs": runs})
+
+        handle, self.bigReport = tempfile.mkstemp(suffix = ".xml")
+        os.write(handle, "<FrameworkJobReport>\n%s</FrameworkJobReport>\n" % "".join(files))
+        os.close(handle)
+        return self.bigReport
+
+    def testStreamingParser(self):
+        """
+        _testStreamingParser_
+
+        Verify that the streaming parser fills the report exactly like the
+        parser building the node tree first.
+        """
+        xmlFiles = [fileName for fileName in os.listdir(self.testDir)
+                    if fileName.endswith(".xml")]
+        self.assertTrue(len(xmlFiles) > 0)
+
+        for xmlFile in xmlFiles:
+            if xmlFile == "CMSSWFailReport2.xml":
+                # Truncated report
+                self.assertRaises(ExpatError, self.parseBoth,
+                                  os.path.join(self.testDir, xmlFile))
+                continue
+            streamReport, treeReport = self.parseBoth(os.path.join(self.testDir, xmlFile))
+            self.assertEqual(streamReport.data.dictionary_whole_tree_(),
+                             treeReport.data.dictionary_whole_tree_(),
+                             "Reports differ for %s" % xmlFile)
+
+        streamReport, treeReport = self.parseBoth(self.writeBigReport(2, 10, 5))
+        self.assertEqual(streamReport.data.dictionary_whole_tree_(),
+                         treeReport.data.dictionary_whole_tree_())
+
+        outputFile = streamReport.getAllFilesFromStep("cmsRun1")[0]
+        self.assertEqual(len(outputFile["runs"]), 10)
+        for run in outputFile["runs"]:
+            self.assertEqual(run.lumis, range(1, 6))
+        return
+
+    @attr('performance')
+    def testParserPerformance(self):
+        """
+        _testParserPerformance_
+
+        Time both parsers on a report with thousands of runs and lumis.
+        """
+        xmlPath = self.writeBigReport()
+
+        startTime = time.time()
+        xmlTreeToJobReport(Report("cmsRun1"), xmlPath)
+        treeTime = time.time() - startTime
+
+        startTime = time.time()
+        xmlToJobReport(Report("cmsRun1"), xmlPath)
+        streamTime = time.time() - startTime
+
+        print("  Tree parser: %.3f s, streaming parser: %.3f s" % (treeTime, streamTime))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,6 +16,7 @@ from WMCore.DataStructs.Subscription import Subscription
 from WMCore.DataStructs.Workflow import Workflow
 
 from WMCore.JobSplitting.JobFactory import JobFactory
+from WMCore.JobSplitting.SplitterFactory import SplitterFactory
 
 class JobFactoryTest(unittest.TestCase):
     def setUp(self):
@@ -103,5 +104,93 @@ class JobFactoryTest(unittest.TestCase):
 
         return
 
+    def testIterate(self):
+        """
+        _testIterate_
+
+        Verify that iterating over a factory that doesn't grab files by proxy
+        yields all the job groups in a single pass.
+        """
+        testWorkflow = Workflow(spec = "spec.pkl", owner = "Steve",
+                                name = "TestWorkflow", task = "TestTask")
+
+        testFileset = Fileset(name = "TestFileset")
+        for i in range(10):
+            testFileset.addFile(File(lfn = "someLFN%s" % i, locations = set(["site1"])))
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow,
+                                        split_algo = "FileBased")
+
+        splitter = SplitterFactory()
+        myJobFactory = splitter(subscription = testSubscription)
+        jobGroupsList = list(myJobFactory.iterate(maxChunks = 5, files_per_job = 3))
+
+        self.assertEqual(len(jobGroupsList), 1)
+        self.assertTrue(myJobFactory.exhausted)
+        self.assertEqual(len(jobGroupsList[0]), 1)
+        self.assertEqual(len(jobGroupsList[0][0].jobs), 4)
+        return
+
+    def testIterateMaxChunks(self):
+        """
+        _testIterateMaxChunks_
+
+        Verify that iterating over a factory that grabs files by proxy stops
+        after maxChunks passes and that the next iteration resumes with the
+        files that were not split yet.
+        """
+        testWorkflow = Workflow(spec = "spec.pkl", owner = "Steve",
+                                name = "TestWorkflow", task = "TestTask")
+
+        testFileset = Fileset(name = "TestFileset")
+        for i in range(10):
+            testFileset.addFile(File(lfn = "someLFN%s" % i, locations = set(["site1"])))
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow,
+                                        split_algo = "FileBased")
+
+        splitter = SplitterFactory()
+        myJobFactory = splitter(subscription = testSubscription)
+
+        # Stand in for the database cursor.  FileBased puts every file it
+        # loads in a job, acquire them as the WMBS commit would.
+        def loadFiles(size):
+            files = testSubscription.availableFiles(limit = size)
+            testSubscription.acquireFiles(files)
+            return files
+        myJobFactory.grabByProxy = True
+        myJobFactory.loadFiles = loadFiles
+
+        jobGroupsList = list(myJobFactory.iterate(maxChunks = 2, files_per_job = 3,
+                                                  file_load_limit = 3))
+        self.assertEqual(len(jobGroupsList), 2)
+        self.assertFalse(myJobFactory.exhausted)
+        splitFiles = set()
+        for jobGroups in jobGroupsList:
+            self.assertEqual(len(jobGroups), 1)
+            self.assertEqual(len(jobGroups[0].jobs), 1)
+            for job in jobGroups[0].jobs:
+                splitFiles.update([x['lfn'] for x in job['input_files']])
+        self.assertEqual(len(splitFiles), 6)
+        self.assertEqual(len(testSubscription.availableFiles()), 4)
+
+        # The next iteration picks up the remaining files only
+        jobGroupsList = list(myJobFactory.iterate(maxChunks = 5, files_per_job = 3,
+                                                  file_load_limit = 3))
+        self.assertEqual(len(jobGroupsList), 2)
+        self.assertTrue(myJobFactory.exhausted)
+        for jobGroups in jobGroupsList:
+            for job in jobGroups[0].jobs:
+                for lfn in [x['lfn'] for x in job['input_files']]:
+                    self.assertFalse(lfn in splitFiles)
+                    splitFiles.add(lfn)
+        self.assertEqual(len(splitFiles), 10)
+        self.assertEqual(len(testSubscription.availableFiles()), 0)
+        return
+
 if __name__ == '__main__':
     unittest.main()
@@ -15,6 +15,7 @@ from WMCore.DataStructs.Workflow import Workflow
 from WMCore.DataStructs.Run import Run
 
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
+from WMCore.JobSplitting.LumiBased import LumiChecker
 from WMCore.Services.UUID import makeUUID
 
 class LumiBasedTest(unittest.TestCase):
@@ -277,5 +278,63 @@ class LumiBasedTest(unittest.TestCase):
         self.assertEqual(jobs[1]['mask'].getRunAndLumis(), {2: [[200L, 200L]]})
         self.assertEqual(jobs[2]['mask'].getRunAndLumis(), {3: [[300L, 300L]]})
 
+    def testD_LumiMask(self):
+        """
+        _LumiMask_
+
+        Test that only the lumis in the lumi-mask are put in the jobs.
+        """
+        splitter = SplitterFactory()
+        testSubscription = self.createSubscription(nFiles = 3, lumisPerFile = 5)
+        jobFactory = splitter(package = "WMCore.DataStructs",
+                              subscription = testSubscription)
+
+        # Run 0 has lumis 0-4, run 1 lumis 100-104 and run 2 lumis 200-204
+        jobGroups = jobFactory(lumis_per_job = 2,
+                               halt_job_on_file_boundaries = True,
+                               performance = self.performanceParams,
+                               runs = ['0', '2'],
+                               lumis = ['1,1,3,10', '199,201'])
+
+        self.assertEqual(len(jobGroups), 1)
+        masks = [job['mask'].getRunAndLumis() for job in jobGroups[0].jobs]
+        self.assertEqual(masks, [{0: [[1L, 1L], [3L, 3L]]}, {0: [[4L, 4L]]},
+                                 {2: [[200L, 201L]]}])
+        return
+
+    def testE_LumiChecker(self):
+        """
+        _LumiChecker_
+
+        Test that the checker finds the job of a lumi whatever the order in
+        which the jobs were closed.
+        """
+        checker = LumiChecker(True)
+        jobs = []
+        for lumis in [[[50, 59]], [[10, 19], [70, 70]], [[20, 29]], [[1, 5]]]:
+            job = Job(name = makeUUID())
+            for lumiRange in lumis:
+                job['mask'].addRunAndLumis(run = 1, lumis = lumiRange)
+            checker.closeJob(job)
+            jobs.append(job)
+        checker.closeJob(None)
+
+        self.assertEqual(checker.getJob(1, 55), jobs[0])
+        self.assertEqual(checker.getJob(1, 10), jobs[1])
+        self.assertEqual(checker.getJob(1, 70), jobs[1])
+        self.assertEqual(checker.getJob(1, 29), jobs[2])
+        self.assertEqual(checker.getJob(1, 1), jobs[3])
+        self.assertEqual(checker.getJob(1, 6), None)
+        self.assertEqual(checker.getJob(1, 100), None)
+        self.assertEqual(checker.getJob(2, 10), None)
+
+        # Jobs closed after a lookup are found as well
+        job = Job(name = makeUUID())
+        job['mask'].addRunAndLumis(run = 1, lumis = [6, 8])
+        checker.closeJob(job)
+        self.assertEqual(checker.getJob(1, 7), job)
+        self.assertEqual(checker.getJob(1, 12), jobs[1])
+        return
+
 if __name__ == '__main__':
     unittest.main()
@@ -343,6 +343,82 @@ class TestChangeState(unittest.TestCase):
 
         return
 
+    def testPropagateMany(self):
+        """
+        _testPropagateMany_
+
+        Verify that several transitions can be propagated at once and that
+        the state transitions of jobs already in couch are appended to their
+        documents.
+        """
+        change = ChangeState(self.config, "changestate_t")
+
+        locationAction = self.daoFactory(classname = "Locations.New")
+        locationAction.execute("site1", seName = "somese.cern.ch")
+
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Steve",
+                                name = "wf001", task = self.taskName)
+        testWorkflow.create()
+        testFileset = Fileset(name = "TestFileset")
+        testFileset.create()
+
+        for i in range(4):
+            newFile = File(lfn = "File%s" % i, locations = set(["somese.cern.ch"]))
+            newFile.create()
+            testFileset.addFile(newFile)
+
+        testFileset.commit()
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow,
+                                        split_algo = "FileBased")
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroup = jobFactory(files_per_job = 1)[0]
+
+        for testJob in jobGroup.jobs:
+            testJob["user"] = "sfoulkes"
+            testJob["group"] = "DMWM"
+            testJob["taskType"] = "Processing"
+
+        change.propagate(jobGroup.jobs, "new", "none")
+        change.propagate(jobGroup.jobs, "created", "new")
+
+        # Keep the bulk batches smaller than the number of jobs
+        change.couchBulkSize = 3
+        testJobA, testJobB, testJobC, testJobD = jobGroup.jobs
+        change.propagateMany([(testJobA, "executing", "created"),
+                              (testJobB, "executing", "created"),
+                              (testJobC, "submitfailed", "created"),
+                              (testJobD, "killed", "created")])
+
+        stateDAO = self.daoFactory(classname = "Jobs.GetState")
+        self.assertEqual(stateDAO.execute(id = testJobA["id"]), "executing")
+        self.assertEqual(stateDAO.execute(id = testJobB["id"]), "executing")
+        self.assertEqual(stateDAO.execute(id = testJobC["id"]), "submitfailed")
+        self.assertEqual(stateDAO.execute(id = testJobD["id"]), "killed")
+
+        testJobD.load()
+        self.assertEqual(testJobD["retry_count"], 99999)
+
+        expectedStates = {testJobA["id"]: "executing",
+                          testJobB["id"]: "executing",
+                          testJobC["id"]: "submitfailed",
+                          testJobD["id"]: "killed"}
+        for testJob in jobGroup.jobs:
+            jobDoc = change.jobsdatabase.document(testJob["couch_record"])
+            self.assertEqual(len(jobDoc["states"]), 3)
+            self.assertEqual(jobDoc["states"]["2"]["newstate"], "created")
+            self.assertEqual(jobDoc["states"]["3"]["oldstate"], "created")
+            self.assertEqual(jobDoc["states"]["3"]["newstate"],
+                             expectedStates[testJob["id"]])
+            self.assertTrue(type(jobDoc["states"]["3"]["timestamp"]) in (types.IntType,
+                                                                        types.LongType))
+
+        return
+
     def testRetryCount(self):
         """
         _testRetryCount_
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+_WorkerPool_t_
+
+Unit tests for the multiprocessing WorkerPool.
+"""
+
+import time
+import unittest
+
+from WMCore.ProcessPool.WorkerPool import WorkerPool
+
+def square(value):
+    """
+    Square a value, fail on negative values, sleep on 'sleep'.
+    """
+    if value == 'sleep':
+        time.sleep(60)
+    if value < 0:
+        raise ValueError("negative value %s" % value)
+    return value * value
+
+class WorkerPoolTest(unittest.TestCase):
+
+    def testCollect(self):
+        """
+        _testCollect_
+
+        Results and errors are collected by key, in any grouping.
+        """
+        pool = WorkerPool(square, 2, timeout = 30)
+        for i in range(5):
+            pool.submit(i, i)
+        pool.submit('bad', -1)
+
+        results = pool.collect([1, 'bad'])
+        self.assertEqual(sorted(results.keys()), [1, 'bad'])
+        self.assertEqual(results[1], (1, None))
+        self.assertEqual(results['bad'][0], None)
+        self.assertTrue("negative value" in results['bad'][1])
+
+        results = pool.collect()
+        self.assertEqual(results, {0: (0, None), 2: (4, None),
+                                   3: (9, None), 4: (16, None)})
+        self.assertEqual(pool.collect(), {})
+        pool.close()
+        return
+
+    def testTimeout(self):
+        """
+        _testTimeout_
+
+        The timeout applies to the whole wait, the workers are restarted and
+        the pending work abandoned when it runs out.
+        """
+        pool = WorkerPool(square, 1, timeout = 2)
+        pool.submit('slow', 'sleep')
+        pool.submit('after', 3)
+        workers = list(pool.pool)
+
+        start = time.time()
+        self.assertEqual(pool.collect(['slow', 'after']), {})
+        self.assertTrue(time.time() - start < 10)
+        self.assertFalse(workers[0].is_alive())
+        self.assertFalse(pool.isPending('slow'))
+        self.assertFalse(pool.isPending('after'))
+
+        # The new workers work
+        pool.submit('new', 4)
+        self.assertEqual(pool.collect(['new']), {'new': (16, None)})
+        pool.close()
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,7 +18,7 @@ from WMCore.WMBS.JobGroup import JobGroup
 from WMCore.WMBS.Workflow import Workflow
 from WMCore.WMBS.Subscription import Subscription
 
-from WMCore.ResourceControl.ResourceControl import ResourceControl
+from WMCore.ResourceControl.ResourceControl import ResourceControl, clearThresholdSnapshots
 from WMQuality.TestInit import TestInit
 from WMCore.Services.UUID import makeUUID
 from WMCore.DAOFactory import DAOFactory
@@ -452,6 +452,45 @@ class ResourceControlTest(unittest.TestCase):
 
         return
 
+    def testThresholdSnapshots(self):
+        """
+        _testThresholdSnapshots_
+
+        Verify that threshold snapshots are served when they are young enough,
+        follow changeJobCounts() and are dropped when the thresholds change.
+        A maxAge of 0 always queries the database.
+        """
+        myResourceControl = ResourceControl()
+        myResourceControl.insertSite("testSite1", 10, 20, "testSE1", "testCE1", "T1_US_FNAL", "LsfPlugin")
+        myResourceControl.insertSite("testSite2", 20, 40, "testSE2", "testCE2", "T3_US_FNAL", "LsfPlugin")
+        myResourceControl.insertThreshold("testSite1", "Processing", 20, 10)
+        myResourceControl.insertThreshold("testSite2", "Processing", 50, 25)
+        self.createJobs()
+
+        submitThresholds = myResourceControl.listThresholdsForSubmit(maxAge = 300)
+        createThresholds = myResourceControl.listThresholdsForCreate(maxAge = 300)
+        self.assertEqual(submitThresholds["testSite1"]["total_pending_jobs"], 1)
+
+        self.assertEqual(myResourceControl.listThresholdsForSubmit(maxAge = 300), submitThresholds)
+        self.assertEqual(myResourceControl.listThresholdsForCreate(maxAge = 300), createThresholds)
+
+        # Callers get copies, the snapshot only changes with changeJobCounts
+        submitThresholds["testSite1"]["total_pending_jobs"] = 100
+        myResourceControl.changeJobCounts("testSite1", "Processing", pendingJobs = 3)
+        myResourceControl.changeJobCounts("testSite3", "Processing", pendingJobs = 3)
+        snapshot = ResourceControl().listThresholdsForSubmit(maxAge = 300)
+        self.assertEqual(snapshot["testSite1"]["total_pending_jobs"], 4)
+        self.assertEqual(snapshot["testSite1"]["thresholds"][0]["task_pending_jobs"], 4)
+        self.assertEqual(myResourceControl.listThresholdsForSubmit()["testSite1"]["total_pending_jobs"], 1)
+
+        # Changing the thresholds drops the snapshots
+        myResourceControl.setJobSlotsForSite("testSite1", pendingJobSlots = 5)
+        snapshot = myResourceControl.listThresholdsForSubmit(maxAge = 300)
+        self.assertEqual(snapshot["testSite1"]["total_pending_slots"], 5)
+        self.assertEqual(snapshot["testSite1"]["total_pending_jobs"], 1)
+        clearThresholdSnapshots()
+        return
+
     def testListSiteInfo(self):
         """
         _testListSiteInfo_
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+_MemoryCache_t_
+
+Unit tests for the in memory cache of Service.
+"""
+
+import time
+import unittest
+
+from WMCore.Services.MemoryCache import MemoryCache
+
+class MemoryCacheTest(unittest.TestCase):
+
+    def testFreshAndStale(self):
+        """
+        _testFreshAndStale_
+
+        Entries are fresh for their time to live, then stale, then gone.
+        """
+        cache = MemoryCache()
+        self.assertEqual(cache.get("a", 10), (None, None))
+        cache.put("a", "data")
+        self.assertEqual(cache.get("a", 10), ("data", "fresh"))
+
+        entry = cache.entries["a"]
+        cache.entries["a"] = (entry[0], time.time() - 15)
+        self.assertEqual(cache.get("a", 10, 10), ("data", "stale"))
+        self.assertEqual(cache.get("a", 10), (None, None))
+        self.assertEqual(cache.get("a", 10, 10), (None, None))
+
+        self.assertEqual(cache.stats(), {"hits": 1, "stale_hits": 1, "misses": 3,
+                                         "evictions": 0, "entries": 0, "bytes": 0})
+        return
+
+    def testEviction(self):
+        """
+        _testEviction_
+
+        The least recently used entries are evicted to stay within the
+        number of entries and bytes limits.
+        """
+        cache = MemoryCache(maxEntries = 3, maxBytes = 10)
+        cache.put("a", "12")
+        cache.put("b", "34")
+        cache.put("c", "56")
+        cache.get("a", 10)
+        cache.put("d", "78")
+        self.assertEqual(cache.entries.keys(), ["c", "a", "d"])
+
+        cache.put("e", "1234567")
+        self.assertEqual(cache.entries.keys(), ["d", "e"])
+        self.assertEqual(cache.bytes, 9)
+        self.assertEqual(cache.evictions, 3)
+
+        # Replacing an entry updates its size, too big entries are dropped
+        cache.put("d", "7")
+        self.assertEqual(cache.bytes, 8)
+        cache.put("d", "x" * 11)
+        self.assertEqual(cache.entries.keys(), ["e"])
+        self.assertEqual(cache.bytes, 7)
+
+        cache.remove("e")
+        cache.remove("e")
+        self.assertEqual(cache.bytes, 0)
+        cache.put("f", "1")
+        cache.clear()
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.bytes, 0)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -177,6 +177,26 @@ class testRepeatCalls(RESTBaseUnitTest):
         if fail_count > 0:
             raise Exception('Test did not pass!')
 
+    def testMultiRequest(self):
+        """Concurrent requests return their results in order"""
+        req = Requests.Requests(self.urlbase, {'req_cache_path': self.cache_path})
+        headers = {'Cache-Control':'no-cache'}
+        results = req.multiRequest([('/', {})] * 20, incoming_headers=headers,
+                                   maxConnections=4)
+        self.assertEqual(len(results), 20)
+        for result in results:
+            self.assertEqual(200, result[1])
+            self.assertEqual(results[0][0], result[0])
+
+        results = req.multiRequest([('/', {}), ('/thispagedoesntexist/', {})],
+                                   incoming_headers=headers, raiseErrors=False)
+        self.assertEqual(200, results[0][1])
+        self.assertTrue(isinstance(results[1], HTTPException))
+        self.assertEqual(404, results[1].status)
+        self.assertRaises(HTTPException, req.multiRequest,
+                          [('/', {}), ('/thispagedoesntexist/', {})],
+                          incoming_headers=headers)
+
     def testRecoveryFromConnRefused(self):
         """Connections succeed after server down"""
         import socket
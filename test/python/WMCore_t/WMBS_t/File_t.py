@@ -1095,6 +1095,35 @@ class FileTest(unittest.TestCase):
         return
 
 
+    def testBulkAddRunLumi(self):
+        """
+        _testBulkAddRunLumi_
+
+        Verify that the run/lumi information of several files can be added at
+        once and that duplicated lumis are only inserted once.
+        """
+        testFileA = File(lfn = "/this/is/a/lfnA", size = 1024, events = 10)
+        testFileA.create()
+        testFileB = File(lfn = "/this/is/a/lfnB", size = 1024, events = 10)
+        testFileB.create()
+
+        runSetA = set([Run(1, *[45, 46, 46]), Run(1, *[46, 47]), Run(2, *[1])])
+        runSetB = set([Run(3, *range(1, 101))])
+
+        bulkRunLumiAction = self.daofactory(classname = "Files.BulkAddRunLumi")
+        bulkRunLumiAction.execute(files = [{'lfn': testFileA['lfn'], 'runs': runSetA},
+                                           {'lfn': testFileB['lfn'], 'runs': runSetB}])
+
+        runLumiAction = self.daofactory(classname = "Files.GetBulkRunLumi")
+        runLumis = runLumiAction.execute(files = [testFileA, testFileB])
+        self.assertEqual(sorted(runLumis[testFileA['id']][1]), [45, 46, 47])
+        self.assertEqual(runLumis[testFileA['id']][2], [1])
+        self.assertEqual(sorted(runLumis[testFileB['id']][3]), range(1, 101))
+
+        self.assertRaises(Exception, bulkRunLumiAction.execute,
+                          files = [{'lfn': "/this/is/not/a/lfn", 'runs': runSetB}])
+        return
+
     def testSetLocationByLFN(self):
         """
         _testSetLocationByLFN_
@@ -1109,6 +1109,34 @@ class SubscriptionTest(unittest.TestCase):
 
         return
 
+    def testListIncompleteByWorkflowDAO(self):
+        """
+        _testListIncompleteByWorkflowDAO_
+
+        Test the Subscription.ListIncompleteByWorkflow DAO object that returns
+        the incomplete subscriptions grouped by workflow.
+        """
+        (testSubscription, testFileset, testWorkflow,
+         testFileA, testFileB, testFileC) = self.createSubscriptionWithFileABC()
+        testSubscription.create()
+
+        subIncomplete = self.daofactory(classname = "Subscriptions.ListIncomplete")
+        subIncompleteByWorkflow = self.daofactory(classname = "Subscriptions.ListIncompleteByWorkflow")
+
+        incompleteSubs = subIncompleteByWorkflow.execute()
+        allSubs = []
+        for workflowSubs in incompleteSubs.values():
+            allSubs.extend(workflowSubs)
+
+        self.assertEqual(sorted(allSubs), sorted(subIncomplete.execute()))
+        self.assertTrue(testSubscription["id"] in incompleteSubs[testWorkflow.id])
+
+        testSubscription.completeFiles([testFileA, testFileB, testFileC])
+
+        incompleteSubs = subIncompleteByWorkflow.execute()
+        self.assertFalse(testSubscription["id"] in incompleteSubs.get(testWorkflow.id, []))
+        return
+
     def testGetJobGroups(self):
         """
         _testGetJobGroups_